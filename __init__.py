@@ -70,9 +70,80 @@ def create_app():
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(app.instance_path, 'videos.db'))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Perfil de SQLite: WAL, espera ante bloqueos (ms), synchronous, mmap y caché de páginas (MB), y pool de conexiones
+    app.config['SQLITE_WAL'] = os.environ.get('SQLITE_WAL', '1') == '1'
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+    app.config['SQLITE_MMAP_MB'] = int(os.environ.get('SQLITE_MMAP_MB', '256'))
+    app.config['SQLITE_CACHE_MB'] = int(os.environ.get('SQLITE_CACHE_MB', '64'))
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', '10'))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+    app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    # Las escrituras largas (guardado de scrapes, trabajos por lotes, borrados masivos) pasan por un único hilo escritor
+    app.config['DB_WRITE_QUEUE'] = os.environ.get('DB_WRITE_QUEUE', '1') == '1'
+    from .basedatos import sqlite_engine_options
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', sqlite_engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS'],
+        pool_size=app.config['DB_POOL_SIZE'],
+        max_overflow=app.config['DB_MAX_OVERFLOW'],
+        pool_timeout=app.config['DB_POOL_TIMEOUT']))
+    app.config['SCRAPE_CONCURRENCY'] = int(os.environ.get('SCRAPE_CONCURRENCY', '1'))
+    # Presupuesto de latencia por página de listado y pausa de cortesía entre páginas (segundos)
+    app.config['SCRAPE_PAGE_BUDGET'] = float(os.environ.get('SCRAPE_PAGE_BUDGET', '15'))
+    app.config['SCRAPE_POLITENESS_DELAY'] = float(os.environ.get('SCRAPE_POLITENESS_DELAY', '1'))
+    # Pool de WebDrivers de larga vida: tamaño y límites de reciclaje (páginas cargadas, RSS en MB, segundos ocioso)
+    app.config['WEBDRIVER_POOL_SIZE'] = int(os.environ.get('WEBDRIVER_POOL_SIZE', '2'))
+    app.config['WEBDRIVER_MAX_PAGES'] = int(os.environ.get('WEBDRIVER_MAX_PAGES', '200'))
+    app.config['WEBDRIVER_MAX_MEMORY_MB'] = int(os.environ.get('WEBDRIVER_MAX_MEMORY_MB', '1500'))
+    app.config['WEBDRIVER_MAX_IDLE_SECONDS'] = int(os.environ.get('WEBDRIVER_MAX_IDLE_SECONDS', '600'))
+    # Resolución de URLs directas con yt-dlp: hilos en paralelo y tamaño de la caché por URL de embed
+    app.config['DIRECT_URL_WORKERS'] = int(os.environ.get('DIRECT_URL_WORKERS', '4'))
+    app.config['DIRECT_URL_CACHE_SIZE'] = int(os.environ.get('DIRECT_URL_CACHE_SIZE', '2000'))
+    # Caché de listados renderizados (por generación del catálogo): activación, entradas y MB como máximo
+    app.config['RESPONSE_CACHE_ENABLED'] = os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1'
+    app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '500'))
+    app.config['RESPONSE_CACHE_MAX_MB'] = int(os.environ.get('RESPONSE_CACHE_MAX_MB', '64'))
+    # Caché local de miniaturas reducidas (directorio, MB como máximo, tamaño de tarjeta, formato WEBP/AVIF y calidad)
+    app.config['THUMB_CACHE_ENABLED'] = os.environ.get('THUMB_CACHE_ENABLED', '1') == '1'
+    app.config['THUMB_CACHE_DIR'] = os.environ.get('THUMB_CACHE_DIR', os.path.join(app.instance_path, 'thumbs'))
+    app.config['THUMB_CACHE_MAX_MB'] = int(os.environ.get('THUMB_CACHE_MAX_MB', '512'))
+    app.config['THUMB_WIDTH'] = int(os.environ.get('THUMB_WIDTH', '320'))
+    app.config['THUMB_HEIGHT'] = int(os.environ.get('THUMB_HEIGHT', '180'))
+    app.config['THUMB_FORMAT'] = os.environ.get('THUMB_FORMAT', 'WEBP').upper()
+    app.config['THUMB_QUALITY'] = int(os.environ.get('THUMB_QUALITY', '70'))
+    # Descargas diferidas de miniaturas pedidas por las tarjetas: hilos y tamaño máximo de la cola
+    app.config['THUMB_LAZY_WORKERS'] = int(os.environ.get('THUMB_LAZY_WORKERS', '2'))
+    app.config['THUMB_LAZY_MAX_PENDING'] = int(os.environ.get('THUMB_LAZY_MAX_PENDING', '200'))
 
     db.init_app(app)
     migrate.init_app(app, db) 
+    from .basedatos import install_sqlite_pragmas, sqlite_pragmas, configure_write_queue
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, sqlite_pragmas(wal=app.config['SQLITE_WAL'],
+                                                         busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS'],
+                                                         synchronous=app.config['SQLITE_SYNCHRONOUS'],
+                                                         mmap_mb=app.config['SQLITE_MMAP_MB'],
+                                                         cache_mb=app.config['SQLITE_CACHE_MB']))
+    configure_write_queue(app, enabled=app.config['DB_WRITE_QUEUE'])
+    from .webdriver_init import configure_driver_pool
+    configure_driver_pool(max_size=app.config['WEBDRIVER_POOL_SIZE'],
+                          max_pages=app.config['WEBDRIVER_MAX_PAGES'],
+                          max_memory_mb=app.config['WEBDRIVER_MAX_MEMORY_MB'],
+                          max_idle_seconds=app.config['WEBDRIVER_MAX_IDLE_SECONDS'])
+    from .scraper import configure_direct_url_resolver
+    configure_direct_url_resolver(max_workers=app.config['DIRECT_URL_WORKERS'],
+                                  cache_size=app.config['DIRECT_URL_CACHE_SIZE'])
+    from .cache_respuestas import configure_response_cache
+    configure_response_cache(max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+                             max_bytes=app.config['RESPONSE_CACHE_MAX_MB'] * 1024 * 1024)
+    from .miniaturas import configure_thumbnail_cache, configure_thumbnail_fetcher
+    configure_thumbnail_cache(app.config['THUMB_CACHE_DIR'] if app.config['THUMB_CACHE_ENABLED'] else None,
+                              max_bytes=app.config['THUMB_CACHE_MAX_MB'] * 1024 * 1024,
+                              width=app.config['THUMB_WIDTH'], height=app.config['THUMB_HEIGHT'],
+                              image_format=app.config['THUMB_FORMAT'], quality=app.config['THUMB_QUALITY'])
+    configure_thumbnail_fetcher(app, workers=app.config['THUMB_LAZY_WORKERS'],
+                                max_pending=app.config['THUMB_LAZY_MAX_PENDING'])
     csrf.init_app(app) 
 
     csp = {
@@ -170,6 +241,8 @@ def create_app():
         try:
             from .modelos import User 
             db.create_all() 
+            from .migraciones import upgrade_schema
+            upgrade_schema()
             if not User.query.filter_by(username='admin').first():
                 from werkzeug.security import generate_password_hash
                 admin_password = os.environ.get('ADMIN_PASSWORD', 'admin123')
@@ -189,6 +262,27 @@ def create_app():
         except Exception as e:
             app.logger.error(f"Error during DB initialization or admin creation: {e}", exc_info=True)
 
+    @app.cli.command('backfill-video-metadata')
+    def backfill_video_metadata_command():
+        """Rellena duración y resolución de los videos existentes a partir de sus títulos."""
+        from .metadatos import backfill_video_metadata
+        updated = backfill_video_metadata()
+        print(f"Videos actualizados: {updated}")
+
+    @app.cli.command('prefetch-thumbnails')
+    def prefetch_thumbnails_command():
+        """Descarga a la caché local las miniaturas de los videos que aún no tienen una."""
+        from .miniaturas import prefetch_thumbnails
+        cached = prefetch_thumbnails()
+        print(f"Miniaturas en caché: {cached}")
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """Comprueba con EXPLAIN QUERY PLAN que los listados usan índices (sin recorrer la tabla ni ordenar en B-tree temporal)."""
+        from .plan_consultas import check_query_plans, report
+        if not report(check_query_plans()):
+            raise SystemExit(1)
+
     @app.context_processor
     def inject_csrf_token():
         from flask_wtf.csrf import generate_csrf
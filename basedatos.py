@@ -0,0 +1,130 @@
+# app/basedatos.py
+"""Perfil de SQLite para producción y cola de escritura única.
+
+Cada conexión nueva recibe los PRAGMA de sqlite_pragmas() (WAL, busy_timeout, synchronous, mmap, caché), con lo
+que las páginas siguen leyendo mientras un scrape escribe. Las escrituras largas de los trabajos en segundo
+plano y los borrados masivos pasan por `write_queue`: un único hilo escritor que las ejecuta de una en una,
+así que dos escritores nunca compiten por el bloqueo de la BD ("database is locked").
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_MB = 256
+SQLITE_CACHE_MB = 64
+DB_POOL_SIZE = 10
+DB_MAX_OVERFLOW = 10
+DB_POOL_TIMEOUT = 30
+
+
+def is_file_sqlite(uri):
+    return uri.startswith('sqlite') and ':memory:' not in uri and uri.rstrip('/') != 'sqlite:'
+
+def sqlite_pragmas(wal=True, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS, synchronous='NORMAL',
+                   mmap_mb=SQLITE_MMAP_MB, cache_mb=SQLITE_CACHE_MB):
+    """PRAGMA que se aplican a cada conexión, en orden."""
+    pragmas = [('busy_timeout', int(busy_timeout_ms))]
+    if wal:
+        pragmas.append(('journal_mode', 'WAL'))
+    pragmas += [
+        ('synchronous', synchronous),  # NORMAL es seguro con WAL: solo se pierde la última transacción si cae el SO
+        ('mmap_size', int(mmap_mb) * 1024 * 1024),
+        ('cache_size', -int(cache_mb) * 1024),  # Negativo: en KiB, no en páginas
+        ('temp_store', 'MEMORY'),
+    ]
+    return pragmas
+
+def sqlite_engine_options(uri, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS, pool_size=DB_POOL_SIZE,
+                          max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT):
+    """SQLALCHEMY_ENGINE_OPTIONS para una BD SQLite en fichero ({} para otras BD o SQLite en memoria)."""
+    if not is_file_sqlite(uri):
+        return {}
+    return {
+        # timeout del driver = busy_timeout: también cubre la espera al abrir la conexión
+        'connect_args': {'timeout': busy_timeout_ms / 1000, 'check_same_thread': False},
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+    }
+
+def install_sqlite_pragmas(engine, pragmas):
+    """Aplica `pragmas` a cada conexión que abra `engine` (no hace nada si no es SQLite)."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+                if name == 'journal_mode':
+                    mode = cursor.fetchone()
+                    if mode and str(mode[0]).lower() != str(value).lower():
+                        logger.warning(f"DB: journal_mode pedido {value}, la BD sigue en {mode[0]}.")
+        finally:
+            cursor.close()
+
+    logger.info(f"DB: PRAGMA de SQLite por conexión: {', '.join(f'{name}={value}' for name, value in pragmas)}.")
+
+
+class WriteQueue:
+    """Un hilo escritor: las tareas de escritura se ejecutan de una en una, cada una en su contexto de aplicación."""
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+        self._writer_thread = None
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        with self._lock:
+            self._app = app
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _run_task(self, fn, args, kwargs):
+        self._writer_thread = threading.current_thread()
+        with self._app.app_context():
+            return fn(*args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Encola `fn(*args, **kwargs)` y devuelve su Future."""
+        with self._lock:
+            if self._executor is None:
+                raise RuntimeError("Write queue is not started")
+            return self._executor.submit(self._run_task, fn, args, kwargs)
+
+    def run(self, fn, *args, **kwargs):
+        """Ejecuta `fn` en el hilo escritor y espera su resultado (las excepciones se propagan).
+
+        Sin cola arrancada (CLI, scripts) o desde el propio hilo escritor se ejecuta directamente.
+        """
+        if self._executor is None or threading.current_thread() is self._writer_thread:
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+
+write_queue = WriteQueue()
+
+def configure_write_queue(app, enabled=True):
+    if enabled:
+        write_queue.start(app)
+    else:
+        write_queue.shutdown()
+    return write_queue
+
+def run_write(fn, *args, **kwargs):
+    """Atajo de write_queue.run: `fn` debe confirmar (commit) sus propios cambios."""
+    return write_queue.run(fn, *args, **kwargs)
@@ -0,0 +1,471 @@
+# app/bench_embed.py
+"""Micro-benchmark del resolvedor de URLs de embed.
+
+Compara get_embed_url (patrones compilados y despacho por host) con la implementación anterior,
+que reconstruía el dict de patrones y probaba ~20 regex sin compilar en cada llamada.
+
+Uso: python -m app.bench_embed [iteraciones]
+"""
+import logging
+import re
+import sys
+import timeit
+from urllib.parse import urlencode
+
+from app.scraper import get_embed_url, get_embed_urls
+
+logger = logging.getLogger(__name__)
+
+# Muestra representativa de lo que llega desde scrape_site y admin_fix_video_urls
+SAMPLE_URLS = [
+    ("Xvideos", "https://www.xvideos.com/video12345678/some_video_title"),
+    ("Xvideos", "https://www.xvideos.com/video.abcdef/some_video_title"),
+    ("Pornhub", "https://www.pornhub.com/view_video.php?viewkey=ph5f1234abcd"),
+    ("Pornhub", "https://www.pornhub.com/embed/ph5f1234abcd"),
+    ("YouPorn", "https://www.youporn.com/watch/16543210/some-title/"),
+    ("RedTube", "https://www.redtube.com/40123456"),
+    ("SpankBang", "https://spankbang.com/8abcd/video/some+title"),
+    ("Tube8", "https://www.tube8.com/video/123456/"),
+    ("EPorner", "https://www.eporner.com/video-AbCdEfGh123/some-title/"),
+    ("PornRabbit", "https://www.pornrabbit.com/videos/some-title-123456/"),
+    ("NuVid", "https://www.nuvid.com/video/7654321/"),
+    ("HotMovs", "https://hotmovs.com/video/13579/"),
+]
+
+
+def legacy_get_embed_url(source, url):
+    """Copia literal de get_embed_url antes del resolvedor precompilado (dict reconstruido y búsqueda lineal por llamada)."""
+    try:
+        if not url:
+            return None
+            
+        # URLs conocidas de embed con sus respectivos parámetros
+        embed_patterns = {
+            'pornhub': {
+                'pattern': r'https?://(?:www\.)?pornhub\.com/embed/([a-zA-Z0-9]+)',
+                'base': 'https://www.pornhub.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'xvideos': {
+                'pattern': r'https?://(?:www\.)?xvideos\.com/video([0-9]+)/',
+                'base': 'https://www.xvideos.com/embedframe/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'xhamster': {
+                'pattern': r'https?://(?:www\.)?xhamster\.com/videos/([^/]+)/',
+                'base': 'https://embed.xhamster.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'redtube': {
+                'pattern': r'https?://(?:www\.)?redtube\.com/([0-9]+)',
+                'base': 'https://embed.redtube.com/?video_id={}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'youporn': {
+                'pattern': r'https?://(?:www\.)?youporn\.com/watch/([0-9]+)/',
+                'base': 'https://www.youporn.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'tube8': {
+                'pattern': r'https?://(?:www\.)?tube8\.com/video/([0-9]+)/',
+                'base': 'https://embed.tube8.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'dr-tuber': {
+                'pattern': r'https?://(?:www\.)?dr-tuber\.com/video/([0-9]+)/',
+                'base': 'https://embed.dr-tuber.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'tnaflix': {
+                'pattern': r'https?://(?:www\.)?tnaflix\.com/([^/]+)/([0-9]+)/',
+                'base': 'https://embed.tnaflix.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'spankbang': {
+                'pattern': r'https?://(?:www\.)?spankbang\.com/([a-zA-Z0-9]+)/',
+                'base': 'https://embed.spankbang.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'okxxx': {
+                'pattern': r'https?://(?:www\.)?okxxx\.com/video/([0-9]+)/',
+                'base': 'https://embed.okxxx.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'hclips': {
+                'pattern': r'https?://(?:www\.)?hclips\.com/video/([0-9]+)/',
+                'base': 'https://embed.hclips.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'voyeurhit': {
+                'pattern': r'https?://(?:www\.)?voyeurhit\.com/video/([0-9]+)/',
+                'base': 'https://embed.voyeurhit.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'gotporn': {
+                'pattern': r'https?://(?:www\.)?gotporn\.com/video/([0-9]+)/',
+                'base': 'https://embed.gotporn.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'videosz': {
+                'pattern': r'https?://(?:www\.)?videosz\.com/video/([0-9]+)/',
+                'base': 'https://embed.videosz.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'bigporn': {
+                'pattern': r'https?://(?:www\.)?bigporn\.com/video/([0-9]+)/',
+                'base': 'https://embed.bigporn.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'analvids': {
+                'pattern': r'https?://(?:www\.)?analvids\.com/video/([0-9]+)/',
+                'base': 'https://embed.analvids.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            '4tube': {
+                'pattern': r'https?://(?:www\.)?4tube\.com/video/([0-9]+)/',
+                'base': 'https://embed.4tube.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'freeones': {
+                'pattern': r'https?://(?:www\.)?freeones\.com/video/([0-9]+)/',
+                'base': 'https://embed.freeones.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'hotmovs': {
+                'pattern': r'https?://(?:www\.)?hotmovs\.com/video/([0-9]+)/',
+                'base': 'https://embed.hotmovs.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            },
+            'nuvid': {
+                'pattern': r'https?://(?:www\.)?nuvid\.com/video/([0-9]+)/',
+                'base': 'https://embed.nuvid.com/embed/{}',
+                'params': {
+                    'autoplay': '0',
+                    'controls': '1',
+                    'mute': '0',
+                    'loop': '0',
+                    'show_title': '1',
+                    'show_byline': '1',
+                    'show_portrait': '0',
+                    'color': 'ffffff'
+                }
+            }
+        }
+        
+        # Primero intentar con los patrones conocidos
+        for site, config in embed_patterns.items():
+            match = re.search(config['pattern'], url)
+            if match:
+                video_id = match.group(1)
+                embed_url = config['base'].format(video_id)
+                
+                # Añadir parámetros estándar
+                query_params = urlencode(config['params'])
+                if '?' not in embed_url:
+                    embed_url += f'?{query_params}'
+                else:
+                    embed_url += f'&{query_params}'
+                
+                # Asegurarse que la URL es HTTPS
+                if not embed_url.startswith('https://'):
+                    embed_url = embed_url.replace('http://', 'https://')
+                
+                return embed_url
+        
+        # Si no se encontró con los patrones conocidos, intentar con patrones específicos
+        if source == "YouPorn":
+            patterns = [
+                r'/watch/([0-9]+)/',
+                r'/embed/([0-9]+)/'
+            ]
+            for pattern in patterns:
+                match = re.search(pattern, url)
+                if match:
+                    video_id = match.group(1)
+                    embed_url = f"https://www.youporn.com/embed/{video_id}/"
+                    
+                    # Añadir parámetros estándar
+                    params = {
+                        'autoplay': '0',
+                        'controls': '1',
+                        'mute': '0',
+                        'loop': '0',
+                        'show_title': '1',
+                        'show_byline': '1',
+                        'show_portrait': '0',
+                        'color': 'ffffff'
+                    }
+                    query_params = urlencode(params)
+                    embed_url += f'?{query_params}'
+                    
+                    return embed_url
+            logger.warning(f"No se pudo extraer el ID del video de la URL de YouPorn: {url}")
+            return url
+
+        elif source == "Pornhub":
+            patterns = [
+                r'viewkey=([a-zA-Z0-9]+)',
+                r'/embed/([a-zA-Z0-9]+)(?:/|$)'
+            ]
+            for pattern in patterns:
+                match = re.search(pattern, url)
+                if match:
+                    video_id = match.group(1)
+                    embed_url = f"https://www.pornhub.com/embed/{video_id}"
+                    
+                    # Añadir parámetros estándar
+                    params = {
+                        'autoplay': '0',
+                        'controls': '1',
+                        'mute': '0',
+                        'loop': '0',
+                        'show_title': '1',
+                        'show_byline': '1',
+                        'show_portrait': '0',
+                        'color': 'ffffff'
+                    }
+                    query_params = urlencode(params)
+                    embed_url += f'?{query_params}'
+                    
+                    return embed_url
+            logger.warning(f"No se pudo extraer el ID del video de la URL de Pornhub: {url}")
+            return url
+
+        elif source == "Xvideos":
+            patterns = [
+                r'/video([0-9]+)/',
+                r'/embedframe/([0-9]+)/'
+            ]
+            for pattern in patterns:
+                match = re.search(pattern, url)
+                if match:
+                    video_id = match.group(1)
+                    embed_url = f"https://www.xvideos.com/embedframe/{video_id}"
+                    
+                    # Añadir parámetros estándar
+                    params = {
+                        'autoplay': '0',
+                        'controls': '1',
+                        'mute': '0',
+                        'loop': '0',
+                        'show_title': '1',
+                        'show_byline': '1',
+                        'show_portrait': '0',
+                        'color': 'ffffff'
+                    }
+                    query_params = urlencode(params)
+                    embed_url += f'?{query_params}'
+                    
+                    return embed_url
+            logger.warning(f"No se pudo extraer el ID del video de la URL de Xvideos: {url}")
+            return url
+
+        logger.debug(f"Fuente '{source}' no tiene un patrón de URL de embed definido en get_embed_url.")
+        return url
+
+    except Exception as e:
+        logger.error(f"Error convirtiendo URL de página a URL de embed para {source} ({url}): {e}")
+        return None
+
+
+def run(iterations=2000):
+    for source, url in SAMPLE_URLS:
+        legacy, current = legacy_get_embed_url(source, url), get_embed_url(source, url)
+        if legacy != current:
+            raise AssertionError(f"Resultado distinto para {url}: {legacy!r} != {current!r}")
+
+    def bench_legacy():
+        for source, url in SAMPLE_URLS:
+            legacy_get_embed_url(source, url)
+
+    def bench_current():
+        for source, url in SAMPLE_URLS:
+            get_embed_url(source, url)
+
+    def bench_batch():
+        get_embed_urls(SAMPLE_URLS)
+
+    calls = iterations * len(SAMPLE_URLS)
+    results = {}
+    for name, fn in (("legacy", bench_legacy), ("compiled", bench_current), ("batch", bench_batch)):
+        elapsed = min(timeit.repeat(fn, number=iterations, repeat=3))
+        results[name] = elapsed
+        print(f"{name:>9}: {elapsed * 1e6 / calls:8.2f} us/llamada ({calls} llamadas)")
+    print(f"  speedup: {results['legacy'] / results['compiled']:.1f}x (compiled), {results['legacy'] / results['batch']:.1f}x (batch)")
+    return results
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.ERROR)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
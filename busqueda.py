@@ -0,0 +1,64 @@
+# app/busqueda.py
+"""Búsqueda de videos sobre el índice FTS5 video_fts (ver migraciones.py), con ILIKE como respaldo."""
+import logging
+import re
+
+from sqlalchemy import Float, Integer, column, or_, and_, text
+
+from app import db
+from app.modelos import Video
+
+logger = logging.getLogger(__name__)
+
+# Peso del título frente a la categoría en el ranking bm25
+TITLE_WEIGHT = 10.0
+CATEGORY_WEIGHT = 1.0
+# Máximo de palabras que se toman del término de búsqueda
+MAX_SEARCH_TOKENS = 8
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_fts_available = {}
+
+def search_tokens(search_term):
+    return _TOKEN_RE.findall(search_term or '')[:MAX_SEARCH_TOKENS]
+
+def build_match_expression(tokens, columns=('title', 'category')):
+    """Expresión MATCH de FTS5: todas las palabras, cada una como prefijo, restringida a las columnas dadas."""
+    # Cada palabra va entre comillas para que operadores como AND/OR/NEAR escritos por el usuario sean literales
+    terms = ' '.join(f'"{token}"*' for token in tokens)
+    return f"{{{' '.join(columns)}}} : ({terms})"
+
+def fts_available():
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _fts_available:
+        available = False
+        if engine.dialect.name == 'sqlite':
+            try:
+                with engine.connect() as conn:
+                    available = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'video_fts'")).first() is not None
+            except Exception as e:
+                logger.warning(f"SEARCH: No se pudo comprobar el índice FTS: {e}")
+        _fts_available[key] = available
+    return _fts_available[key]
+
+def apply_search(query, search_term, columns=('title', 'category')):
+    """Filtra `query` (sobre Video) por `search_term` y la ordena por relevancia.
+
+    Con FTS5 hace un join contra video_fts ordenado por bm25; sin él, cada palabra debe aparecer (ILIKE) en alguna
+    de las columnas. Los order_by que se añadan después quedan como criterio secundario.
+    """
+    tokens = search_tokens(search_term)
+    if not tokens:
+        return query
+    if fts_available():
+        weights = f"{TITLE_WEIGHT}, {CATEGORY_WEIGHT}"  # en el orden de columnas de video_fts
+        matches = (
+            text(f"SELECT rowid, bm25(video_fts, {weights}) AS rank FROM video_fts WHERE video_fts MATCH :match")
+            .bindparams(match=build_match_expression(tokens, columns))
+            .columns(column('rowid', Integer), column('rank', Float))
+            .subquery('search_matches')
+        )
+        return query.join(matches, Video.id == matches.c.rowid).order_by(matches.c.rank)
+    fields = [getattr(Video, name) for name in columns]
+    return query.filter(and_(*[or_(*[field.ilike(f'%{token}%') for field in fields]) for token in tokens]))
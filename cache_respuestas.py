@@ -0,0 +1,128 @@
+# app/cache_respuestas.py
+"""Caché de respuestas ya renderizadas para los listados públicos, con ETag/304.
+
+La clave es (endpoint, argumentos de la ruta, query string, generación del catálogo): cualquier escritura que
+llame a catalogo.invalidate_catalog() deja obsoletas todas las entradas de una vez. La memoria está acotada
+por número de entradas y por bytes, con expulsión LRU.
+"""
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import logging
+import threading
+import time
+
+from flask import current_app, g, make_response, request, session
+
+from app.catalogo import catalog_generation
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_MAX_ENTRIES = 500
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Red de seguridad para despliegues con varios procesos (la generación es por proceso)
+RESPONSE_CACHE_TTL = 60
+
+
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # clave -> (cuerpo, etag, mimetype, guardado_en)
+        self._bytes = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _check_generation(self, generation):
+        # Al cambiar la generación nada de lo guardado vuelve a servir: se libera de golpe
+        if generation != self._generation:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def get(self, key, generation):
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[3] > self.ttl:
+                self._bytes -= len(self._entries.pop(key)[0])
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, generation, body, etag, mimetype):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._check_generation(generation)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = (body, etag, mimetype, time.monotonic())
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'generation': self._generation}
+
+
+response_cache = ResponseCache()
+
+def configure_response_cache(max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL):
+    with response_cache._lock:
+        response_cache.max_entries = max_entries
+        response_cache.max_bytes = max_bytes
+        response_cache.ttl = ttl
+    response_cache.clear()
+    return response_cache
+
+
+def skip_response_cache():
+    """Marca la respuesta en curso como no cacheable (p. ej. la página de error de un listado)."""
+    g.skip_response_cache = True
+
+def _cacheable_request():
+    if request.method != 'GET' or not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+        return False
+    # Sin verificación de edad la vista redirige; con mensajes flash pendientes la página es de este visitante
+    return bool(session.get('age_verified')) and not session.get('_flashes')
+
+def _conditional(body, etag, mimetype):
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    # Privada (va detrás de la verificación de edad) y siempre revalidada: el navegador recibe 304 si no cambió
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+def cached_listing(view):
+    """Sirve la vista desde response_cache cuando la respuesta es igual para todo visitante verificado."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _cacheable_request():
+            return view(*args, **kwargs)
+        generation = catalog_generation()
+        key = (request.endpoint, tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))))
+        entry = response_cache.get(key, generation)
+        if entry is not None:
+            body, etag, mimetype, _ = entry
+            return _conditional(body, etag, mimetype)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.direct_passthrough or g.get('skip_response_cache'):
+            return response
+        body = response.get_data()
+        etag = hashlib.sha1(body).hexdigest()
+        response_cache.put(key, generation, body, etag, response.mimetype)
+        return _conditional(body, etag, response.mimetype)
+    return wrapper
@@ -0,0 +1,149 @@
+# app/catalogo.py
+"""Datos del catálogo que cambian solo cuando se guarda un scrape o se borran videos (categorías y totales).
+
+La lista de categorías se cachea en memoria del proceso y se invalida explícitamente desde las escrituras del
+catálogo. La generación aumenta con cada invalidación, así que sirve también de versión del catálogo.
+Los totales salen de catalog_counter, que mantienen triggers de la BD (ver migraciones.py).
+"""
+import logging
+import random
+import threading
+import time
+
+from sqlalchemy import func, text
+
+from app import db
+from app.modelos import Video, CatalogCounter
+
+logger = logging.getLogger(__name__)
+
+# Red de seguridad: con varios procesos, una escritura solo invalida la caché del proceso que la hizo
+CATALOG_CACHE_TTL = 300
+# Las búsquedas y filtros no cuentan más allá de este número de videos; por encima se muestra "1000+"
+COUNT_ESTIMATE_CAP = 1000
+# Intentos de id aleatorio (rechazo de huecos) antes de recurrir al primer id >= al sorteado
+RANDOM_PICK_ATTEMPTS = 8
+
+_catalog_lock = threading.Lock()
+_catalog_generation = 0
+_category_counts = None  # (generación, cargado_en, [(categoría, número de videos), ...])
+_counters_available = {}
+
+def catalog_generation():
+    return _catalog_generation
+
+def invalidate_catalog():
+    """Descarta lo cacheado del catálogo; llamar después de confirmar cualquier escritura sobre Video."""
+    global _catalog_generation, _category_counts
+    with _catalog_lock:
+        _catalog_generation += 1
+        _category_counts = None
+    logger.debug(f"CATALOG: Caché invalidada (generación {_catalog_generation}).")
+
+def get_category_counts():
+    """[(categoría, número de videos)] ordenado por categoría, sin categorías vacías."""
+    global _category_counts
+    with _catalog_lock:
+        cached = _category_counts
+        generation = _catalog_generation
+    if cached is not None and cached[0] == generation and time.monotonic() - cached[1] < CATALOG_CACHE_TTL:
+        return cached[2]
+
+    if counters_available():
+        rows = (db.session.query(CatalogCounter.key, CatalogCounter.count)
+                .filter(CatalogCounter.scope == 'category', CatalogCounter.key != '', CatalogCounter.count > 0)
+                .order_by(CatalogCounter.key)
+                .all())
+    else:
+        rows = (db.session.query(Video.category, func.count(Video.id))
+                .filter(Video.category.isnot(None), Video.category != '')
+                .group_by(Video.category)
+                .order_by(Video.category)
+                .all())
+    counts = [(category, count) for category, count in rows]
+    with _catalog_lock:
+        # Si hubo una invalidación mientras consultábamos, no se guarda un resultado que puede estar viejo
+        if _catalog_generation == generation:
+            _category_counts = (generation, time.monotonic(), counts)
+    return counts
+
+def get_categories():
+    return [category for category, _ in get_category_counts()]
+
+def get_sources():
+    """Fuentes con al menos un video (para los filtros del panel; sin caché, solo lo usa el admin)."""
+    if counters_available():
+        rows = (db.session.query(CatalogCounter.key)
+                .filter(CatalogCounter.scope == 'source', CatalogCounter.key != '', CatalogCounter.count > 0)
+                .order_by(CatalogCounter.key).all())
+    else:
+        rows = (db.session.query(Video.source).filter(Video.source.isnot(None), Video.source != '')
+                .distinct().order_by(Video.source).all())
+    return [row[0] for row in rows]
+
+def counters_available():
+    """True si catalog_counter lo mantienen los triggers de la BD (SQLite tras migraciones.upgrade_schema)."""
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _counters_available:
+        available = False
+        if engine.dialect.name == 'sqlite':
+            try:
+                with engine.connect() as conn:
+                    available = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'catalog_counter_ai'")).first() is not None
+            except Exception as e:
+                logger.warning(f"CATALOG: No se pudo comprobar los contadores: {e}")
+        _counters_available[key] = available
+    return _counters_available[key]
+
+def get_counter(scope='all', key=''):
+    row = db.session.query(CatalogCounter.count).filter_by(scope=scope, key=key).first()
+    return max(0, row[0]) if row else 0
+
+def count_videos(query, scope=None, key='', cap=COUNT_ESTIMATE_CAP):
+    """Total para la paginación de `query`: (total, es_estimación).
+
+    Si la consulta equivale a un contador mantenido (`scope`/`key`) se lee ese contador; si no, se cuenta
+    como mucho hasta `cap` + 1 filas, así que el coste no crece con el catálogo.
+    """
+    if scope is not None and counters_available():
+        return get_counter(scope, key), False
+    bounded = query.order_by(None).limit(cap + 1).subquery()
+    total = db.session.query(func.count()).select_from(bounded).scalar() or 0
+    if total > cap:
+        return cap, True
+    return total, False
+
+def format_total(total, is_estimate):
+    return f"{total}+" if is_estimate else str(total)
+
+def pick_random_video_id(category=None, source=None):
+    """Id de un video al azar (opcionalmente de una categoría/fuente) sin ordenar la tabla.
+
+    Sortea ids en [MIN(id), MAX(id)] de los videos que cumplen el filtro (una búsqueda en ix_video_category_id /
+    ix_video_source_id) y descarta los huecos dejados por borrados o por videos de otras categorías/fuentes,
+    con lo que cada video existente tiene la misma probabilidad. Si tras RANDOM_PICK_ATTEMPTS no acierta
+    (filtro muy disperso dentro de su rango) toma el primer video con id >= al sorteado, una búsqueda por
+    índice aunque ya no del todo uniforme.
+    """
+    filters = []
+    if category:
+        filters.append(Video.category == category)
+    if source:
+        filters.append(Video.source == source)
+    # Dos ORDER BY id LIMIT 1 en vez de MIN/MAX juntos: así cada extremo es una sola búsqueda en el índice
+    low = db.session.query(Video.id).filter(*filters).order_by(Video.id).limit(1).scalar()
+    if low is None:
+        return None
+    high = db.session.query(Video.id).filter(*filters).order_by(Video.id.desc()).limit(1).scalar()
+
+    for _ in range(RANDOM_PICK_ATTEMPTS):
+        candidate = random.randint(low, high)
+        row = db.session.query(Video.id).filter(Video.id == candidate, *filters).first()
+        if row:
+            return row[0]
+
+    candidate = random.randint(low, high)
+    row = (db.session.query(Video.id).filter(Video.id >= candidate, *filters).order_by(Video.id).first()
+           or db.session.query(Video.id).filter(Video.id < candidate, *filters).order_by(Video.id).first())
+    return row[0] if row else None
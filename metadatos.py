@@ -0,0 +1,127 @@
+# app/metadatos.py
+"""Duración y resolución de los videos: parseo del texto de los listados, heurística por título y backfill."""
+import logging
+import re
+
+from sqlalchemy import literal_column, select, update
+
+from app import db
+from app.modelos import Video
+
+logger = logging.getLogger(__name__)
+
+# Rangos de las rutas /duration/<d> (segundos, [min, max)) y /quality/<q> (altura en píxeles, [min, max))
+DURATION_RANGES = {
+    'short': (0, 10 * 60),
+    'medium': (10 * 60, 30 * 60),
+    'long': (30 * 60, None),
+}
+QUALITY_RANGES = {
+    '4k': (2160, None),
+    '1080p': (1080, 2160),
+    '720p': (720, 1080),
+    'hd': (720, None),
+}
+
+BACKFILL_CHUNK_SIZE = 1000
+
+_CLOCK_RE = re.compile(r'\b(?:(\d{1,2}):)?(\d{1,3}):(\d{2})\b')
+_UNITS_RE = re.compile(r'(?:(\d+)\s*h(?:ours?|rs?)?)?\s*(?:(\d+)\s*m(?:in(?:utes?|s)?)?)?\s*(?:(\d+)\s*s(?:ec(?:onds?|s)?)?)?\b', re.IGNORECASE)
+_ISO_RE = re.compile(r'^PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$', re.IGNORECASE)
+_HEIGHT_RE = re.compile(r'\b(2160|1440|1080|720|480|360|240)p(?:\d{2})?\b', re.IGNORECASE)
+# Palabras de calidad sin número explícito, de mayor a menor
+_QUALITY_WORDS = (
+    (re.compile(r'\b(?:4k|uhd|ultra\s*hd)\b', re.IGNORECASE), 2160),
+    (re.compile(r'\b(?:fhd|full\s*hd)\b', re.IGNORECASE), 1080),
+    (re.compile(r'\bhd\b', re.IGNORECASE), 720),
+)
+# En títulos solo se aceptan duraciones con unidad o entre paréntesis/corchetes, para no confundir "2:1" o años
+_TITLE_DURATION_RE = re.compile(r'[\(\[]\s*((?:\d{1,2}:)?\d{1,3}:\d{2})\s*[\)\]]|\b(\d{1,3})\s*(?:min|mins|minutes)\b', re.IGNORECASE)
+
+def parse_duration(text):
+    """Segundos a partir de textos de duración de los listados ('12:34', '1:02:03', '12 min', '5m 30s', 'PT12M'), o None."""
+    if not text:
+        return None
+    text = text.strip()
+    match = _ISO_RE.match(text)
+    if not match:
+        match = _CLOCK_RE.search(text)
+    if match:
+        hours, minutes, seconds = (int(part) if part else 0 for part in match.groups())
+        return hours * 3600 + minutes * 60 + seconds
+    for match in _UNITS_RE.finditer(text):
+        if any(match.groups()):
+            hours, minutes, seconds = (int(part) if part else 0 for part in match.groups())
+            return hours * 3600 + minutes * 60 + seconds
+    return None
+
+def parse_height(text):
+    """Altura en píxeles a partir de marcas de calidad ('1080p', '4K', 'HD'...), o None."""
+    if not text:
+        return None
+    match = _HEIGHT_RE.search(text)
+    if match:
+        return int(match.group(1))
+    for pattern, height in _QUALITY_WORDS:
+        if pattern.search(text):
+            return height
+    return None
+
+def guess_duration_from_title(title):
+    if not title:
+        return None
+    match = _TITLE_DURATION_RE.search(title)
+    if not match:
+        return None
+    if match.group(1):
+        return parse_duration(match.group(1))
+    return int(match.group(2)) * 60
+
+def extract_video_metadata(title, duration_text=None, quality_text=None):
+    """(duration_seconds, video_height): primero el marcado del listado y, si falta, el título."""
+    duration_seconds = parse_duration(duration_text) or guess_duration_from_title(title)
+    video_height = parse_height(quality_text) or parse_height(title)
+    return duration_seconds, video_height
+
+def range_filter(column, bounds, use_index=True):
+    """Condiciones [mínimo, máximo) sobre `column`.
+
+    Con use_index=False la columna se compara como expresión (columna + 0) para que SQLite no use su índice:
+    en un listado ordenado por fecha con LIMIT es mucho más barato recorrer el índice de (date_added, id) y
+    descartar filas que leer todo el rango y ordenarlo en un B-tree temporal.
+    """
+    if not use_index:
+        column = column + literal_column('0')
+    minimum, maximum = bounds
+    conditions = [column >= minimum]
+    if maximum is not None:
+        conditions.append(column < maximum)
+    return conditions
+
+def backfill_video_metadata(chunk_size=BACKFILL_CHUNK_SIZE):
+    """Rellena duración y resolución del catálogo existente a partir de los títulos. Devuelve cuántos videos actualizó."""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Video.id, Video.title, Video.duration_seconds, Video.video_height)
+            .where(Video.id > last_id, (Video.duration_seconds.is_(None)) | (Video.video_height.is_(None)))
+            .order_by(Video.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            duration_seconds, video_height = extract_video_metadata(row.title)
+            values = {}
+            if row.duration_seconds is None and duration_seconds:
+                values['duration_seconds'] = duration_seconds
+            if row.video_height is None and video_height:
+                values['video_height'] = video_height
+            if values:
+                db.session.execute(update(Video).where(Video.id == row.id).values(**values))
+                updated += 1
+        db.session.commit()
+        logger.info(f"BACKFILL: Procesados videos hasta id {last_id}; {updated} actualizados.")
+    return updated
@@ -0,0 +1,161 @@
+# app/migraciones.py
+"""Cambios de esquema idempotentes que db.create_all() no cubre (tablas virtuales, triggers, índices).
+
+Se ejecutan en cada arranque justo después de create_all; cada paso comprueba si ya está aplicado.
+"""
+import logging
+
+from sqlalchemy import text
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Índice de texto completo sobre título y categoría, con contenido externo en la tabla video
+# (no duplica el texto: FTS5 solo guarda el índice y lee las columnas de video por rowid)
+VIDEO_FTS_DDL = (
+    "CREATE VIRTUAL TABLE video_fts USING fts5("
+    "title, category, content='video', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+VIDEO_FTS_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS video_fts_ai AFTER INSERT ON video BEGIN
+        INSERT INTO video_fts(rowid, title, category) VALUES (new.id, new.title, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS video_fts_ad AFTER DELETE ON video BEGIN
+        INSERT INTO video_fts(video_fts, rowid, title, category) VALUES ('delete', old.id, old.title, old.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS video_fts_au AFTER UPDATE OF title, category ON video BEGIN
+        INSERT INTO video_fts(video_fts, rowid, title, category) VALUES ('delete', old.id, old.title, old.category);
+        INSERT INTO video_fts(rowid, title, category) VALUES (new.id, new.title, new.category);
+    END""",
+)
+
+# Contadores de catalog_counter mantenidos en la misma transacción que cada INSERT/DELETE/UPDATE sobre video
+CATALOG_COUNTER_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS catalog_counter_ai AFTER INSERT ON video BEGIN
+        INSERT INTO catalog_counter(scope, key, count)
+        VALUES ('all', '', 1), ('category', COALESCE(new.category, ''), 1), ('source', COALESCE(new.source, ''), 1)
+        ON CONFLICT(scope, key) DO UPDATE SET count = count + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS catalog_counter_ad AFTER DELETE ON video BEGIN
+        UPDATE catalog_counter SET count = count - 1
+        WHERE (scope = 'all' AND key = '')
+           OR (scope = 'category' AND key = COALESCE(old.category, ''))
+           OR (scope = 'source' AND key = COALESCE(old.source, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS catalog_counter_au AFTER UPDATE OF category, source ON video BEGIN
+        UPDATE catalog_counter SET count = count - 1
+        WHERE (scope = 'category' AND key = COALESCE(old.category, ''))
+           OR (scope = 'source' AND key = COALESCE(old.source, ''));
+        INSERT INTO catalog_counter(scope, key, count)
+        VALUES ('category', COALESCE(new.category, ''), 1), ('source', COALESCE(new.source, ''), 1)
+        ON CONFLICT(scope, key) DO UPDATE SET count = count + 1;
+    END""",
+)
+
+# Los relacionados de un video borrado no sirven a nadie (los demás los filtran al leer)
+RELATED_VIDEOS_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS related_videos_ad AFTER DELETE ON video BEGIN
+        DELETE FROM related_videos WHERE video_id = old.id;
+    END""",
+)
+
+# Columnas añadidas a tablas existentes después de su creación: (tabla, columna, tipo SQL, índice)
+ADDED_COLUMNS = (
+    ('video', 'duration_seconds', 'INTEGER', 'ix_video_duration_seconds'),
+    ('video', 'video_height', 'INTEGER', 'ix_video_video_height'),
+    ('video', 'thumb_key', 'VARCHAR(40)', 'ix_video_thumb_key'),
+)
+
+# Índices compuestos declarados en los modelos que create_all no añade a tablas ya existentes
+ADDED_INDEXES = (
+    ('video', 'ix_video_date_added_id', ('date_added', 'id')),
+    ('video', 'ix_video_category_id', ('category', 'id')),
+    ('video', 'ix_video_source_id', ('source', 'id')),
+    # Listados por categoría y filtros por fuente del admin, ordenados como la paginación (date_added, id)
+    ('video', 'ix_video_category_date_added', ('category', 'date_added', 'id')),
+    ('video', 'ix_video_source_date_added', ('source', 'date_added', 'id')),
+)
+
+def _is_sqlite(conn):
+    return conn.dialect.name == 'sqlite'
+
+def _table_exists(conn, name):
+    row = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': name}).first()
+    return row is not None
+
+def _ensure_columns(conn):
+    for table, column_name, column_type, index_name in ADDED_COLUMNS:
+        existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+        if column_name not in existing:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_type}")
+            logger.info(f"MIGRATIONS: Columna {table}.{column_name} añadida.")
+        if index_name:
+            conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column_name})")
+
+def _ensure_indexes(conn):
+    for table, index_name, columns in ADDED_INDEXES:
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(columns)})")
+
+def _rebuild_catalog_counters(conn):
+    conn.exec_driver_sql("DELETE FROM catalog_counter")
+    conn.exec_driver_sql("INSERT INTO catalog_counter(scope, key, count) SELECT 'all', '', COUNT(*) FROM video")
+    for scope in ('category', 'source'):
+        conn.exec_driver_sql(f"INSERT INTO catalog_counter(scope, key, count) "
+                             f"SELECT '{scope}', COALESCE({scope}, ''), COUNT(*) FROM video GROUP BY COALESCE({scope}, '')")
+
+def _ensure_catalog_counters(conn):
+    created = not _table_exists(conn, 'catalog_counter_ai')
+    for trigger_sql in CATALOG_COUNTER_TRIGGERS:
+        conn.exec_driver_sql(trigger_sql)
+    if created:
+        # Hasta ahora nadie mantenía los contadores: se calculan una vez desde la tabla video
+        _rebuild_catalog_counters(conn)
+        logger.info("MIGRATIONS: Contadores del catálogo creados y poblados.")
+
+def _ensure_video_fts(conn):
+    if _table_exists(conn, 'video_fts'):
+        created = False
+    else:
+        try:
+            conn.exec_driver_sql(VIDEO_FTS_DDL)
+        except Exception as e:  # SQLite compilado sin FTS5: la búsqueda cae a ILIKE
+            logger.warning(f"MIGRATIONS: FTS5 no disponible, la búsqueda usará ILIKE: {e}")
+            return
+        created = True
+    for trigger_sql in VIDEO_FTS_TRIGGERS:
+        conn.exec_driver_sql(trigger_sql)
+    # Frecuencia de cada palabra en el índice (la usan los relacionados para descartar palabras demasiado comunes)
+    conn.exec_driver_sql("CREATE VIRTUAL TABLE IF NOT EXISTS video_fts_vocab USING fts5vocab(video_fts, 'row')")
+    if created:
+        # Indexar los videos que ya existían antes de crear la tabla
+        conn.exec_driver_sql("INSERT INTO video_fts(video_fts) VALUES ('rebuild')")
+        logger.info("MIGRATIONS: Índice de búsqueda video_fts creado y poblado.")
+
+def rebuild_catalog_counters():
+    """Recalcula catalog_counter desde la tabla video (si alguna vez se desincroniza)."""
+    with db.engine.begin() as conn:
+        if _is_sqlite(conn):
+            _rebuild_catalog_counters(conn)
+            return True
+    return False
+
+def rebuild_search_index():
+    """Reconstruye video_fts desde la tabla video (p. ej. tras cargas masivas hechas con los triggers desactivados)."""
+    with db.engine.begin() as conn:
+        if _is_sqlite(conn) and _table_exists(conn, 'video_fts'):
+            conn.exec_driver_sql("INSERT INTO video_fts(video_fts) VALUES ('rebuild')")
+            return True
+    return False
+
+def upgrade_schema():
+    with db.engine.begin() as conn:
+        if not _is_sqlite(conn):
+            return
+        _ensure_columns(conn)
+        _ensure_indexes(conn)
+        _ensure_catalog_counters(conn)
+        for trigger_sql in RELATED_VIDEOS_TRIGGERS:
+            conn.exec_driver_sql(trigger_sql)
+        _ensure_video_fts(conn)
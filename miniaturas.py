@@ -0,0 +1,373 @@
+# app/miniaturas.py
+"""Caché local de miniaturas: se descargan una vez, se reducen al tamaño de tarjeta y se sirven desde nuestro origen.
+
+Cada miniatura se guarda con nombre por contenido (sha256 del fichero ya reducido + extensión), así que su URL
+nunca cambia de contenido y se sirve con Cache-Control immutable. El tamaño total del directorio está acotado:
+al pasar de max_bytes se borran las menos usadas (por mtime, que se renueva al servirlas). Video.thumb_key guarda
+la clave; una miniatura expulsada se regenera desde la URL original la próxima vez que se pida.
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import io
+import ipaddress
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from sqlalchemy import select, update
+
+from app import db
+from app.modelos import Video
+from app.basedatos import run_write
+
+try:
+    import requests
+except ImportError:  # Sin requests no se descargan miniaturas: las tarjetas enlazan la URL original
+    requests = None
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Sin Pillow se guarda la imagen original tal cual (se sigue sirviendo desde nuestro origen)
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+THUMB_WIDTH = 320
+THUMB_HEIGHT = 180  # 16:9, como .video-thumbnail-container
+THUMB_FORMAT = 'WEBP'
+THUMB_QUALITY = 70
+THUMB_CACHE_MAX_MB = 512
+THUMB_FETCH_TIMEOUT = 10
+THUMB_MAX_SOURCE_BYTES = 8 * 1024 * 1024
+# Las redirecciones se siguen a mano (cada destino pasa por _check_public_url), como mucho estas
+THUMB_MAX_REDIRECTS = 3
+THUMB_PREFETCH_WORKERS = 4
+THUMB_PREFETCH_CHUNK_SIZE = 200
+# Descargas diferidas (pedidas desde /thumb/<id>): pocas a la vez y una cola acotada, fuera del hilo de la petición
+THUMB_LAZY_WORKERS = 2
+THUMB_LAZY_MAX_PENDING = 200
+# Al expulsar se baja hasta esta fracción del máximo, para no expulsar en cada miniatura nueva
+THUMB_EVICT_TARGET = 0.9
+# El mtime (orden de expulsión) se renueva como mucho una vez por este intervalo al servir una miniatura
+THUMB_TOUCH_INTERVAL = 3600
+
+THUMB_MIMETYPES = {'webp': 'image/webp', 'avif': 'image/avif', 'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif'}
+_CONTENT_TYPE_EXTENSIONS = {'image/webp': 'webp', 'image/avif': 'avif', 'image/jpeg': 'jpg', 'image/jpg': 'jpg',
+                            'image/png': 'png', 'image/gif': 'gif'}
+_KEY_RE = re.compile(r'^[0-9a-f]{32}\.(webp|avif|jpg|png|gif)$')
+_FETCH_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Accept': 'image/avif,image/webp,image/*,*/*;q=0.8',
+}
+
+
+class ThumbnailError(Exception):
+    """No se pudo descargar o convertir una miniatura."""
+
+
+def is_valid_key(key):
+    return bool(key and _KEY_RE.match(key))
+
+def _check_public_url(url):
+    """Lanza ThumbnailError si `url` no es http(s) o su host resuelve a una IP no pública.
+
+    Las URLs de miniatura salen del HTML scrapeado: sin esto una página hostil (o una redirección) haría que el
+    servidor pidiera loopback, la red interna o el servicio de metadatos de la nube.
+    """
+    parts = urlsplit(url or '')
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ThumbnailError(f"URL de miniatura no válida: {url}")
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError) as e:
+        raise ThumbnailError(f"No se pudo resolver el host de {url}: {e}") from e
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+        # is_global descarta privadas, loopback, link-local, reservadas, CGNAT...; multicast va aparte
+        if not ip.is_global or ip.is_multicast:
+            raise ThumbnailError(f"Host de miniatura con IP no pública ({ip}): {url}")
+
+
+class ThumbnailCache:
+    def __init__(self, directory=None, max_bytes=THUMB_CACHE_MAX_MB * 1024 * 1024, width=THUMB_WIDTH,
+                 height=THUMB_HEIGHT, image_format=THUMB_FORMAT, quality=THUMB_QUALITY):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.width = width
+        self.height = height
+        self.image_format = image_format.upper()
+        self.quality = quality
+        self._total_bytes = None  # Se calcula recorriendo el directorio la primera vez que hace falta
+        self._lock = threading.Lock()
+        self._http_local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.directory is not None and requests is not None
+
+    def path_for(self, key):
+        # Dos niveles de directorio para no acumular cientos de miles de ficheros en uno solo
+        return os.path.join(self.directory, key[:2], key)
+
+    def exists(self, key):
+        return is_valid_key(key) and os.path.exists(self.path_for(key))
+
+    def touch(self, key):
+        """Marca la miniatura como usada (orden de expulsión), sin escribir en disco en cada petición."""
+        path = self.path_for(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > THUMB_TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _http_session(self):
+        session = getattr(self._http_local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(_FETCH_HEADERS)
+            self._http_local.session = session
+        return session
+
+    def _download(self, url):
+        try:
+            for _ in range(THUMB_MAX_REDIRECTS + 1):
+                _check_public_url(url)
+                with self._http_session().get(url, timeout=THUMB_FETCH_TIMEOUT, stream=True, allow_redirects=False) as response:
+                    if response.is_redirect:
+                        url = urljoin(url, response.headers['Location'])
+                        continue
+                    response.raise_for_status()
+                    content_type = (response.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+                    chunks, size = [], 0
+                    for chunk in response.iter_content(64 * 1024):
+                        size += len(chunk)
+                        if size > THUMB_MAX_SOURCE_BYTES:
+                            raise ThumbnailError(f"Miniatura demasiado grande (> {THUMB_MAX_SOURCE_BYTES} bytes): {url}")
+                        chunks.append(chunk)
+                    return b''.join(chunks), content_type
+        except requests.RequestException as e:
+            raise ThumbnailError(f"Error descargando {url}: {e}") from e
+        raise ThumbnailError(f"Demasiadas redirecciones (> {THUMB_MAX_REDIRECTS}): {url}")
+
+    def _resize(self, data, content_type):
+        """(bytes, extensión) de la miniatura a tamaño de tarjeta; sin Pillow, la imagen original."""
+        if Image is None:
+            extension = _CONTENT_TYPE_EXTENSIONS.get(content_type)
+            if extension is None:
+                raise ThumbnailError(f"Tipo de imagen no soportado: {content_type or 'desconocido'}")
+            return data, extension
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image = ImageOps.exif_transpose(image)
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+                # Recorta al 16:9 de la tarjeta y reduce (cover), como object-fit: cover en el CSS
+                card = ImageOps.fit(image, (self.width, self.height), method=Image.Resampling.LANCZOS)
+                output = io.BytesIO()
+                save_options = {'quality': self.quality}
+                if self.image_format == 'WEBP':
+                    save_options['method'] = 4  # Compresión algo mejor a cambio de un poco más de CPU al ingerir
+                card.save(output, format=self.image_format, **save_options)
+        except Exception as e:
+            raise ThumbnailError(f"No se pudo convertir la imagen: {e}") from e
+        return output.getvalue(), self.image_format.lower()
+
+    def store(self, data, extension):
+        """Guarda `data` con nombre por contenido y devuelve la clave (no reescribe si ya existía)."""
+        key = f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
+        path = self.path_for(key)
+        if os.path.exists(path):
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)  # Atómico: nadie sirve nunca un fichero a medio escribir
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(data)
+        self._evict_if_needed()
+        return key
+
+    def fetch(self, url):
+        """Descarga, reduce y guarda la miniatura de `url`; devuelve su clave o lanza ThumbnailError."""
+        if not self.enabled:
+            raise ThumbnailError("Thumbnail cache is disabled")
+        data, content_type = self._download(url)
+        return self.store(*self._resize(data, content_type))
+
+    def _scan(self):
+        entries = []
+        for sub_entry in os.scandir(self.directory):
+            if not sub_entry.is_dir():
+                continue
+            for entry in os.scandir(sub_entry.path):
+                if entry.is_file() and is_valid_key(entry.name):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan()) if os.path.isdir(self.directory) else 0
+            if self._total_bytes <= self.max_bytes:
+                return
+            entries = sorted(self._scan())  # Los de mtime más antiguo primero
+            target = int(self.max_bytes * THUMB_EVICT_TARGET)
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    evicted += 1
+                except OSError:
+                    pass
+            self._total_bytes = total
+        logger.info(f"THUMBS: Expulsadas {evicted} miniaturas; la caché ocupa {total // (1024 * 1024)} MB.")
+
+    def stats(self):
+        with self._lock:
+            return {'directory': self.directory, 'bytes': self._total_bytes, 'max_bytes': self.max_bytes}
+
+
+thumbnail_cache = ThumbnailCache()
+
+def configure_thumbnail_cache(directory, max_bytes=THUMB_CACHE_MAX_MB * 1024 * 1024, width=THUMB_WIDTH,
+                              height=THUMB_HEIGHT, image_format=THUMB_FORMAT, quality=THUMB_QUALITY):
+    thumbnail_cache.directory = directory
+    thumbnail_cache.max_bytes = max_bytes
+    thumbnail_cache.width = width
+    thumbnail_cache.height = height
+    thumbnail_cache.image_format = image_format.upper()
+    thumbnail_cache.quality = quality
+    thumbnail_cache._total_bytes = None
+    if requests is None:
+        logger.warning("THUMBS: requests no está instalado; las tarjetas usarán la URL original de la miniatura.")
+    elif Image is None:
+        logger.warning("THUMBS: Pillow no está instalado; las miniaturas se guardarán sin reducir.")
+    return thumbnail_cache
+
+
+def _save_thumb_keys(keys_by_video):
+    db.session.execute(update(Video), [{'id': video_id, 'thumb_key': key} for video_id, key in keys_by_video.items()])
+    db.session.commit()
+
+def ensure_video_thumbnail(video_id, thumbnail_url, thumb_key=None):
+    """Clave de la miniatura en caché de un video, descargándola si falta (y guardando thumb_key si cambió)."""
+    if thumbnail_cache.exists(thumb_key):
+        return thumb_key
+    key = thumbnail_cache.fetch(thumbnail_url)
+    if key != thumb_key:
+        run_write(_save_thumb_keys, {video_id: key})
+    return key
+
+class ThumbnailFetcher:
+    """Descargas de miniaturas pedidas por las tarjetas, en segundo plano y con concurrencia y cola acotadas.
+
+    La petición nunca espera la descarga: sirve la URL original y la próxima vez la tarjeta ya tiene thumb_key.
+    Un mismo video no se encola dos veces, y con la cola llena se descarta (lo recogerá el prefetch).
+    """
+
+    def __init__(self, workers=THUMB_LAZY_WORKERS, max_pending=THUMB_LAZY_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._app = None
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def start(self, app, workers=None, max_pending=None):
+        with self._lock:
+            self._app = app
+            if workers is not None:
+                self.workers = workers
+            if max_pending is not None:
+                self.max_pending = max_pending
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='thumbs-lazy')
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def enqueue(self, video_id, thumbnail_url, thumb_key=None):
+        """Encola la descarga de la miniatura de un video. False si no se encoló (cola llena, ya en curso o parado)."""
+        with self._lock:
+            if self._executor is None or video_id in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.add(video_id)
+            self._executor.submit(self._fetch, video_id, thumbnail_url, thumb_key)
+        return True
+
+    def _fetch(self, video_id, thumbnail_url, thumb_key):
+        try:
+            with self._app.app_context():
+                ensure_video_thumbnail(video_id, thumbnail_url, thumb_key)
+        except ThumbnailError as e:
+            logger.info(f"THUMBS: Miniatura del video {video_id} no disponible: {e}")
+        except Exception as e:
+            logger.error(f"THUMBS: Error descargando la miniatura del video {video_id}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._pending.discard(video_id)
+
+
+thumbnail_fetcher = ThumbnailFetcher()
+
+def configure_thumbnail_fetcher(app, workers=THUMB_LAZY_WORKERS, max_pending=THUMB_LAZY_MAX_PENDING):
+    if thumbnail_cache.enabled:
+        thumbnail_fetcher.start(app, workers=workers, max_pending=max_pending)
+    else:
+        thumbnail_fetcher.shutdown()
+    return thumbnail_fetcher
+
+def prefetch_thumbnails(min_id=None, chunk_size=THUMB_PREFETCH_CHUNK_SIZE, workers=THUMB_PREFETCH_WORKERS,
+                        should_stop=None, progress=None):
+    """Descarga al ingerir las miniaturas de los videos con id > `min_id` que aún no tienen thumb_key.
+
+    Procesa por bloques de clave primaria con `workers` descargas en paralelo y guarda las claves con un UPDATE
+    por lotes por bloque (por el hilo escritor). Devuelve cuántas miniaturas quedaron en caché.
+    """
+    if not thumbnail_cache.enabled:
+        return 0
+    cached = 0
+    last_id = min_id or 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbs') as executor:
+        while True:
+            if should_stop and should_stop():
+                break
+            rows = db.session.execute(
+                select(Video.id, Video.thumbnail)
+                .where(Video.id > last_id, Video.thumb_key.is_(None), Video.thumbnail.isnot(None))
+                .order_by(Video.id).limit(chunk_size)
+            ).all()
+            db.session.rollback()  # No dejar la lectura abierta mientras se descarga
+            if not rows:
+                break
+            last_id = rows[-1].id
+            futures = {row.id: executor.submit(thumbnail_cache.fetch, row.thumbnail) for row in rows}
+            keys_by_video = {}
+            for video_id, future in futures.items():
+                try:
+                    keys_by_video[video_id] = future.result()
+                except ThumbnailError as e:
+                    logger.debug(f"THUMBS: Video {video_id}: {e}")
+            if keys_by_video:
+                run_write(_save_thumb_keys, keys_by_video)
+            cached += len(keys_by_video)
+            if progress:
+                progress(cached)
+            logger.info(f"THUMBS: Miniaturas en caché hasta el video {last_id}: {cached}.")
+    return cached
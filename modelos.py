@@ -14,9 +14,55 @@ class Video(db.Model):
     # --- CAMPOS NUEVOS Y ESENCIALES PARA SCRAPER v2 ---
     original_cleaned_url = db.Column(db.String(500), unique=True, index=True, nullable=True)
     original_page_url = db.Column(db.String(500), nullable=True) # URL de la página original del video
+    duration_seconds = db.Column(db.Integer, nullable=True, index=True) # Duración leída del listado (o del título)
+    video_height = db.Column(db.Integer, nullable=True, index=True) # Resolución vertical: 720, 1080, 2160...
+    thumb_key = db.Column(db.String(40), nullable=True, index=True) # Miniatura en la caché local (ver miniaturas.py)
     # url_type = db.Column(db.String(50), nullable=True) # Opcional: para guardar 'embed' o 'direct'
 
+    # Orden de los listados y clave de la paginación por cursor (ver paginacion.py)
+    __table_args__ = (
+        db.Index('ix_video_date_added_id', 'date_added', 'id'),
+        db.Index('ix_video_category_id', 'category', 'id'), # Filtros por categoría y /random?category=
+        db.Index('ix_video_source_id', 'source', 'id'),
+        db.Index('ix_video_category_date_added', 'category', 'date_added', 'id'), # Listados por categoría (orden de la paginación)
+        db.Index('ix_video_source_date_added', 'source', 'date_added', 'id'), # Filtro por fuente del panel
+    )
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
+
+class ScrapeCheckpoint(db.Model):
+    """Marca de agua por sitio para el scrape incremental (URLs de página limpias, una por línea)."""
+    id = db.Column(db.Integer, primary_key=True)
+    site_name = db.Column(db.String(50), unique=True, nullable=False)
+    head_urls = db.Column(db.Text, nullable=True) # Primeros items del listado "newest" la última vez que se alcanzó contenido conocido
+    recent_urls = db.Column(db.Text, nullable=True) # Últimas URLs ingeridas, para saltarlas sin gastar presupuesto
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CatalogCounter(db.Model):
+    """Conteo mantenido de videos: total ('all'), por categoría y por fuente. Lo actualizan triggers de la BD (ver migraciones.py)."""
+    __table_args__ = (db.UniqueConstraint('scope', 'key', name='uq_catalog_counter_scope_key'),)
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(20), nullable=False) # 'all', 'category' o 'source'
+    key = db.Column(db.String(100), nullable=False, default='') # Nombre de la categoría/fuente ('' para 'all' o nulos)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class RelatedVideos(db.Model):
+    """Relacionados precalculados de un video (ver relacionados.py). Se borra con su video por trigger."""
+    __tablename__ = 'related_videos'
+    video_id = db.Column(db.Integer, db.ForeignKey('video.id'), primary_key=True)
+    related_ids = db.Column(db.Text, nullable=True) # Ids separados por comas, de mayor a menor puntuación
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class JobCheckpoint(db.Model):
+    """Progreso de un trabajo por lotes reanudable (p. ej. la reparación de URLs): último id confirmado y contadores."""
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(50), unique=True, nullable=False)
+    last_id = db.Column(db.Integer, nullable=False, default=0) # Se confirma en la misma transacción que el bloque
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    changed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    completed_at = db.Column(db.DateTime, nullable=True) # None mientras quede trabajo pendiente
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,101 @@
+# app/paginacion.py
+"""Paginación por cursor (keyset) de los listados de videos sobre (date_added, id).
+
+Los enlaces Siguiente/Anterior llevan un cursor opaco con la clave del último/primer video mostrado, así
+que cualquier página cuesta lo mismo que la primera y no se desplaza si un scrape inserta videos mientras
+se navega. Las URLs con ?page=N siguen funcionando con OFFSET, y las búsquedas (ordenadas por relevancia)
+se paginan siempre por OFFSET.
+"""
+import base64
+from datetime import datetime
+import json
+import logging
+
+from sqlalchemy import tuple_
+
+from app.modelos import Video
+
+logger = logging.getLogger(__name__)
+
+# Con ?page=N se enlazan números de página hasta este límite; más allá solo se navega con cursores
+MAX_OFFSET_PAGE = 50
+
+
+class ListingPage:
+    max_offset_page = MAX_OFFSET_PAGE
+
+    def __init__(self, items, page, has_next, has_prev, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.page = page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def encode_cursor(video, page, before=False):
+    """Cursor opaco con la clave de orden de `video` y el número de página al que lleva."""
+    payload = {'d': video.date_added.isoformat() if video.date_added else None, 'i': video.id, 'p': page}
+    if before:
+        payload['b'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """(date_added, id, página, before) o None si el cursor no es válido."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        date_added = datetime.fromisoformat(payload['d']) if payload.get('d') else None
+        return date_added, int(payload['i']), max(1, int(payload.get('p', 1))), bool(payload.get('b'))
+    except (ValueError, KeyError, TypeError) as e:
+        logger.debug(f"PAGINATION: Cursor inválido '{token}': {e}")
+        return None
+
+def _newest_first(query):
+    return query.order_by(Video.date_added.desc(), Video.id.desc())
+
+def _paginate_offset(query, page, per_page, with_cursors=True):
+    page = max(1, page)
+    rows = _newest_first(query).offset((page - 1) * per_page).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    items = rows[:per_page]
+    if not with_cursors or not items:
+        return ListingPage(items, page, has_next, page > 1)
+    return ListingPage(items, page, has_next, page > 1,
+                       next_cursor=encode_cursor(items[-1], page + 1) if has_next else None,
+                       prev_cursor=encode_cursor(items[0], page - 1, before=True) if page > 1 else None)
+
+def paginate_videos(query, per_page, page=1, cursor=None, ranked=False):
+    """Pagina `query` (sobre Video) de más nuevo a más antiguo.
+
+    Con un `cursor` válido usa keyset sobre (date_added, id); si no, OFFSET con `page`. Con `ranked` (búsquedas
+    ordenadas por relevancia) los cursores no aplican y siempre se usa OFFSET.
+    """
+    decoded = None if ranked else decode_cursor(cursor)
+    if decoded is None or decoded[0] is None:
+        return _paginate_offset(query, page, per_page, with_cursors=not ranked)
+
+    date_added, video_id, page, before = decoded
+    key = tuple_(Video.date_added, Video.id)
+    if before:
+        rows = (query.filter(key > (date_added, video_id))
+                .order_by(Video.date_added.asc(), Video.id.asc())
+                .limit(per_page + 1).all())
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+        if not has_prev:
+            page = 1
+    else:
+        rows = _newest_first(query.filter(key < (date_added, video_id))).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = True
+    if not items:
+        return ListingPage([], page, False, has_prev)
+    return ListingPage(items, page, has_next, has_prev,
+                       next_cursor=encode_cursor(items[-1], page + 1) if has_next else None,
+                       prev_cursor=encode_cursor(items[0], page - 1, before=True) if has_prev else None)
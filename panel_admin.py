@@ -0,0 +1,161 @@
+# app/panel_admin.py
+"""Tabla de videos del panel de administración: filtros en el servidor, borrado por filtro y exportación CSV.
+
+Los filtros (búsqueda, fuente, categoría, rango de fechas) viajan en la query string o en el formulario, así
+que el navegador nunca necesita la lista de ids: "borrar todos los que coinciden" y la exportación recorren
+la consulta por bloques de clave primaria.
+"""
+import csv
+from datetime import datetime, timedelta
+import io
+import logging
+
+from sqlalchemy import delete, select
+
+from app import db
+from app.modelos import Video
+from app.busqueda import apply_search, search_tokens
+from app.basedatos import run_write
+
+logger = logging.getLogger(__name__)
+
+ADMIN_VIDEOS_PER_PAGE = 100
+ADMIN_CHUNK_SIZE = 500  # También por debajo del límite de parámetros de SQLite en los IN (...)
+ADMIN_FILTER_FIELDS = ('search', 'source', 'category', 'date_from', 'date_to')
+CSV_EXPORT_COLUMNS = ('id', 'title', 'category', 'source', 'date_added', 'duration_seconds', 'video_height',
+                      'embed_url', 'thumbnail', 'original_page_url')
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        logger.warning(f"ADMIN: Fecha de filtro inválida '{value}', se ignora.")
+        return None
+
+def admin_filters(values):
+    """Filtros del panel a partir de request.args o request.form (solo los que traen valor)."""
+    filters = {}
+    for field in ADMIN_FILTER_FIELDS:
+        value = (values.get(field) or '').strip()
+        if value:
+            filters[field] = value
+    return filters
+
+def filter_errors(filters):
+    """Mensajes de error de los filtros que filter_videos ignoraría (fecha inválida, búsqueda sin palabras).
+
+    Para listar basta con ignorarlos, pero un borrado por filtro con un filtro ignorado borraría de más.
+    """
+    errors = []
+    for field in ('date_from', 'date_to'):
+        value = filters.get(field)
+        if value and _parse_date(value) is None:
+            errors.append(f"Invalid date '{value}' for {field} (expected YYYY-MM-DD).")
+    if filters.get('search') and not search_tokens(filters['search']):
+        errors.append(f"Search '{filters['search']}' has no searchable words.")
+    return errors
+
+def filter_videos(filters, query=None):
+    """Aplica `filters` sobre Video.query; la búsqueda usa el índice FTS (y por tanto ordena por relevancia)."""
+    query = query if query is not None else Video.query
+    if filters.get('source'):
+        query = query.filter(Video.source == filters['source'])
+    if filters.get('category'):
+        query = query.filter(Video.category == filters['category'])
+    date_from = _parse_date(filters.get('date_from'))
+    if date_from:
+        query = query.filter(Video.date_added >= date_from)
+    date_to = _parse_date(filters.get('date_to'))
+    if date_to:
+        # Fecha final inclusiva: hasta el comienzo del día siguiente
+        query = query.filter(Video.date_added < date_to + timedelta(days=1))
+    return apply_search(query, filters.get('search', ''))
+
+def counter_for_filters(filters):
+    """(scope, key) del contador de catalog_counter equivalente a `filters`, o (None, '') si no lo hay."""
+    if not filters:
+        return 'all', ''
+    if set(filters) == {'source'}:
+        return 'source', filters['source']
+    if set(filters) == {'category'}:
+        return 'category', filters['category']
+    return None, ''
+
+def parse_video_ids(values):
+    """Ids válidos (enteros, sin repetir) de una lista de cadenas del formulario; los inválidos se registran y se ignoran."""
+    video_ids = set()
+    for value in values:
+        try:
+            video_ids.add(int(value))
+        except (TypeError, ValueError):
+            logger.warning(f"ADMIN: Invalid video ID received for deletion: {value}")
+    return sorted(video_ids)
+
+def delete_videos_by_ids(video_ids, chunk_size=ADMIN_CHUNK_SIZE):
+    """Borra los videos dados con un DELETE ... WHERE id IN (...) por bloque, en una sola transacción.
+
+    Devuelve cuántos existían y se borraron. Los triggers de la BD mantienen catalog_counter, video_fts y
+    related_videos; quien llama debe invalidar el catálogo después.
+    """
+    return run_write(_delete_videos_by_ids, video_ids, chunk_size)
+
+def _delete_videos_by_ids(video_ids, chunk_size):
+    deleted = 0
+    for start in range(0, len(video_ids), chunk_size):
+        chunk = video_ids[start:start + chunk_size]
+        result = db.session.execute(delete(Video).where(Video.id.in_(chunk)), execution_options={'synchronize_session': False})
+        deleted += result.rowcount or 0
+    db.session.commit()
+    return deleted
+
+def delete_matching_videos(filters, chunk_size=ADMIN_CHUNK_SIZE):
+    """Borra todos los videos que cumplen `filters` por bloques, confirmando cada uno. Devuelve cuántos borró.
+
+    Cada bloque es una sola sentencia (DELETE ... WHERE id IN (SELECT id ... LIMIT n)), así que los ids no pasan
+    por Python y ninguna transacción bloquea la BD mucho tiempo. Igual que delete_videos_by_ids, quien llama
+    debe invalidar el catálogo después.
+    """
+    errors = filter_errors(filters)
+    if errors:
+        raise ValueError(' '.join(errors))
+    deleted = 0
+    while True:
+        # Un bloque por tarea del hilo escritor: un scrape que se guarde a la vez se intercala entre bloques
+        chunk_deleted = run_write(_delete_matching_chunk, filters, chunk_size)
+        if not chunk_deleted:
+            break
+        deleted += chunk_deleted
+        logger.info(f"ADMIN: Borrados {deleted} videos que coinciden con {filters}.")
+    return deleted
+
+def _delete_matching_chunk(filters, chunk_size):
+    # Lo ya borrado desaparece de la subconsulta: cada vuelta toma los siguientes
+    chunk_ids = (filter_videos(filters).with_entities(Video.id)
+                 .order_by(None).order_by(Video.id).limit(chunk_size).subquery())
+    result = db.session.execute(delete(Video).where(Video.id.in_(select(chunk_ids.c.id))),
+                                execution_options={'synchronize_session': False})
+    db.session.commit()
+    return result.rowcount or 0
+
+def iter_videos_csv(filters, chunk_size=ADMIN_CHUNK_SIZE):
+    """Genera el CSV de los videos que cumplen `filters` bloque a bloque (para una respuesta en streaming)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    columns = [getattr(Video, name) for name in CSV_EXPORT_COLUMNS]
+    last_id = 0
+    while True:
+        rows = (filter_videos(filters).with_entities(*columns)
+                .filter(Video.id > last_id).order_by(None).order_by(Video.id)
+                .limit(chunk_size).all())
+        if not rows:
+            return
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            writer.writerow(['' if value is None else value.isoformat() if isinstance(value, datetime) else value
+                             for value in row])
+        yield buffer.getvalue()
+        last_id = rows[-1][0]
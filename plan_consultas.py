@@ -0,0 +1,144 @@
+# app/plan_consultas.py
+"""Comprobación de los planes de consulta (EXPLAIN QUERY PLAN) de los listados.
+
+Cada consulta de LISTING_PLAN_CHECKS debe resolverse con índices: si SQLite recorre la tabla video entera o
+necesita un B-tree temporal para el ORDER BY, la comprobación falla. Las búsquedas (ordenadas por bm25) no se
+incluyen, porque su orden por relevancia siempre requiere ordenar los resultados.
+
+Uso: python -m app.plan_consultas [videos]   -> crea una BD temporal con ese número de videos y la comprueba
+     flask check-query-plans                  -> comprueba la BD configurada
+"""
+from datetime import datetime, timedelta
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+
+from sqlalchemy import insert, tuple_
+
+from app import db
+from app.modelos import Video
+
+logger = logging.getLogger(__name__)
+
+SEED_VIDEOS = 20000
+SEED_CATEGORIES = ['General', 'Amateur', 'Latina', 'MILF', 'Teen', 'Asian', 'Ebony', 'Anal', 'Lesbian', 'Blonde']
+SEED_SOURCES = ['EPorner', 'Xvideos', 'Pornhub', 'RedTube', 'SpankBang', 'YouPorn']
+
+# Un recorrido de la tabla sin índice ("SCAN video", sin USING) o un ordenamiento en B-tree temporal
+_FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?video( AS \w+)?$')
+_TEMP_SORT_RE = re.compile(r'^USE TEMP B-TREE FOR (ORDER BY|RIGHT PART OF ORDER BY)')
+
+
+def _newest_first(query, per_page=60):
+    return query.order_by(Video.date_added.desc(), Video.id.desc()).limit(per_page + 1)
+
+def _after_cursor(query):
+    # Igual que una página pedida con cursor en paginacion.paginate_videos
+    return _newest_first(query.filter(tuple_(Video.date_added, Video.id) < (datetime.utcnow() - timedelta(days=3), 10 ** 9)))
+
+def listing_plan_checks():
+    """[(nombre, consulta)] con las consultas de los listados de rutas.py, panel_admin.py y relacionados.py."""
+    from app.rutas import listing_query
+    from app.panel_admin import filter_videos
+
+    def listing(kind, value=None):
+        return listing_query(kind, value)[0]
+
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    month_ago = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+    return [
+        ('index', _newest_first(listing('all'))),
+        ('index (cursor)', _after_cursor(listing('all'))),
+        ('category', _newest_first(listing('category', 'Amateur'))),
+        ('category (cursor)', _after_cursor(listing('category', 'Amateur'))),
+        ('quality', _newest_first(listing('quality', 'hd'))),
+        ('quality (cursor)', _after_cursor(listing('quality', 'hd'))),
+        ('duration', _newest_first(listing('duration', 'short'))),
+        ('trending week', _newest_first(listing('trending', 'week'))),
+        ('trending all', _newest_first(listing('trending', 'all'))),
+        ('admin source', _newest_first(filter_videos({'source': 'EPorner'}))),
+        ('admin source (cursor)', _after_cursor(filter_videos({'source': 'EPorner'}))),
+        ('admin date range', _newest_first(filter_videos({'date_from': month_ago, 'date_to': today}))),
+        ('related fallback', Video.query.filter(Video.category == 'Amateur', Video.id != 1).order_by(Video.id.desc()).limit(6)),
+        ('random by category', Video.query.filter(Video.id >= 1000, Video.category == 'Amateur').order_by(Video.id).limit(1)),
+    ]
+
+def explain(query):
+    """Líneas de EXPLAIN QUERY PLAN de `query` (una consulta ORM sobre la BD configurada)."""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = compiled.params
+    values = tuple(params[name] for name in compiled.positiontup)
+    # El driver sqlite3 no adapta datetime por sí solo (sin los bind processors de SQLAlchemy)
+    values = tuple(value.isoformat(' ') if isinstance(value, datetime) else value for value in values)
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", values).all()
+    return [row[-1] for row in rows]
+
+def plan_problems(plan):
+    return [detail for detail in plan if _FULL_SCAN_RE.match(detail) or _TEMP_SORT_RE.match(detail)]
+
+def check_query_plans():
+    """[(nombre, plan, problemas)] para cada consulta de listing_plan_checks()."""
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError("EXPLAIN QUERY PLAN checks need a SQLite database")
+    results = []
+    for name, query in listing_plan_checks():
+        plan = explain(query)
+        results.append((name, plan, plan_problems(plan)))
+    return results
+
+def report(results, out=sys.stdout):
+    """Imprime los planes y devuelve True si ninguna consulta tiene problemas."""
+    ok = True
+    for name, plan, problems in results:
+        status = 'OK' if not problems else 'FAIL'
+        ok = ok and not problems
+        print(f"[{status}] {name}", file=out)
+        for detail in plan:
+            print(f"        {detail}", file=out)
+    return ok
+
+def seed_videos(count=SEED_VIDEOS, chunk_size=5000):
+    """Inserta `count` videos sintéticos (categorías, fuentes, fechas y metadatos variados) en la BD configurada."""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    inserted = 0
+    while inserted < count:
+        rows = []
+        for i in range(inserted, min(count, inserted + chunk_size)):
+            rows.append({
+                'title': f"seed video {i}",
+                'embed_url': f"https://example.com/embed/{i}",
+                'category': rng.choice(SEED_CATEGORIES),
+                'source': rng.choice(SEED_SOURCES),
+                'date_added': now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+                'original_cleaned_url': f"https://example.com/video/{i}",
+                'duration_seconds': rng.choice([None, rng.randint(60, 5400)]),
+                'video_height': rng.choice([None, 360, 480, 720, 1080, 2160]),
+            })
+        db.session.execute(insert(Video), rows)
+        db.session.commit()
+        inserted += len(rows)
+    return inserted
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if argv else SEED_VIDEOS
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp_dir, 'plan_check.db')
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        from app import create_app
+        app = create_app()
+        with app.app_context():
+            seed_videos(count)
+            ok = report(check_query_plans())
+            db.engine.dispose()
+    print(f"{count} videos: {'all listing queries use indexes' if ok else 'some listing queries scan or sort'}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
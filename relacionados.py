@@ -0,0 +1,231 @@
+# app/relacionados.py
+"""Videos relacionados precalculados (tabla related_videos) para la página de reproducción.
+
+Cada video guarda la lista ordenada de ids de sus relacionados, así ver_video solo hace una búsqueda por clave
+primaria. Tras cada scrape (tareas.ScrapeJob) se calculan los de los videos nuevos y se recalculan los de sus
+vecinos ya existentes (related_neighbour_ids): los que comparten palabras poco frecuentes del título con alguno
+nuevo y los más recientes de sus categorías y fuentes. El resto del catálogo se refresca entero con
+tareas.RelatedRefreshJob desde el panel.
+"""
+from datetime import datetime
+import logging
+import re
+
+from sqlalchemy import Integer, bindparam, column, delete, func, insert, text
+
+from app import db
+from app.modelos import Video, RelatedVideos
+from app.busqueda import fts_available
+from app.catalogo import counters_available, get_counter
+from app.basedatos import run_write
+
+logger = logging.getLogger(__name__)
+
+RELATED_VIDEOS_LIMIT = 6
+# Candidatos que se puntúan por video: por título (FTS) y los más recientes de su categoría y de su fuente
+RELATED_TITLE_CANDIDATES = 40
+RELATED_RECENT_CANDIDATES = 20
+RELATED_REFRESH_CHUNK_SIZE = 200
+# Tras un scrape, cuántos videos existentes (los más recientes) de cada categoría y fuente de los nuevos se recalculan
+RELATED_NEIGHBOUR_RECENT = 200
+# Palabras del título usadas para buscar candidatos: las menos frecuentes, descartando las que aparecen en más
+# de esta fracción del catálogo (buscarlas obligaría a puntuar casi todo el índice)
+RELATED_MAX_QUERY_TOKENS = 5
+RELATED_MAX_TOKEN_DOC_SHARE = 0.05
+
+# Pesos de la puntuación
+TITLE_SIMILARITY_WEIGHT = 3.0
+CATEGORY_WEIGHT = 1.0
+# Casi todo el catálogo está en estas categorías, así que compartirlas dice poco
+GENERIC_CATEGORY_WEIGHT = 0.2
+GENERIC_CATEGORIES = {'General'}
+SOURCE_WEIGHT = 0.5
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'of', 'in', 'on', 'with', 'to', 'for', 'her', 'his', 'my', 'is', 'at', 'by',
+    'el', 'la', 'los', 'las', 'de', 'del', 'y', 'en', 'con', 'por', 'para', 'un', 'una',
+    'hd', '4k', '1080p', '720p', 'video', 'videos',
+}
+
+def title_tokens(title):
+    return {word for word in _WORD_RE.findall((title or '').lower()) if len(word) > 2 and word not in _STOPWORDS}
+
+def score_candidate(video, video_tokens, candidate, candidate_tokens):
+    score = 0.0
+    if video_tokens and candidate_tokens:
+        score += TITLE_SIMILARITY_WEIGHT * len(video_tokens & candidate_tokens) / len(video_tokens | candidate_tokens)
+    if video.category and candidate.category == video.category:
+        score += GENERIC_CATEGORY_WEIGHT if video.category in GENERIC_CATEGORIES else CATEGORY_WEIGHT
+    if video.source and candidate.source == video.source:
+        score += SOURCE_WEIGHT
+    return score
+
+class TokenFrequencies:
+    """Nº de videos que contienen cada palabra (video_fts_vocab) y total de videos, para elegir las palabras de búsqueda.
+
+    Solo se consultan las palabras que hacen falta (WHERE term IN ...) y se recuerdan mientras dure el objeto, así
+    un refresco en bloque no carga todo el vocabulario ni pregunta dos veces por la misma palabra.
+    """
+
+    def __init__(self):
+        self.available = fts_available()
+        self.total = 0
+        if self.available:
+            self.total = get_counter() if counters_available() else db.session.query(func.count(Video.id)).scalar() or 0
+        self._doc_freq = {}
+
+    def lookup(self, tokens):
+        missing = [token for token in tokens if token not in self._doc_freq]
+        if missing and self.available:
+            rows = db.session.execute(
+                text("SELECT term, doc FROM video_fts_vocab WHERE term IN :terms")
+                .bindparams(bindparam('terms', expanding=True)), {'terms': missing}
+            ).all()
+            found = {term: doc for term, doc in rows}
+            for token in missing:
+                self._doc_freq[token] = found.get(token, 0)
+        return {token: self._doc_freq.get(token, 0) for token in tokens}
+
+def _query_tokens(tokens, token_frequencies):
+    if not token_frequencies.total:
+        return sorted(tokens)[:RELATED_MAX_QUERY_TOKENS]
+    doc_freq = token_frequencies.lookup(tokens)
+    max_docs = max(1, int(token_frequencies.total * RELATED_MAX_TOKEN_DOC_SHARE))
+    selective = [token for token in tokens if doc_freq[token] <= max_docs]
+    return sorted(selective, key=lambda token: (doc_freq[token], token))[:RELATED_MAX_QUERY_TOKENS]
+
+def _title_candidate_ids(tokens, token_frequencies):
+    if not tokens or not fts_available():
+        return []
+    query_tokens = _query_tokens(tokens, token_frequencies)
+    if not query_tokens:
+        return []
+    # Cualquiera de las palabras elegidas; bm25 ya prioriza los que comparten más
+    match = '{title} : (' + ' OR '.join(f'"{token}"' for token in query_tokens) + ')'
+    rows = db.session.execute(
+        text("SELECT rowid FROM video_fts WHERE video_fts MATCH :match ORDER BY rank LIMIT :limit")
+        .bindparams(match=match, limit=RELATED_TITLE_CANDIDATES + 1)
+        .columns(column('rowid', Integer))
+    ).all()
+    return [row[0] for row in rows]
+
+def compute_related_ids(video, token_frequencies=None):
+    """Ids de los RELATED_VIDEOS_LIMIT mejores relacionados de `video`, de mayor a menor puntuación.
+
+    `token_frequencies` es un TokenFrequencies; al refrescar en bloque se comparte entre todos los videos.
+    """
+    if token_frequencies is None:
+        token_frequencies = TokenFrequencies()
+    tokens = title_tokens(video.title)
+    candidate_ids = set(_title_candidate_ids(tokens, token_frequencies))
+    for field, value in ((Video.category, video.category), (Video.source, video.source)):
+        if value:
+            # (categoría, id) y (fuente, id) están indexados: los más recientes salen sin ordenar la tabla
+            recent = (db.session.query(Video.id).filter(field == value, Video.id != video.id)
+                      .order_by(Video.id.desc()).limit(RELATED_RECENT_CANDIDATES).all())
+            candidate_ids.update(row[0] for row in recent)
+    candidate_ids.discard(video.id)
+    if not candidate_ids:
+        return []
+
+    candidates = (db.session.query(Video.id, Video.title, Video.category, Video.source)
+                  .filter(Video.id.in_(candidate_ids)).all())
+    scored = sorted(candidates, key=lambda c: (score_candidate(video, tokens, c, title_tokens(c.title)), c.id), reverse=True)
+    return [candidate.id for candidate in scored[:RELATED_VIDEOS_LIMIT]]
+
+def store_related_ids(related_by_video):
+    """Sustituye las filas de related_videos de los videos dados ({video_id: [ids]}) con un DELETE y un INSERT."""
+    if not related_by_video:
+        return
+    now = datetime.utcnow()
+    db.session.execute(delete(RelatedVideos).where(RelatedVideos.video_id.in_(list(related_by_video))))
+    db.session.execute(insert(RelatedVideos), [
+        {'video_id': video_id, 'related_ids': ','.join(str(related_id) for related_id in related_ids), 'updated_at': now}
+        for video_id, related_ids in related_by_video.items()
+    ])
+
+def _store_related_chunk(related_by_video):
+    # Un video borrado mientras se calculaba el bloque ya no debe recibir fila (su trigger no volvería a saltar)
+    existing_ids = {row[0] for row in db.session.query(Video.id).filter(Video.id.in_(list(related_by_video))).all()}
+    store_related_ids({video_id: related_ids for video_id, related_ids in related_by_video.items() if video_id in existing_ids})
+    db.session.commit()
+
+def _video_chunks(min_id, video_ids, chunk_size):
+    if video_ids is not None:
+        for start in range(0, len(video_ids), chunk_size):
+            yield Video.query.filter(Video.id.in_(video_ids[start:start + chunk_size])).order_by(Video.id).all()
+        return
+    last_id = min_id or 0
+    while True:
+        videos = Video.query.filter(Video.id > last_id).order_by(Video.id).limit(chunk_size).all()
+        if not videos:
+            return
+        yield videos
+        last_id = videos[-1].id
+
+def refresh_related_videos(min_id=None, video_ids=None, chunk_size=RELATED_REFRESH_CHUNK_SIZE, should_stop=None,
+                           progress=None, token_frequencies=None):
+    """Recalcula los relacionados de todos los videos, de los de id > `min_id` o de los de `video_ids`, por bloques.
+
+    `should_stop()` permite cancelar entre bloques y `progress(procesados)` informar del avance.
+    Devuelve cuántos videos se procesaron.
+    """
+    processed = 0
+    if token_frequencies is None:
+        token_frequencies = TokenFrequencies()
+    for videos in _video_chunks(min_id, video_ids, chunk_size):
+        if should_stop and should_stop():
+            break
+        if not videos:
+            continue
+        related_by_video = {video.id: compute_related_ids(video, token_frequencies) for video in videos}
+        last_id = videos[-1].id
+        # Se cierra la lectura del bloque y la escritura va por el hilo escritor (ver basedatos.py)
+        db.session.rollback()
+        run_write(_store_related_chunk, related_by_video)
+        processed += len(videos)
+        if progress:
+            progress(processed)
+        logger.info(f"RELATED: Relacionados recalculados hasta el video {last_id} ({processed} en total).")
+    return processed
+
+def related_neighbour_ids(min_id, chunk_size=RELATED_REFRESH_CHUNK_SIZE, token_frequencies=None):
+    """Ids de los videos existentes (id <= `min_id`) cuyos relacionados pueden cambiar con los nuevos (id > `min_id`).
+
+    Son los que salen como candidatos por título de algún video nuevo (la coincidencia de palabras es simétrica)
+    y los RELATED_NEIGHBOUR_RECENT más recientes de cada categoría y fuente de los nuevos.
+    """
+    if token_frequencies is None:
+        token_frequencies = TokenFrequencies()
+    neighbour_ids = set()
+    values_by_field = {Video.category: set(), Video.source: set()}
+    last_id = min_id or 0
+    while True:
+        new_videos = (db.session.query(Video.id, Video.title, Video.category, Video.source)
+                      .filter(Video.id > last_id).order_by(Video.id).limit(chunk_size).all())
+        if not new_videos:
+            break
+        for video in new_videos:
+            neighbour_ids.update(candidate_id for candidate_id in _title_candidate_ids(title_tokens(video.title), token_frequencies)
+                                 if candidate_id <= (min_id or 0))
+            values_by_field[Video.category].add(video.category)
+            values_by_field[Video.source].add(video.source)
+        last_id = new_videos[-1].id
+    for field, values in values_by_field.items():
+        for value in values - {None}:
+            rows = (db.session.query(Video.id).filter(field == value, Video.id <= (min_id or 0))
+                    .order_by(Video.id.desc()).limit(RELATED_NEIGHBOUR_RECENT).all())
+            neighbour_ids.update(row[0] for row in rows)
+    db.session.rollback()
+    return sorted(neighbour_ids)
+
+def get_related_videos(video):
+    """Relacionados precalculados de `video`; si aún no tiene, los más recientes de su categoría (consulta indexada)."""
+    row = db.session.get(RelatedVideos, video.id)
+    if row is not None and row.related_ids:
+        related_ids = [int(related_id) for related_id in row.related_ids.split(',') if related_id]
+        videos_by_id = {v.id: v for v in Video.query.filter(Video.id.in_(related_ids)).all()}
+        return [videos_by_id[related_id] for related_id in related_ids if related_id in videos_by_id]
+    return (Video.query.filter(Video.category == video.category, Video.id != video.id)
+            .order_by(Video.id.desc()).limit(RELATED_VIDEOS_LIMIT).all())
@@ -1,10 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app, jsonify, Response, stream_with_context, send_file, abort
 from app.modelos import Video, User
 from app import db, csrf # <--- Importa csrf aquí
-from app.scraper import scrape_videos_multisite, save_videos_to_db, generate_video_player_url
+from app.tareas import job_manager, ScrapeJob, RelatedRefreshJob, FixVideoUrlsJob, JobAlreadyRunning
+from app.busqueda import apply_search
+from app.metadatos import DURATION_RANGES, QUALITY_RANGES, range_filter
+from app.catalogo import get_categories, get_category_counts, get_sources, invalidate_catalog, count_videos, format_total, pick_random_video_id
+from app.paginacion import paginate_videos
+from app.cache_respuestas import cached_listing, skip_response_cache
+from app.relacionados import get_related_videos
+from app.miniaturas import thumbnail_cache, thumbnail_fetcher, is_valid_key, THUMB_MIMETYPES
+from app.panel_admin import (ADMIN_VIDEOS_PER_PAGE, admin_filters, filter_errors, filter_videos, counter_for_filters,
+                             parse_video_ids, delete_videos_by_ids, delete_matching_videos, iter_videos_csv)
 from werkzeug.security import check_password_hash
-from sqlalchemy.sql.expression import func
-from sqlalchemy import or_, and_
+from sqlalchemy.orm import load_only
 from datetime import datetime, timedelta
 import logging
 # from flask_wtf.csrf import generate_csrf # Ya no es necesario aquí
@@ -14,37 +22,122 @@ logger = logging.getLogger(__name__)
 rutas_bp = Blueprint('rutas', __name__)
 
 VIDEOS_PER_PAGE = 60
+# Las miniaturas en caché no cambian nunca de contenido (nombre por hash); la redirección a la original mientras
+# se descarga en segundo plano es breve, para que la tarjeta pase pronto a la versión en caché
+THUMB_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+THUMB_PENDING_MAX_AGE = 300
+# Listados públicos que entiende listing_query (y ?kind= de /api/videos)
+LISTING_KINDS = ('all', 'category', 'quality', 'duration', 'trending')
 
 # --- Funciones de Ayuda ---
 def is_admin():
     return session.get('admin')
 
+def listing_total_pages(total_videos, is_estimate, listing):
+    total_pages = (total_videos + VIDEOS_PER_PAGE - 1) // VIDEOS_PER_PAGE
+    if is_estimate or listing.page > total_pages:
+        # Con un total estimado (o desfasado) se enlaza al menos hasta la página siguiente a la actual
+        total_pages = max(total_pages, listing.page + (1 if listing.has_next else 0))
+    return total_pages
+
+def trending_start(period, now=None):
+    now = now or datetime.utcnow() # Usar utcnow para consistencia con default=datetime.utcnow en el modelo
+    if period == 'today':
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'week':
+        return now - timedelta(days=7)
+    if period == 'month':
+        return now - timedelta(days=30) # O usar relativedelta para meses exactos
+    return None
+
+def listing_query(kind, value=None, search_term=''):
+    """Consulta de un listado público y el contador que da su total: (consulta, scope, key).
+
+    La usan tanto las páginas HTML como /api/videos, así que el scroll infinito filtra igual que la paginación.
+    Con scope None el total hay que contarlo (acotado) con catalogo.count_videos.
+    """
+    query, scope, key = Video.query, 'all', ''
+    if kind == 'category':
+        query, scope, key = query.filter(Video.category == value), 'category', value
+    elif kind == 'quality' and value in QUALITY_RANGES:
+        # Rango sobre video_height (ver metadatos.QUALITY_RANGES); el orden lo da el índice de (date_added, id)
+        query, scope = query.filter(*range_filter(Video.video_height, QUALITY_RANGES[value], use_index=False)), None
+    elif kind == 'duration' and value in DURATION_RANGES:
+        # Rango sobre duration_seconds (ver metadatos.DURATION_RANGES); igual que la calidad
+        query, scope = query.filter(*range_filter(Video.duration_seconds, DURATION_RANGES[value], use_index=False)), None
+    elif kind == 'trending':
+        start_date = trending_start(value)
+        if start_date:
+            query, scope = query.filter(Video.date_added >= start_date), None
+    if search_term:
+        query = apply_search(query, search_term, columns=('title', 'category') if kind == 'all' else ('title',))
+        scope = None
+    return query, scope, key
+
+@rutas_bp.app_template_global()
+def thumbnail_url(video):
+    """URL de la miniatura de una tarjeta: la de la caché local si ya está, si no la que la genera al pedirla."""
+    if not thumbnail_cache.enabled or not video.thumbnail:
+        return video.thumbnail
+    if video.thumb_key:
+        return url_for('rutas.thumbnail_file', key=video.thumb_key)
+    return url_for('rutas.video_thumbnail', video_id=video.id)
+
+def video_card(video):
+    """Datos mínimos de una tarjeta de video para la API de listados."""
+    return {'id': video.id, 'title': video.title, 'thumbnail': thumbnail_url(video), 'source': video.source,
+            'category': video.category, 'url': url_for('rutas.ver_video', video_id=video.id)}
+
+def listing_api_next_url(kind, value, search_term, listing):
+    """URL de /api/videos con la página siguiente a `listing` (None si es la última)."""
+    if listing is None or not listing.has_next:
+        return None
+    args = {'kind': kind if kind != 'all' else None, 'value': value, 'search': search_term or None}
+    if listing.next_cursor:
+        args['cursor'] = listing.next_cursor
+    else:
+        args['page'] = listing.page + 1
+    return url_for('rutas.api_videos', **args)
+
+@rutas_bp.app_context_processor
+def inject_category_counts():
+    # Sale de la caché del catálogo (catalogo.py); no consulta la BD en cada render
+    try:
+        return {'category_counts': dict(get_category_counts())}
+    except Exception as e:
+        logger.warning(f"No se pudieron obtener los conteos de categorías: {e}")
+        return {'category_counts': {}}
+
 # --- Rutas Públicas (con verificación de edad) ---
 @rutas_bp.route('/')
+@cached_listing
 def index():
     if not session.get('age_verified'):
         return redirect(url_for('rutas.age_gate'))
     page = request.args.get('page', 1, type=int)
     search_term = request.args.get('search', '').strip().lower()
     try:
-        videos_query = Video.query.order_by(Video.date_added.desc())
-        if search_term:
-            search_condition = or_(Video.title.ilike(f'%{search_term}%'), Video.category.ilike(f'%{search_term}%'))
-            videos_query = videos_query.filter(search_condition)
-        total_videos = videos_query.count()
-        videos = videos_query.offset((page - 1) * VIDEOS_PER_PAGE).limit(VIDEOS_PER_PAGE).all()
-        total_pages = (total_videos + VIDEOS_PER_PAGE - 1) // VIDEOS_PER_PAGE
-        categories_db = db.session.query(Video.category).distinct().order_by(Video.category).all()
-        categories = [cat[0] for cat in categories_db if cat[0]]
+        videos_query, scope, key = listing_query('all', search_term=search_term)
+        # Sin búsqueda el total sale del contador mantenido; con búsqueda, de un conteo acotado
+        total_videos, total_is_estimate = count_videos(videos_query, scope=scope, key=key)
+        listing = paginate_videos(videos_query, VIDEOS_PER_PAGE, page=page, cursor=request.args.get('cursor'), ranked=bool(search_term))
+        videos, page = listing.items, listing.page
+        total_pages = listing_total_pages(total_videos, total_is_estimate, listing)
+        categories = get_categories()
     except Exception as e:
         logger.error(f"Error loading videos for the main page: {e}", exc_info=True)
         flash('Error loading videos. Please try again later.', 'error')
+        skip_response_cache()
         return render_template('index.html', videos=[], categories=[], page=1, total_pages=1, search_term=search_term)
     return render_template('index.html', 
                            videos=videos, 
                            categories=categories, 
                            page=page, 
                            total_pages=total_pages, 
+                           listing=listing,
+                           total_label=format_total(total_videos, total_is_estimate),
+                           total_is_estimate=total_is_estimate,
+                           api_next_url=listing_api_next_url('all', None, search_term, listing),
                            current_category=None, 
                            search_term=search_term)
 
@@ -73,30 +166,28 @@ def dmca():
     return render_template('dmca.html')
 
 @rutas_bp.route('/category/<category_name>')
+@cached_listing
 def category(category_name):
     if not session.get('age_verified'):
         return redirect(url_for('rutas.age_gate', next=request.url))
     page = request.args.get('page', 1, type=int)
     search_term = request.args.get('search', '').strip().lower()
     try:
-        videos_query = Video.query.filter(Video.category.ilike(f'%{category_name}%'))
-        if search_term:
-            videos_query = videos_query.filter(Video.title.ilike(f'%{search_term}%'))
-            
-        videos_query = videos_query.order_by(Video.date_added.desc())
-        total_videos = videos_query.count()
+        videos_query, scope, key = listing_query('category', category_name, search_term)
+        total_videos, total_is_estimate = count_videos(videos_query, scope=scope, key=key)
         if total_videos == 0 and not search_term:
             flash(f'No videos found in the "{category_name}" category.', 'info')
             
-        videos = videos_query.offset((page - 1) * VIDEOS_PER_PAGE).limit(VIDEOS_PER_PAGE).all()
-        total_pages = (total_videos + VIDEOS_PER_PAGE - 1) // VIDEOS_PER_PAGE
+        listing = paginate_videos(videos_query, VIDEOS_PER_PAGE, page=page, cursor=request.args.get('cursor'), ranked=bool(search_term))
+        videos, page = listing.items, listing.page
+        total_pages = listing_total_pages(total_videos, total_is_estimate, listing)
         
-        categories_db = db.session.query(Video.category).distinct().order_by(Video.category).all()
-        categories = [cat[0] for cat in categories_db if cat[0]]
+        categories = get_categories()
 
     except Exception as e:
         logger.error(f"Error loading videos for category '{category_name}': {e}", exc_info=True)
         flash(f'Error loading videos for category "{category_name}".', 'error')
+        skip_response_cache()
         categories = []
         return render_template('index.html', videos=[], categories=categories, current_category=category_name, page=1, total_pages=1, search_term=search_term)
         
@@ -106,9 +197,14 @@ def category(category_name):
                            current_category=category_name, 
                            page=page, 
                            total_pages=total_pages,
+                           listing=listing,
+                           total_label=format_total(total_videos, total_is_estimate),
+                           total_is_estimate=total_is_estimate,
+                           api_next_url=listing_api_next_url('category', category_name, search_term, listing),
                            search_term=search_term)
 
 @rutas_bp.route('/quality/<quality_filter>')
+@cached_listing
 def filter_by_quality(quality_filter):
     if not session.get('age_verified'):
         return redirect(url_for('rutas.age_gate', next=request.url))
@@ -117,37 +213,18 @@ def filter_by_quality(quality_filter):
     search_term = request.args.get('search', '').strip().lower()
     
     try:
-        videos_query = Video.query
-        quality_conditions = []
-
-        if quality_filter == '4k':
-            quality_conditions = [Video.title.ilike(term) for term in ['%4K%', '%2160p%', '%UHD%', '%Ultra HD%']]
-        elif quality_filter == '1080p':
-            quality_conditions = [Video.title.ilike(term) for term in ['%1080p%', '%Full HD%', '%FHD%']]
-        elif quality_filter == '720p':
-            quality_conditions = [Video.title.ilike(term) for term in ['%720p%', '%HD%']] # Simplificado
-        elif quality_filter == 'hd': # 'hd' puede ser 720p o 1080p o una categoría
-             quality_conditions = [
-                Video.category.ilike('%HD%'), Video.title.ilike('%HD%'),
-                Video.title.ilike('%720p%'), Video.title.ilike('%1080p%')
-            ]
-        # Añadir más filtros o mejorar la lógica si es necesario
-
-        if quality_conditions:
-            videos_query = videos_query.filter(or_(*quality_conditions))
-        else: # Si el filtro de calidad no es reconocido, no aplicar filtro de calidad
+        # Si el filtro de calidad no es reconocido, no se aplica filtro de calidad
+        if quality_filter not in QUALITY_RANGES:
             flash(f'Quality filter "{quality_filter}" not recognized.', 'warning')
 
-        if search_term: # Permitir búsqueda combinada con filtro de calidad
-             videos_query = videos_query.filter(Video.title.ilike(f'%{search_term}%'))
-
-        videos_query = videos_query.order_by(Video.date_added.desc())
-        total_videos = videos_query.count()
-        videos = videos_query.offset((page - 1) * VIDEOS_PER_PAGE).limit(VIDEOS_PER_PAGE).all()
-        total_pages = (total_videos + VIDEOS_PER_PAGE - 1) // VIDEOS_PER_PAGE
+        # Permite búsqueda combinada con filtro de calidad
+        videos_query, scope, key = listing_query('quality', quality_filter, search_term)
+        total_videos, total_is_estimate = count_videos(videos_query, scope=scope, key=key)
+        listing = paginate_videos(videos_query, VIDEOS_PER_PAGE, page=page, cursor=request.args.get('cursor'), ranked=bool(search_term))
+        videos, page = listing.items, listing.page
+        total_pages = listing_total_pages(total_videos, total_is_estimate, listing)
         
-        categories_db = db.session.query(Video.category).distinct().order_by(Video.category).all()
-        categories = [cat[0] for cat in categories_db if cat[0]]
+        categories = get_categories()
         
         if total_videos == 0:
             flash(f'No videos found for quality "{quality_filter.upper()}"' + (f' with search term "{search_term}"' if search_term else '.'), 'info')
@@ -162,11 +239,16 @@ def filter_by_quality(quality_filter):
                            categories=categories, 
                            page=page, 
                            total_pages=total_pages,
+                           listing=listing,
+                           total_label=format_total(total_videos, total_is_estimate),
+                           total_is_estimate=total_is_estimate,
+                           api_next_url=listing_api_next_url('quality', quality_filter, search_term, listing),
                            current_filter=f'Quality: {quality_filter.upper()}',
                            search_term=search_term)
 
 
 @rutas_bp.route('/duration/<duration_filter>')
+@cached_listing
 def filter_by_duration(duration_filter):
     if not session.get('age_verified'):
         return redirect(url_for('rutas.age_gate', next=request.url))
@@ -178,32 +260,13 @@ def filter_by_duration(duration_filter):
     current_filter_name = duration_names.get(duration_filter, duration_filter.capitalize())
 
     try:
-        videos_query = Video.query
-        duration_conditions = []
-
-        if duration_filter == 'short':
-            duration_conditions = [Video.title.ilike(term) for term in ['%short%', '%quick%', '%clip%', '%brief%', '%mini%', '%teaser%']]
-        elif duration_filter == 'long':
-            duration_conditions = [Video.title.ilike(term) for term in ['%long%', '%full%', '%complete%', '%extended%', '%compilation%', '%movie%']]
-        elif duration_filter == 'medium':
-            # Excluir short y long para 'medium' es complejo con solo ILIKE.
-            # Esta es una aproximación, idealmente tendrías un campo de duración.
-            all_terms = ['%short%', '%quick%', '%clip%', '%brief%', '%mini%', '%teaser%', '%long%', '%full%', '%complete%', '%extended%', '%compilation%', '%movie%']
-            videos_query = videos_query.filter(and_(*[~Video.title.ilike(term) for term in all_terms]))
-        
-        if duration_conditions: # Solo aplicar si hay condiciones (evita error con 'medium')
-            videos_query = videos_query.filter(or_(*duration_conditions))
-        
-        if search_term:
-            videos_query = videos_query.filter(Video.title.ilike(f'%{search_term}%'))
-
-        videos_query = videos_query.order_by(Video.date_added.desc())
-        total_videos = videos_query.count()
-        videos = videos_query.offset((page - 1) * VIDEOS_PER_PAGE).limit(VIDEOS_PER_PAGE).all()
-        total_pages = (total_videos + VIDEOS_PER_PAGE - 1) // VIDEOS_PER_PAGE
+        videos_query, scope, key = listing_query('duration', duration_filter, search_term)
+        total_videos, total_is_estimate = count_videos(videos_query, scope=scope, key=key)
+        listing = paginate_videos(videos_query, VIDEOS_PER_PAGE, page=page, cursor=request.args.get('cursor'), ranked=bool(search_term))
+        videos, page = listing.items, listing.page
+        total_pages = listing_total_pages(total_videos, total_is_estimate, listing)
         
-        categories_db = db.session.query(Video.category).distinct().order_by(Video.category).all()
-        categories = [cat[0] for cat in categories_db if cat[0]]
+        categories = get_categories()
         
         if total_videos == 0:
             flash(f'No videos found for duration "{current_filter_name}"' + (f' with search term "{search_term}"' if search_term else '.'), 'info')
@@ -218,10 +281,15 @@ def filter_by_duration(duration_filter):
                            categories=categories, 
                            page=page, 
                            total_pages=total_pages,
+                           listing=listing,
+                           total_label=format_total(total_videos, total_is_estimate),
+                           total_is_estimate=total_is_estimate,
+                           api_next_url=listing_api_next_url('duration', duration_filter, search_term, listing),
                            current_filter=f'Duration: {current_filter_name}',
                            search_term=search_term)
 
 @rutas_bp.route('/trending/<period>')
+@cached_listing
 def trending_videos(period):
     if not session.get('age_verified'):
         return redirect(url_for('rutas.age_gate', next=request.url))
@@ -233,33 +301,17 @@ def trending_videos(period):
     current_filter_name = period_names.get(period, period.capitalize())
     
     try:
-        videos_query = Video.query
-        now = datetime.utcnow() # Usar utcnow para consistencia con default=datetime.utcnow en el modelo
-
-        if period == 'today':
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            videos_query = videos_query.filter(Video.date_added >= start_date)
-        elif period == 'week':
-            start_date = now - timedelta(days=7)
-            videos_query = videos_query.filter(Video.date_added >= start_date)
-        elif period == 'month':
-            start_date = now - timedelta(days=30) # O usar relativedelta para meses exactos
-            videos_query = videos_query.filter(Video.date_added >= start_date)
-        elif period != 'all':
+        if period not in ('today', 'week', 'month', 'all'):
             flash(f'Trending period "{period}" not recognized.', 'warning')
-            # No aplicar filtro de fecha si el período no es válido, o redirigir
+            # No se aplica filtro de fecha si el período no es válido
 
-        if search_term:
-            videos_query = videos_query.filter(Video.title.ilike(f'%{search_term}%'))
-            
-        videos_query = videos_query.order_by(Video.date_added.desc()) # O por popularidad si tuvieras ese dato
-        
-        total_videos = videos_query.count()
-        videos = videos_query.offset((page - 1) * VIDEOS_PER_PAGE).limit(VIDEOS_PER_PAGE).all()
-        total_pages = (total_videos + VIDEOS_PER_PAGE - 1) // VIDEOS_PER_PAGE
+        videos_query, scope, key = listing_query('trending', period, search_term)
+        total_videos, total_is_estimate = count_videos(videos_query, scope=scope, key=key)
+        listing = paginate_videos(videos_query, VIDEOS_PER_PAGE, page=page, cursor=request.args.get('cursor'), ranked=bool(search_term))
+        videos, page = listing.items, listing.page
+        total_pages = listing_total_pages(total_videos, total_is_estimate, listing)
         
-        categories_db = db.session.query(Video.category).distinct().order_by(Video.category).all()
-        categories = [cat[0] for cat in categories_db if cat[0]]
+        categories = get_categories()
         
         if total_videos == 0:
             flash(f'No trending videos found for "{current_filter_name}"' + (f' with search term "{search_term}"' if search_term else '.'), 'info')
@@ -274,18 +326,93 @@ def trending_videos(period):
                            categories=categories, 
                            page=page, 
                            total_pages=total_pages,
+                           listing=listing,
+                           total_label=format_total(total_videos, total_is_estimate),
+                           total_is_estimate=total_is_estimate,
+                           api_next_url=listing_api_next_url('trending', period, search_term, listing),
                            current_filter=f'Trending: {current_filter_name}',
                            search_term=search_term)
 
+@rutas_bp.route('/api/videos')
+@cached_listing
+def api_videos():
+    """Página de un listado en JSON (tarjetas + cursor) para el scroll infinito de scripts.js.
+
+    Acepta los mismos filtros que las páginas HTML (?kind=category|quality|duration|trending&value=...&search=...)
+    y se sirve desde response_cache con ETag, así que una página sin cambios se revalida con un 304.
+    """
+    if not session.get('age_verified'):
+        return jsonify({'error': 'age verification required'}), 403
+    kind = request.args.get('kind', 'all')
+    if kind not in LISTING_KINDS:
+        return jsonify({'error': 'unknown listing'}), 400
+    value = request.args.get('value') or None
+    page = request.args.get('page', 1, type=int)
+    search_term = request.args.get('search', '').strip().lower()
+    try:
+        videos_query, _, _ = listing_query(kind, value, search_term)
+        # Solo las columnas de la tarjeta (y date_added, que es la clave del cursor)
+        videos_query = videos_query.options(load_only(Video.id, Video.title, Video.thumbnail, Video.thumb_key,
+                                                      Video.source, Video.category, Video.date_added))
+        listing = paginate_videos(videos_query, VIDEOS_PER_PAGE, page=page, cursor=request.args.get('cursor'), ranked=bool(search_term))
+    except Exception as e:
+        logger.error(f"Error loading API listing ({kind}/{value}): {e}", exc_info=True)
+        return jsonify({'error': 'listing unavailable'}), 500
+    return jsonify({'videos': [video_card(video) for video in listing.items],
+                    'page': listing.page,
+                    'has_next': listing.has_next,
+                    'next_cursor': listing.next_cursor,
+                    'next_url': listing_api_next_url(kind, value, search_term, listing)})
+
+@rutas_bp.route('/thumbs/<key>')
+def thumbnail_file(key):
+    """Miniatura de la caché local, inmutable: el navegador no vuelve a pedirla."""
+    if not is_valid_key(key) or not thumbnail_cache.enabled:
+        abort(404)
+    if not thumbnail_cache.exists(key):
+        # Expulsada de la caché: se regenera en segundo plano desde la URL original y mientras tanto se sirve esa
+        video = Video.query.options(load_only(Video.id, Video.thumbnail, Video.thumb_key)).filter_by(thumb_key=key).first()
+        if video is None or not video.thumbnail:
+            abort(404)
+        return _original_thumbnail(video)
+    thumbnail_cache.touch(key)
+    response = send_file(thumbnail_cache.path_for(key), mimetype=THUMB_MIMETYPES[key.rsplit('.', 1)[1]],
+                         max_age=THUMB_IMMUTABLE_MAX_AGE, conditional=True)
+    response.headers['Cache-Control'] = f'public, max-age={THUMB_IMMUTABLE_MAX_AGE}, immutable'
+    return response
+
+def _original_thumbnail(video):
+    """Redirige a la miniatura original y, si el visitante pasó la verificación de edad, encola su descarga."""
+    if thumbnail_cache.enabled and session.get('age_verified'):
+        thumbnail_fetcher.enqueue(video.id, video.thumbnail, video.thumb_key)
+    response = redirect(video.thumbnail)
+    response.headers['Cache-Control'] = f'public, max-age={THUMB_PENDING_MAX_AGE}'
+    return response
+
+@rutas_bp.route('/thumb/<int:video_id>')
+def video_thumbnail(video_id):
+    """Miniatura de un video aún no cacheado: redirige a la original y la descarga en segundo plano."""
+    video = Video.query.options(load_only(Video.id, Video.thumbnail, Video.thumb_key)).filter_by(id=video_id).first()
+    if video is None or not video.thumbnail:
+        abort(404)
+    if thumbnail_cache.exists(video.thumb_key):
+        # Ya descargada (la tarjeta se renderizó antes de guardarse thumb_key): a su URL inmutable
+        response = redirect(url_for('rutas.thumbnail_file', key=video.thumb_key))
+        response.headers['Cache-Control'] = f'public, max-age={THUMB_PENDING_MAX_AGE}'
+        return response
+    return _original_thumbnail(video)
+
 @rutas_bp.route('/random')
 def random_video():
     if not session.get('age_verified'):
         return redirect(url_for('rutas.age_gate', next=request.url))
     
     try:
-        random_video = Video.query.order_by(func.random()).first() # func.random() puede ser ineficiente en BD grandes
-        if random_video:
-            return redirect(url_for('rutas.ver_video', video_id=random_video.id))
+        # Filtros opcionales: /random?category=...&source=...
+        random_video_id = pick_random_video_id(category=request.args.get('category') or None,
+                                               source=request.args.get('source') or None)
+        if random_video_id:
+            return redirect(url_for('rutas.ver_video', video_id=random_video_id))
         else:
             flash('No videos available to display a random one.', 'info')
             return redirect(url_for('rutas.index'))
@@ -305,14 +432,10 @@ def ver_video(video_id):
             flash('Video not found.', 'error')
             return redirect(url_for('rutas.index')) # O render_template('errors/404.html'), 404
 
-        related_videos_query = Video.query.filter(
-            Video.category == video.category,
-            Video.id != video.id
-        ).order_by(Video.date_added.desc()).limit(6)
-        related_videos = related_videos_query.all()
+        # Precalculados al ingerir (ver relacionados.py): una búsqueda por clave primaria
+        related_videos = get_related_videos(video)
         
-        categories_db = db.session.query(Video.category).distinct().order_by(Video.category).all()
-        categories = [cat[0] for cat in categories_db if cat[0]]
+        categories = get_categories()
         
     except Exception as e:
         logger.error(f"Error loading video page for ID {video_id}: {e}", exc_info=True)
@@ -358,15 +481,69 @@ def admin_logout():
 def admin_panel():
     if not is_admin():
         return redirect(url_for('rutas.admin_login'))
+    current_year = datetime.utcnow().year
+    page = request.args.get('page', 1, type=int)
+    filters = admin_filters(request.args)
+    listing, total_label, total_is_estimate = None, '0', False
     try:
-        videos = Video.query.order_by(Video.date_added.desc()).all()
-        current_year = datetime.utcnow().year
+        # Solo se carga la página pedida; los filtros se resuelven en la BD (ver panel_admin.py)
+        videos_query = filter_videos(filters)
+        scope, key = counter_for_filters(filters)
+        total_videos, total_is_estimate = count_videos(videos_query, scope=scope, key=key)
+        listing = paginate_videos(videos_query, ADMIN_VIDEOS_PER_PAGE, page=page, cursor=request.args.get('cursor'), ranked=bool(filters.get('search')))
+        videos = listing.items
+        total_label = format_total(total_videos, total_is_estimate)
+        sources, categories = get_sources(), get_categories()
     except Exception as e:
         logger.error(f"Error loading admin panel: {e}", exc_info=True)
         flash('Error loading data for admin panel.', 'error')
-        videos = []
-        current_year = datetime.utcnow().year
-    return render_template('admin_panel.html', videos=videos, now={'year': current_year})
+        videos, sources, categories = [], [], []
+    current_job = job_manager.current()
+    return render_template('admin_panel.html', videos=videos, now={'year': current_year},
+                           listing=listing, filters=filters, sources=sources, categories=categories,
+                           total_label=total_label, total_is_estimate=total_is_estimate,
+                           export_url=url_for('rutas.admin_export_videos', **filters),
+                           scrape_job=current_job.to_dict() if current_job else None)
+
+@rutas_bp.route('/admin/videos/export.csv')
+def admin_export_videos():
+    if not is_admin():
+        return redirect(url_for('rutas.admin_login'))
+    filters = admin_filters(request.args)
+    filename = f"videos-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.csv"
+    # Se envía por bloques mientras se consulta: ni la petición ni el navegador tienen el catálogo entero en memoria
+    return Response(stream_with_context(iter_videos_csv(filters)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@rutas_bp.route('/admin/delete-matching', methods=['POST'])
+def admin_delete_matching():
+    if not is_admin():
+        flash('Unauthorized access.', 'error')
+        return redirect(url_for('rutas.admin_login'))
+    filters = admin_filters(request.form)
+    # Un filtro que no se puede aplicar (fecha inválida, búsqueda sin palabras) no restringe nada: se rechaza
+    errors = filter_errors(filters)
+    if errors:
+        for error in errors:
+            flash(error, 'error')
+        return redirect(url_for('rutas.admin_panel', **filters))
+    # Sin filtros esto vaciaría el catálogo: se exige confirmarlo explícitamente
+    if not filters and request.form.get('confirm_all') != 'yes':
+        flash('No filters given. Confirm explicitly to delete every video.', 'warning')
+        return redirect(url_for('rutas.admin_panel'))
+    try:
+        deleted_count = delete_matching_videos(filters)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"ADMIN: Error deleting videos matching {filters}: {e}", exc_info=True)
+        flash(f'Error deleting videos: {str(e)}', 'error')
+        deleted_count = 0
+    if deleted_count:
+        invalidate_catalog()
+        flash(f'{deleted_count} video(s) matching the filters deleted.', 'success')
+    else:
+        flash('No videos matched the filters.', 'info')
+    return redirect(url_for('rutas.admin_panel', **filters))
 
 
 @rutas_bp.route('/admin/scrape', methods=['POST'])
@@ -383,18 +560,59 @@ def admin_scrape():
     except ValueError:
         flash('Invalid value for maximum videos.', 'error')
         return redirect(url_for('rutas.admin_panel'))
-    logger.info(f"ADMIN: Starting scrape for up to {max_videos} videos.")
+    concurrency = request.form.get('concurrency', current_app.config.get('SCRAPE_CONCURRENCY', 1), type=int)
+    if not (1 <= concurrency <= 8):
+        flash('Concurrency must be an integer between 1 and 8.', 'error')
+        return redirect(url_for('rutas.admin_panel'))
     try:
-        videos_data = scrape_videos_multisite(max_videos=max_videos)
-        if videos_data:
-            saved_count = save_videos_to_db(videos_data)
-            if saved_count > 0: flash(f'{saved_count} new videos collected and saved successfully!', 'success')
-            elif len(videos_data) > 0 : flash(f'{len(videos_data)} videos were collected, but no new videos were saved (possibly duplicates or already existing).', 'info')
-            else: flash('No videos were collected in this session.', 'info')
-        else: flash('Could not collect videos. Check logs for more details.', 'warning')
-    except Exception as e:
-        logger.error(f"ADMIN: Error during scraping process: {e}", exc_info=True)
-        flash(f'Critical error during scraping: {str(e)}. Check logs.', 'error')
+        job = job_manager.submit(current_app._get_current_object(), ScrapeJob(
+            max_videos=max_videos, concurrency=concurrency,
+            page_budget=current_app.config.get('SCRAPE_PAGE_BUDGET'),
+            politeness_delay=current_app.config.get('SCRAPE_POLITENESS_DELAY')))
+    except JobAlreadyRunning as e:
+        flash(f'A scrape job ({e.job.id}) is already {e.job.status}. Wait for it to finish or cancel it first.', 'warning')
+        return redirect(url_for('rutas.admin_panel'))
+    logger.info(f"ADMIN: Scrape job {job.id} submitted for up to {max_videos} videos with concurrency {concurrency}.")
+    flash(f'Scrape job {job.id} started in the background for up to {max_videos} videos.', 'info')
+    return redirect(url_for('rutas.admin_panel'))
+
+@rutas_bp.route('/admin/scrape/jobs')
+def admin_scrape_jobs():
+    if not is_admin():
+        return jsonify({'error': 'unauthorized'}), 401
+    return jsonify({'jobs': [job.to_dict() for job in job_manager.recent()]})
+
+@rutas_bp.route('/admin/scrape/jobs/<job_id>')
+def admin_scrape_job_status(job_id):
+    if not is_admin():
+        return jsonify({'error': 'unauthorized'}), 401
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'job not found'}), 404
+    return jsonify(job.to_dict())
+
+@rutas_bp.route('/admin/scrape/jobs/<job_id>/cancel', methods=['POST'])
+def admin_scrape_job_cancel(job_id):
+    if not is_admin():
+        flash('Unauthorized access.', 'error')
+        return redirect(url_for('rutas.admin_login'))
+    if job_manager.cancel(job_id):
+        flash(f'Cancellation requested for scrape job {job_id}. Videos collected so far will still be saved.', 'info')
+    else:
+        flash(f'Scrape job {job_id} not found or no longer running.', 'warning')
+    return redirect(url_for('rutas.admin_panel'))
+
+@rutas_bp.route('/admin/related/refresh', methods=['POST'])
+def admin_refresh_related():
+    if not is_admin():
+        flash('Unauthorized access.', 'error')
+        return redirect(url_for('rutas.admin_login'))
+    try:
+        job = job_manager.submit(current_app._get_current_object(), RelatedRefreshJob())
+    except JobAlreadyRunning as e:
+        flash(f'A {e.job.kind} job ({e.job.id}) is already {e.job.status}. Wait for it to finish or cancel it first.', 'warning')
+        return redirect(url_for('rutas.admin_panel'))
+    flash(f'Related videos refresh job {job.id} started in the background.', 'info')
     return redirect(url_for('rutas.admin_panel'))
 
 @rutas_bp.route('/admin/fix-video-urls', methods=['POST'])
@@ -402,48 +620,14 @@ def admin_fix_video_urls():
     if not is_admin():
         flash('Acceso no autorizado.', 'error')
         return redirect(url_for('rutas.admin_login'))
-    
+    # Por defecto continúa la pasada anterior si quedó a medias; restart=1 empieza desde el primer video
+    restart = request.form.get('restart') in ('1', 'true', 'on')
     try:
-        videos = Video.query.all()
-        fixed_count = 0
-        error_count = 0
-        
-        for video in videos:
-            try:
-                # Intentar generar una URL válida usando la URL de embed original
-                if video.original_cleaned_url:
-                    new_url = generate_video_player_url(video.original_cleaned_url, video.source)
-                    if new_url:
-                        video.embed_url = new_url
-                        fixed_count += 1
-                        continue
-                
-                # Si no funciona, intentar con la URL de la página original
-                if video.original_page_url:
-                    new_url = generate_video_player_url(video.original_page_url, video.source)
-                    if new_url:
-                        video.embed_url = new_url
-                        fixed_count += 1
-                        continue
-                
-                error_count += 1
-                logger.warning(f"No se pudo generar una URL válida para el video ID {video.id}")
-                
-            except Exception as e:
-                error_count += 1
-                logger.error(f"Error al procesar video ID {video.id}: {e}")
-        
-        if fixed_count > 0:
-            db.session.commit()
-            flash(f'Se corrigieron {fixed_count} URLs de videos. {error_count} videos no pudieron ser corregidos.', 'success')
-        else:
-            flash(f'No se pudieron corregir URLs. {error_count} videos con error.', 'warning')
-            
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Error al corregir URLs de videos: {e}")
-        flash('Error al intentar corregir las URLs de los videos.', 'error')
-    
+        job = job_manager.submit(current_app._get_current_object(), FixVideoUrlsJob(restart=restart))
+    except JobAlreadyRunning as e:
+        flash(f'A {e.job.kind} job ({e.job.id}) is already {e.job.status}. Wait for it to finish or cancel it first.', 'warning')
+        return redirect(url_for('rutas.admin_panel'))
+    flash(f'Video URL repair job {job.id} started in the background. Follow its progress in the jobs panel.', 'info')
     return redirect(url_for('rutas.admin_panel'))
 
 @rutas_bp.route('/admin/delete-videos', methods=['POST'])
@@ -451,29 +635,23 @@ def admin_delete_videos():
     if not is_admin():
         flash('Unauthorized access.', 'error')
         return redirect(url_for('rutas.admin_login'))
-    video_ids_to_delete = request.form.getlist('video_ids')
-    if not video_ids_to_delete:
+    # Solo borra los ids marcados; el borrado por filtro va por /admin/delete-matching, que valida y pide confirmación
+    video_ids = parse_video_ids(request.form.getlist('video_ids'))
+    filters = admin_filters(request.form)  # Solo para volver a la misma vista del panel
+    if not video_ids:
         flash('No videos selected for deletion.', 'warning')
-        return redirect(url_for('rutas.admin_panel'))
+        return redirect(url_for('rutas.admin_panel', **filters))
     try:
-        deleted_count = 0
-        for video_id_str in video_ids_to_delete:
-            try:
-                video_id = int(video_id_str)
-                video = db.session.get(Video, video_id)
-                if video:
-                    db.session.delete(video)
-                    deleted_count += 1
-            except ValueError: logger.warning(f"ADMIN: Invalid video ID received for deletion: {video_id_str}")
+        deleted_count = delete_videos_by_ids(video_ids)
         if deleted_count > 0:
-            db.session.commit()
+            invalidate_catalog()
             flash(f'{deleted_count} video(s) deleted successfully.', 'success')
         else: flash('No videos were deleted (IDs might be invalid or already deleted).', 'info')
     except Exception as e:
         db.session.rollback()
         logger.error(f"ADMIN: Error deleting videos: {e}", exc_info=True)
         flash(f'Error deleting videos: {str(e)}', 'error')
-    return redirect(url_for('rutas.admin_panel'))
+    return redirect(url_for('rutas.admin_panel', **filters))
 
 @rutas_bp.route('/admin/delete-single-video', methods=['POST'])
 def admin_delete_single_video():
@@ -491,6 +669,7 @@ def admin_delete_single_video():
             video_title = video.title
             db.session.delete(video)
             db.session.commit()
+            invalidate_catalog()
             flash(f'Video "{video_title}" deleted successfully.', 'success')
         else: flash(f'Video with ID {video_id} not found. Could not delete.', 'warning')
     except ValueError:
@@ -508,8 +687,7 @@ def debug_videos():
     try:
         sample_videos = Video.query.limit(20).all()
         debug_info = [{'id': v.id, 'title': v.title, 'embed_url': v.embed_url, 'category': v.category, 'source': v.source, 'date_added': v.date_added} for v in sample_videos]
-        unique_categories_db = db.session.query(Video.category).distinct().order_by(Video.category).all()
-        unique_categories = [cat[0] for cat in categories_db if cat[0]]
+        unique_categories = get_categories()
         total_video_count = Video.query.count()
         # Make sure you have a template at 'app/templates/debug/videos_debug.html'
         return render_template('debug/videos_debug.html', 
@@ -527,11 +705,14 @@ def test_filter(filter_type, filter_value):
     try:
         query = Video.query
         if filter_type == 'quality':
-            if filter_value == 'hd': query = query.filter(or_(Video.category.ilike('%HD%'), Video.title.ilike('%HD%'), Video.title.ilike('%720p%'), Video.title.ilike('%1080p%')))
+            if filter_value in QUALITY_RANGES: query = query.filter(*range_filter(Video.video_height, QUALITY_RANGES[filter_value]))
             else: query = query.filter(Video.title.ilike(f'%{filter_value}%'))
+        elif filter_type == 'duration' and filter_value in DURATION_RANGES:
+            query = query.filter(*range_filter(Video.duration_seconds, DURATION_RANGES[filter_value]))
         elif filter_type == 'category': query = query.filter(Video.category.ilike(f'%{filter_value}%'))
         videos_found = query.limit(10).all()
-        result = [{'id': v.id, 'title': v.title, 'category': v.category, 'source': v.source} for v in videos_found]
+        result = [{'id': v.id, 'title': v.title, 'category': v.category, 'source': v.source,
+                   'duration_seconds': v.duration_seconds, 'video_height': v.video_height} for v in videos_found]
         return f"""<h2>Test Filter: {filter_type} = {filter_value}</h2><p>Results (max 10): {len(result)}</p><pre>{result if result else 'No videos found.'}</pre><p><a href="{url_for('rutas.admin_panel')}">Back to admin</a></p>"""
     except Exception as e:
         logger.error(f"Error in test_filter ({filter_type}/{filter_value}): {e}", exc_info=True)
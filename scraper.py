@@ -1,24 +1,92 @@
-from collections import Counter
+from collections import Counter, OrderedDict
 import logging
 import time
 import random
 import re
+import threading
 import uuid
-from urllib.parse import urlparse, parse_qs, urlunparse, urlencode
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait as futures_wait, TimeoutError as FuturesTimeoutError
+from urllib.parse import urlparse, parse_qs, urlunparse, urlencode, urljoin
 import os
+from datetime import datetime
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException, JavascriptException
 
+from sqlalchemy import insert, select, update
 import yt_dlp
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from bs4 import BeautifulSoup
+except ImportError:  # El camino HTTP es opcional: sin requests/bs4 todos los sitios usan Selenium
+    requests = None
+    HTTPAdapter = None
+    BeautifulSoup = None
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
 from app import db # Assuming app.py initializes db
-from app.modelos import Video # Assuming modelos.py defines Video
-from app.webdriver_init import init_driver
+from app.modelos import Video, ScrapeCheckpoint, JobCheckpoint # Assuming modelos.py defines Video
+from app.webdriver_init import get_driver_pool, record_page_load
+from app.metadatos import extract_video_metadata
+from app.catalogo import invalidate_catalog
+from app.basedatos import run_write
 
 logger = logging.getLogger(__name__)
 
+# Sitios cuyo listado /new/{page} ya trae los bloques de miniaturas en el HTML, sin JS ni verificación de edad.
+# Para estos se intenta primero una descarga HTTP simple y se recurre a Selenium solo si no aparecen items.
+STATIC_LISTING_SITES = {"Xvideos", "EPorner"}
+HTTP_LISTING_TIMEOUT = 15
+HTTP_LISTING_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-us,en;q=0.5',
+}
+_http_local = threading.local()
+
+# Esperas basadas en condiciones: presupuesto de latencia por página de listado (segundos), sondeo de
+# preparación y tiempo máximo para que aparezca/desaparezca la verificación de edad
+PAGE_LATENCY_BUDGET = 15.0
+READINESS_POLL_INTERVAL = 0.25
+READINESS_STABLE_POLLS = 3
+AGE_GATE_TIMEOUT = 3
+# Cortesía por defecto entre páginas de un mismo sitio (independiente de las esperas de carga)
+POLITENESS_DELAY = 1.0
+
+# Extracción de items del listado: 'script' (un solo execute_script por página) o 'elements' (find_element por item)
+LISTING_EXTRACTION_MODE = 'script'
+
+# Selectores (duración, calidad) dentro de cada item del listado. Son opcionales: si no aparecen, la
+# duración y la resolución se deducen del título (ver metadatos.extract_video_metadata)
+LISTING_META_SELECTORS = {
+    "Xvideos": ("span.duration", "span.video-hd-mark, span.video-sd-mark"),
+    "EPorner": ("span.mbtim", "span.mvhdico"),
+    "PornRabbit": ("span.duration, .duration", ".hd, .quality"),
+    "SpankBang": ("span.l, .duration", "span.h, .hd"),
+    "YouPorn": ("div.video-duration, span.video-duration, .duration", ".video-best-resolution, .hd-icon, .hd"),
+    "Pornhub": ("var.duration, .duration", "span.hd-thumbnail, .hd"),
+    "RedTube": ("span.duration, .video_duration", "span.hd-video-icon, .hd"),
+    "Tube8": ("span.video-duration, .duration", ".hd-video, .hd"),
+}
+DEFAULT_LISTING_META_SELECTORS = (".duration", ".hd, .quality")
+
+# Scrape incremental: cuántos items de cabecera del listado forman la marca de un sitio y cuántas URLs
+# recientes se recuerdan por sitio para saltarlas sin gastar presupuesto
+CHECKPOINT_HEAD_SIZE = 10
+CHECKPOINT_RECENT_SIZE = 500
+# Marcas seguidas que hay que encontrar para dar por alcanzado el contenido ya ingerido (un item fijado
+# arriba del listado coincide con la marca pero va seguido de contenido nuevo)
+CHECKPOINT_MATCH_RUN = 2
+
+# Tamaño de bloque para las consultas IN de save_videos_to_db (SQLite limita las variables por sentencia)
+SAVE_DB_CHUNK_SIZE = 500
+
 def clean_original_url(url_str):
     """Normaliza y limpia una URL (de página de video o embed real) para la deduplicación."""
     if not isinstance(url_str, str):
@@ -79,23 +147,33 @@ def handle_redirection(driver, original_url):
         logger.warning(f"Error manejando redirección para {original_url}: {e}")
         return original_url
 
+def _wait_for_overlay_gone(driver, clicked_element, timeout=None):
+    """Espera a que desaparezca el botón/overlay de verificación que se acaba de pulsar (o a que la página se recargue)."""
+    try:
+        WebDriverWait(driver, timeout or AGE_GATE_TIMEOUT, poll_frequency=READINESS_POLL_INTERVAL).until(
+            EC.invisibility_of_element(clicked_element)
+        )
+    except TimeoutException:
+        logger.debug("El overlay de verificación de edad sigue visible tras el clic; se continúa igualmente.")
+
 def handle_age_verification(driver, url, age_verification_selectors=None):
     try:
         if age_verification_selectors is None:
             age_verification_selectors = []
 
-        for selector in age_verification_selectors:
+        # Una sola espera para todos los selectores del sitio en lugar de una espera por selector
+        if age_verification_selectors:
             try:
-                btn = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
+                btn = WebDriverWait(driver, AGE_GATE_TIMEOUT, poll_frequency=READINESS_POLL_INTERVAL).until(
+                    EC.element_to_be_clickable((By.CSS_SELECTOR, ", ".join(age_verification_selectors)))
                 )
                 if btn and btn.is_displayed():
                     driver.execute_script("arguments[0].click();", btn)
-                    logger.info(f"✅ Click en verificación edad: {selector} en {url}")
-                    time.sleep(random.uniform(3, 5))
+                    logger.info(f"✅ Click en verificación edad: {age_verification_selectors} en {url}")
+                    _wait_for_overlay_gone(driver, btn)
                     return True
             except TimeoutException:
-                continue
+                pass
 
         text_selectors = ["Enter", "18", "Accept", "Yes, I am over 18", "I am 18 or older", "Confirm"]
         for text in text_selectors:
@@ -104,19 +182,17 @@ def handle_age_verification(driver, url, age_verification_selectors=None):
                 for btn in buttons:
                     if btn.is_displayed() and btn.is_enabled():
                         driver.execute_script("arguments[0].scrollIntoView(true);", btn)
-                        time.sleep(0.2)
                         driver.execute_script("arguments[0].click();", btn)
                         logger.info(f"✅ Clic en botón verificación por texto: '{text}' en {url}")
-                        time.sleep(random.uniform(3, 5))
+                        _wait_for_overlay_gone(driver, btn)
                         return True
                 links = driver.find_elements(By.XPATH, f"//a[contains(translate(normalize-space(.), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{text.lower()}')]")
                 for link_el in links:
                     if link_el.is_displayed() and link_el.is_enabled():
                         driver.execute_script("arguments[0].scrollIntoView(true);", link_el)
-                        time.sleep(0.2)
                         driver.execute_script("arguments[0].click();", link_el)
                         logger.info(f"✅ Clic en enlace verificación por texto: '{text}' en {url}")
-                        time.sleep(random.uniform(3, 5))
+                        _wait_for_overlay_gone(driver, link_el)
                         return True
             except Exception as e:
                 logger.warning(f"⚠️ Error clic por texto '{text}' en {url}: {e}")
@@ -131,46 +207,285 @@ def handle_age_verification(driver, url, age_verification_selectors=None):
         logger.error(f"⛔ Error manejando verificación edad en {url}: {e}")
         return False
 
-def get_direct_video_url(embed_url, driver=None):
-    if not embed_url:
-        return None
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'format': 'best[ext=mp4]/best[ext=m3u8]/best',
-        'noplaylist': True,
-        'simulate': True,
-        'geturl': True,
-        'logger': logger,
-        'socket_timeout': 30,
-        'nocheckcertificate': True,
-        'extract_flat': True,
-        'no_color': True,
-        'age_limit': 0,
-        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'http_headers': {
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-us,en;q=0.5',
-            'Sec-Fetch-Mode': 'navigate',
-        }
+_READINESS_JS = """
+return [document.readyState, document.querySelectorAll(arguments[0]).length];
+"""
+
+def wait_for_listing_ready(driver, css_selector, deadline):
+    """Espera a que el listado esté listo: documento cargado y número de items estable.
+
+    Solo cuenta items: el tráfico de red de anuncios, beacons y previews de los tubes no se estabiliza nunca.
+    Devuelve el número de items, ya estable, o 0 si se agotó el plazo `deadline` (en segundos de time.monotonic())
+    sin que el documento terminara de cargar o el número de items dejara de cambiar.
+    """
+    last_count = None
+    stable_polls = 0
+    while time.monotonic() < deadline:
+        ready_state, item_count = driver.execute_script(_READINESS_JS, css_selector)
+        if ready_state == 'complete' and item_count > 0 and item_count == last_count:
+            stable_polls += 1
+            if stable_polls >= READINESS_STABLE_POLLS:
+                return item_count
+        else:
+            stable_polls = 0
+        last_count = item_count
+        time.sleep(READINESS_POLL_INTERVAL)
+    return 0
+
+def scroll_listing_until_stable(driver, css_selector, deadline, max_scrolls=3):
+    """Hace scroll para disparar la carga diferida y para en cuanto un scroll ya no trae items nuevos.
+
+    Devuelve 0 si el listado no llegó a estar listo; si solo se agota el plazo tras un scroll, se queda con los
+    items que ya estaban estables antes de él.
+    """
+    item_count = wait_for_listing_ready(driver, css_selector, deadline)
+    for _ in range(max_scrolls):
+        if time.monotonic() >= deadline:
+            break
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        new_count = wait_for_listing_ready(driver, css_selector, deadline)
+        if new_count <= item_count:
+            break
+        item_count = new_count
+    return item_count
+
+def polite_pause(scrape_session):
+    """Pausa explícita de cortesía entre peticiones a un mismo sitio (límite de ritmo, no espera de carga)."""
+    if scrape_session.politeness_delay > 0:
+        time.sleep(scrape_session.politeness_delay)
+
+# Resolución de URLs directas con yt-dlp: pool acotado de workers, un YoutubeDL reutilizado por hilo y caché
+# por URL de embed cuyo TTL sale de la expiración firmada de la URL resuelta
+DIRECT_URL_WORKERS = 4
+DIRECT_URL_SOCKET_TIMEOUT = 30
+DIRECT_URL_CACHE_SIZE = 2000
+DIRECT_URL_DEFAULT_TTL = 30 * 60
+DIRECT_URL_MAX_TTL = 6 * 60 * 60
+DIRECT_URL_FAILURE_TTL = 2 * 60
+# Margen antes de la expiración firmada para no servir una URL a punto de caducar
+DIRECT_URL_EXPIRY_MARGIN = 60
+# Parámetros de expiración (epoch en segundos) que usan los CDN al firmar URLs de media
+DIRECT_URL_EXPIRY_PARAMS = ('expire', 'expires', 'e', 'validto', 'exp')
+_AKAMAI_EXP_RE = re.compile(r'(?:^|[~&])exp=(\d{9,11})')
+
+YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'format': 'best[ext=mp4]/best[ext=m3u8]/best',
+    'noplaylist': True,
+    'simulate': True,
+    'geturl': True,
+    'logger': logger,
+    'socket_timeout': DIRECT_URL_SOCKET_TIMEOUT,
+    'nocheckcertificate': True,
+    'extract_flat': True,
+    'no_color': True,
+    'age_limit': 0,
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'http_headers': {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-us,en;q=0.5',
+        'Sec-Fetch-Mode': 'navigate',
     }
+}
+
+def direct_url_expiry(direct_url):
+    """Epoch de expiración firmado en la URL de media (query o token tipo Akamai), o None si no lo lleva."""
+    if not direct_url:
+        return None
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(embed_url, download=False)
-            if info and 'url' in info:
-                return info['url']
-            elif info and 'formats' in info and info['formats']:
-                # Intentar obtener la mejor calidad de video disponible
-                formats = info['formats']
-                for f in formats:
-                    if f.get('ext') in ['mp4', 'm3u8'] and f.get('url'):
-                        return f['url']
-                # Si no encontramos mp4 o m3u8, usar cualquier formato disponible
-                return formats[-1].get('url')
-    except Exception as e:
-        logger.warning(f"yt-dlp: No se pudo obtener URL directa para {embed_url}: {e}")
+        query = parse_qs(urlparse(direct_url).query)
+    except ValueError:
+        return None
+    candidates = []
+    for key, values in query.items():
+        if key.lower() in DIRECT_URL_EXPIRY_PARAMS:
+            candidates.extend(values)
+        else:
+            for value in values:
+                match = _AKAMAI_EXP_RE.search(value)
+                if match:
+                    candidates.append(match.group(1))
+    for value in candidates:
+        if value.isdigit() and 9 <= len(value) <= 11:
+            return int(value)
     return None
 
+def _pick_direct_url(info):
+    if not info:
+        return None
+    if info.get('url'):
+        return info['url']
+    formats = info.get('formats') or []
+    if not formats:
+        return None
+    # Intentar obtener la mejor calidad de video disponible
+    for f in formats:
+        if f.get('ext') in ['mp4', 'm3u8'] and f.get('url'):
+            return f['url']
+    # Si no encontramos mp4 o m3u8, usar cualquier formato disponible
+    return formats[-1].get('url')
+
+class DirectUrlResolver:
+    """Resuelve URLs directas de media en un pool acotado de hilos y las cachea hasta su expiración firmada.
+
+    Las peticiones simultáneas de la misma URL de embed comparten una sola extracción.
+    """
+
+    def __init__(self, max_workers=DIRECT_URL_WORKERS, cache_size=DIRECT_URL_CACHE_SIZE,
+                 default_ttl=DIRECT_URL_DEFAULT_TTL, failure_ttl=DIRECT_URL_FAILURE_TTL):
+        self.max_workers = max(1, max_workers)
+        self.cache_size = cache_size
+        self.default_ttl = default_ttl
+        self.failure_ttl = failure_ttl
+        self._cache = OrderedDict()  # embed_url -> (direct_url o None, expira_en)
+        self._inflight = {}
+        self._executor = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ytdlp")
+        return self._executor
+
+    def _get_ydl(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(YDL_OPTS)
+            self._local.ydl = ydl
+        return ydl
+
+    def _discard_ydl(self):
+        ydl = getattr(self._local, 'ydl', None)
+        self._local.ydl = None
+        if ydl is not None:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+
+    def _ttl_for(self, direct_url, now):
+        if direct_url is None:
+            return self.failure_ttl
+        expiry = direct_url_expiry(direct_url)
+        if expiry is None:
+            return self.default_ttl
+        return max(0, min(expiry - now - DIRECT_URL_EXPIRY_MARGIN, DIRECT_URL_MAX_TTL))
+
+    def cached(self, embed_url):
+        """(encontrado, direct_url) según la caché, sin lanzar extracciones."""
+        with self._lock:
+            entry = self._cache.get(embed_url)
+            if entry is None:
+                return False, None
+            if entry[1] <= time.time():
+                del self._cache[embed_url]
+                return False, None
+            self._cache.move_to_end(embed_url)
+            return True, entry[0]
+
+    def _store(self, embed_url, direct_url):
+        now = time.time()
+        ttl = self._ttl_for(direct_url, now)
+        with self._lock:
+            if ttl > 0:
+                self._cache[embed_url] = (direct_url, now + ttl)
+                self._cache.move_to_end(embed_url)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            self._inflight.pop(embed_url, None)
+
+    def _extract(self, embed_url):
+        direct_url = None
+        try:
+            info = self._get_ydl().extract_info(embed_url, download=False)
+            direct_url = _pick_direct_url(info)
+        except Exception as e:
+            logger.warning(f"yt-dlp: No se pudo obtener URL directa para {embed_url}: {e}")
+            # Una extracción fallida puede dejar la instancia con estado a medias; el siguiente uso crea otra
+            self._discard_ydl()
+        finally:
+            self._store(embed_url, direct_url)
+        return direct_url
+
+    def submit(self, embed_url):
+        """Future con la URL directa; reutiliza la extracción en curso si ya hay una para ese embed."""
+        with self._lock:
+            future = self._inflight.get(embed_url)
+            if future is None:
+                future = self._get_executor().submit(self._extract, embed_url)
+                self._inflight[embed_url] = future
+        return future
+
+    def resolve(self, embed_url, timeout=None):
+        if not embed_url:
+            return None
+        found, direct_url = self.cached(embed_url)
+        if found:
+            return direct_url
+        try:
+            return self.submit(embed_url).result(timeout=timeout)
+        except FuturesTimeoutError:
+            logger.warning(f"yt-dlp: Tiempo agotado esperando la URL directa de {embed_url}.")
+            return None
+
+    def resolve_many(self, embed_urls, timeout=None):
+        """Resuelve un lote en paralelo. Devuelve {embed_url: direct_url o None}; lo no resuelto a tiempo queda en None."""
+        results = {}
+        pending = {}
+        for embed_url in embed_urls:
+            if not embed_url or embed_url in results or embed_url in pending:
+                continue
+            found, direct_url = self.cached(embed_url)
+            if found:
+                results[embed_url] = direct_url
+            else:
+                pending[embed_url] = self.submit(embed_url)
+        if pending:
+            done, not_done = futures_wait(pending.values(), timeout=timeout)
+            for embed_url, future in pending.items():
+                results[embed_url] = future.result() if future in done else None
+            if not_done:
+                logger.warning(f"yt-dlp: {len(not_done)} de {len(pending)} URLs directas sin resolver dentro del plazo.")
+        return results
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+_direct_url_resolver = None
+_direct_url_resolver_lock = threading.Lock()
+
+def configure_direct_url_resolver(**resolver_options):
+    """Fija las opciones del resolvedor compartido de URLs directas (llamar antes del primer uso)."""
+    global _direct_url_resolver
+    with _direct_url_resolver_lock:
+        if _direct_url_resolver is not None:
+            _direct_url_resolver.shutdown()
+        _direct_url_resolver = DirectUrlResolver(**resolver_options)
+    return _direct_url_resolver
+
+def get_direct_url_resolver():
+    global _direct_url_resolver
+    with _direct_url_resolver_lock:
+        if _direct_url_resolver is None:
+            _direct_url_resolver = DirectUrlResolver()
+        return _direct_url_resolver
+
+def get_direct_video_url(embed_url, driver=None, timeout=None):
+    return get_direct_url_resolver().resolve(embed_url, timeout=timeout)
+
+def get_direct_video_urls(embed_urls, timeout=None):
+    """Versión por lotes de get_direct_video_url: todas las extracciones en paralelo, acotadas por el pool."""
+    return get_direct_url_resolver().resolve_many(embed_urls, timeout=timeout)
+
 def generate_video_player_url(original_embed_url_o_pagina, source_site_name):
     if not original_embed_url_o_pagina:
         return None
@@ -218,402 +533,182 @@ def generate_video_player_url(original_embed_url_o_pagina, source_site_name):
     # Si todo lo demás falla, usar la URL original
     return original_embed_url_o_pagina
 
+FIX_URLS_JOB_NAME = 'fix_video_urls'
+FIX_URLS_CHUNK_SIZE = 500
+
+def repaired_embed_url(original_cleaned_url, original_page_url, source):
+    """URL de reproducción regenerada: primero desde la URL de embed original y si no desde la de página."""
+    for original_url in (original_cleaned_url, original_page_url):
+        if original_url:
+            new_url = generate_video_player_url(original_url, source)
+            if new_url:
+                return new_url
+    return None
+
+def get_fix_urls_checkpoint():
+    return JobCheckpoint.query.filter_by(job_name=FIX_URLS_JOB_NAME).first()
+
+_FIX_URLS_COUNTERS = ('last_id', 'processed', 'changed', 'failed')
+
+def _start_fix_urls_checkpoint(restart):
+    checkpoint = get_fix_urls_checkpoint()
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(job_name=FIX_URLS_JOB_NAME)
+        db.session.add(checkpoint)
+        restart = True
+    if restart or checkpoint.completed_at is not None:
+        checkpoint.last_id, checkpoint.processed, checkpoint.changed, checkpoint.failed = 0, 0, 0, 0
+        checkpoint.completed_at = None
+    elif checkpoint.last_id:
+        logger.info(f"FIX_URLS: Reanudando desde el video {checkpoint.last_id} ({checkpoint.processed} ya procesados).")
+    db.session.commit()
+    return {name: getattr(checkpoint, name) for name in _FIX_URLS_COUNTERS}
+
+def _save_fix_urls_chunk(changes, state, completed=False):
+    if changes:
+        # UPDATE por lotes por clave primaria (executemany), solo de las filas que cambian
+        db.session.execute(update(Video), changes)
+    db.session.execute(update(JobCheckpoint).where(JobCheckpoint.job_name == FIX_URLS_JOB_NAME)
+                       .values(completed_at=datetime.utcnow() if completed else None, updated_at=datetime.utcnow(), **state))
+    db.session.commit()
+
+def repair_video_urls(restart=False, chunk_size=FIX_URLS_CHUNK_SIZE, should_stop=None, progress=None):
+    """Regenera embed_url de todo el catálogo por bloques de clave primaria, reanudando donde se quedó.
+
+    Cada bloque lee solo las columnas necesarias, escribe con un UPDATE por lotes únicamente las filas cuya URL
+    cambia y confirma junto con el checkpoint (JobCheckpoint), así que una interrupción pierde como mucho un
+    bloque. Las escrituras pasan por la cola de escritura (basedatos.run_write) y las lecturas no dejan
+    transacciones abiertas. Con `restart` (o si la pasada anterior terminó) empieza desde el principio.
+    `progress(estado)` recibe tras cada bloque un dict con last_id, processed, changed y failed, que es también
+    lo que devuelve.
+    """
+    state = run_write(_start_fix_urls_checkpoint, restart)
+
+    while True:
+        if should_stop and should_stop():
+            logger.info(f"FIX_URLS: Detenido en el video {state['last_id']}; se reanudará desde ahí.")
+            break
+        rows = db.session.execute(
+            select(Video.id, Video.embed_url, Video.original_cleaned_url, Video.original_page_url, Video.source)
+            .where(Video.id > state['last_id'])
+            .order_by(Video.id)
+            .limit(chunk_size)
+        ).all()
+        # Cierra la transacción de lectura: con WAL, una lectura abierta impide los checkpoints del fichero -wal
+        db.session.rollback()
+        if not rows:
+            run_write(_save_fix_urls_chunk, [], state, completed=True)
+            logger.info(f"FIX_URLS: Terminado: {state['processed']} procesados, {state['changed']} corregidos, {state['failed']} sin URL válida.")
+            break
+
+        changes = []
+        for row in rows:
+            try:
+                new_url = repaired_embed_url(row.original_cleaned_url, row.original_page_url, row.source)
+            except Exception as e:
+                logger.error(f"FIX_URLS: Error al procesar video ID {row.id}: {e}")
+                new_url = None
+            if not new_url:
+                state['failed'] += 1
+                logger.debug(f"FIX_URLS: No se pudo generar una URL válida para el video ID {row.id}")
+            elif new_url != row.embed_url:
+                changes.append({'id': row.id, 'embed_url': new_url})
+        state['changed'] += len(changes)
+        state['processed'] += len(rows)
+        state['last_id'] = rows[-1].id
+        run_write(_save_fix_urls_chunk, changes, dict(state))
+        if progress:
+            progress(state)
+        logger.info(f"FIX_URLS: Hasta el video {state['last_id']}: {state['processed']} procesados, {state['changed']} corregidos.")
+    return state
+
+# Parámetros estándar que se añaden a toda URL de embed
+EMBED_QUERY_PARAMS = {
+    'autoplay': '0',
+    'controls': '1',
+    'mute': '0',
+    'loop': '0',
+    'show_title': '1',
+    'show_byline': '1',
+    'show_portrait': '0',
+    'color': 'ffffff'
+}
+
+# host (sin 'www.') -> (patrón de la URL de página, plantilla de la URL de embed)
+EMBED_PATTERNS_BY_HOST = {
+    'pornhub.com': (r'https?://(?:www\.)?pornhub\.com/embed/([a-zA-Z0-9]+)', 'https://www.pornhub.com/embed/{}'),
+    'xvideos.com': (r'https?://(?:www\.)?xvideos\.com/video([0-9]+)/', 'https://www.xvideos.com/embedframe/{}'),
+    'xhamster.com': (r'https?://(?:www\.)?xhamster\.com/videos/([^/]+)/', 'https://embed.xhamster.com/embed/{}'),
+    'redtube.com': (r'https?://(?:www\.)?redtube\.com/([0-9]+)', 'https://embed.redtube.com/?video_id={}'),
+    'youporn.com': (r'https?://(?:www\.)?youporn\.com/watch/([0-9]+)/', 'https://www.youporn.com/embed/{}'),
+    'tube8.com': (r'https?://(?:www\.)?tube8\.com/video/([0-9]+)/', 'https://embed.tube8.com/embed/{}'),
+    'dr-tuber.com': (r'https?://(?:www\.)?dr-tuber\.com/video/([0-9]+)/', 'https://embed.dr-tuber.com/embed/{}'),
+    'tnaflix.com': (r'https?://(?:www\.)?tnaflix\.com/([^/]+)/([0-9]+)/', 'https://embed.tnaflix.com/embed/{}'),
+    'spankbang.com': (r'https?://(?:www\.)?spankbang\.com/([a-zA-Z0-9]+)/', 'https://embed.spankbang.com/embed/{}'),
+    'okxxx.com': (r'https?://(?:www\.)?okxxx\.com/video/([0-9]+)/', 'https://embed.okxxx.com/embed/{}'),
+    'hclips.com': (r'https?://(?:www\.)?hclips\.com/video/([0-9]+)/', 'https://embed.hclips.com/embed/{}'),
+    'voyeurhit.com': (r'https?://(?:www\.)?voyeurhit\.com/video/([0-9]+)/', 'https://embed.voyeurhit.com/embed/{}'),
+    'gotporn.com': (r'https?://(?:www\.)?gotporn\.com/video/([0-9]+)/', 'https://embed.gotporn.com/embed/{}'),
+    'videosz.com': (r'https?://(?:www\.)?videosz\.com/video/([0-9]+)/', 'https://embed.videosz.com/embed/{}'),
+    'bigporn.com': (r'https?://(?:www\.)?bigporn\.com/video/([0-9]+)/', 'https://embed.bigporn.com/embed/{}'),
+    'analvids.com': (r'https?://(?:www\.)?analvids\.com/video/([0-9]+)/', 'https://embed.analvids.com/embed/{}'),
+    '4tube.com': (r'https?://(?:www\.)?4tube\.com/video/([0-9]+)/', 'https://embed.4tube.com/embed/{}'),
+    'freeones.com': (r'https?://(?:www\.)?freeones\.com/video/([0-9]+)/', 'https://embed.freeones.com/embed/{}'),
+    'hotmovs.com': (r'https?://(?:www\.)?hotmovs\.com/video/([0-9]+)/', 'https://embed.hotmovs.com/embed/{}'),
+    'nuvid.com': (r'https?://(?:www\.)?nuvid\.com/video/([0-9]+)/', 'https://embed.nuvid.com/embed/{}'),
+}
+
+# Patrones de respaldo por fuente, para URLs que no son del host canónico (espejos, rutas relativas...)
+EMBED_FALLBACK_PATTERNS_BY_SOURCE = {
+    'YouPorn': ([r'/watch/([0-9]+)/', r'/embed/([0-9]+)/'], 'https://www.youporn.com/embed/{}/'),
+    'Pornhub': ([r'viewkey=([a-zA-Z0-9]+)', r'/embed/([a-zA-Z0-9]+)(?:/|$)'], 'https://www.pornhub.com/embed/{}'),
+    'Xvideos': ([r'/video([0-9]+)/', r'/embedframe/([0-9]+)/'], 'https://www.xvideos.com/embedframe/{}'),
+}
+
+# Compilados una sola vez al importar: get_embed_url despacha por host en O(1) en lugar de probar cada patrón
+_EMBED_QUERY = urlencode(EMBED_QUERY_PARAMS)
+_EMBED_RESOLVERS_BY_HOST = {
+    host: (re.compile(pattern), base) for host, (pattern, base) in EMBED_PATTERNS_BY_HOST.items()
+}
+_EMBED_FALLBACKS_BY_SOURCE = {
+    source: ([re.compile(pattern) for pattern in patterns], base)
+    for source, (patterns, base) in EMBED_FALLBACK_PATTERNS_BY_SOURCE.items()
+}
+
+def _with_embed_query(embed_url):
+    separator = '&' if '?' in embed_url else '?'
+    embed_url = f'{embed_url}{separator}{_EMBED_QUERY}'
+    # Asegurarse que la URL es HTTPS
+    if not embed_url.startswith('https://'):
+        embed_url = embed_url.replace('http://', 'https://')
+    return embed_url
+
 def get_embed_url(source, url):
     """Obtiene la URL de embed real de una URL de video."""
     try:
         if not url:
             return None
-            
-        # URLs conocidas de embed con sus respectivos parámetros
-        embed_patterns = {
-            'pornhub': {
-                'pattern': r'https?://(?:www\.)?pornhub\.com/embed/([a-zA-Z0-9]+)',
-                'base': 'https://www.pornhub.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'xvideos': {
-                'pattern': r'https?://(?:www\.)?xvideos\.com/video([0-9]+)/',
-                'base': 'https://www.xvideos.com/embedframe/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'xhamster': {
-                'pattern': r'https?://(?:www\.)?xhamster\.com/videos/([^/]+)/',
-                'base': 'https://embed.xhamster.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'redtube': {
-                'pattern': r'https?://(?:www\.)?redtube\.com/([0-9]+)',
-                'base': 'https://embed.redtube.com/?video_id={}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'youporn': {
-                'pattern': r'https?://(?:www\.)?youporn\.com/watch/([0-9]+)/',
-                'base': 'https://www.youporn.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'tube8': {
-                'pattern': r'https?://(?:www\.)?tube8\.com/video/([0-9]+)/',
-                'base': 'https://embed.tube8.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'dr-tuber': {
-                'pattern': r'https?://(?:www\.)?dr-tuber\.com/video/([0-9]+)/',
-                'base': 'https://embed.dr-tuber.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'tnaflix': {
-                'pattern': r'https?://(?:www\.)?tnaflix\.com/([^/]+)/([0-9]+)/',
-                'base': 'https://embed.tnaflix.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'spankbang': {
-                'pattern': r'https?://(?:www\.)?spankbang\.com/([a-zA-Z0-9]+)/',
-                'base': 'https://embed.spankbang.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'okxxx': {
-                'pattern': r'https?://(?:www\.)?okxxx\.com/video/([0-9]+)/',
-                'base': 'https://embed.okxxx.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'hclips': {
-                'pattern': r'https?://(?:www\.)?hclips\.com/video/([0-9]+)/',
-                'base': 'https://embed.hclips.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'voyeurhit': {
-                'pattern': r'https?://(?:www\.)?voyeurhit\.com/video/([0-9]+)/',
-                'base': 'https://embed.voyeurhit.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'gotporn': {
-                'pattern': r'https?://(?:www\.)?gotporn\.com/video/([0-9]+)/',
-                'base': 'https://embed.gotporn.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'videosz': {
-                'pattern': r'https?://(?:www\.)?videosz\.com/video/([0-9]+)/',
-                'base': 'https://embed.videosz.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'bigporn': {
-                'pattern': r'https?://(?:www\.)?bigporn\.com/video/([0-9]+)/',
-                'base': 'https://embed.bigporn.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'analvids': {
-                'pattern': r'https?://(?:www\.)?analvids\.com/video/([0-9]+)/',
-                'base': 'https://embed.analvids.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            '4tube': {
-                'pattern': r'https?://(?:www\.)?4tube\.com/video/([0-9]+)/',
-                'base': 'https://embed.4tube.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'freeones': {
-                'pattern': r'https?://(?:www\.)?freeones\.com/video/([0-9]+)/',
-                'base': 'https://embed.freeones.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'hotmovs': {
-                'pattern': r'https?://(?:www\.)?hotmovs\.com/video/([0-9]+)/',
-                'base': 'https://embed.hotmovs.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            },
-            'nuvid': {
-                'pattern': r'https?://(?:www\.)?nuvid\.com/video/([0-9]+)/',
-                'base': 'https://embed.nuvid.com/embed/{}',
-                'params': {
-                    'autoplay': '0',
-                    'controls': '1',
-                    'mute': '0',
-                    'loop': '0',
-                    'show_title': '1',
-                    'show_byline': '1',
-                    'show_portrait': '0',
-                    'color': 'ffffff'
-                }
-            }
-        }
-        
-        # Primero intentar con los patrones conocidos
-        for site, config in embed_patterns.items():
-            match = re.search(config['pattern'], url)
-            if match:
-                video_id = match.group(1)
-                embed_url = config['base'].format(video_id)
-                
-                # Añadir parámetros estándar
-                query_params = urlencode(config['params'])
-                if '?' not in embed_url:
-                    embed_url += f'?{query_params}'
-                else:
-                    embed_url += f'&{query_params}'
-                
-                # Asegurarse que la URL es HTTPS
-                if not embed_url.startswith('https://'):
-                    embed_url = embed_url.replace('http://', 'https://')
-                
-                return embed_url
-        
-        # Si no se encontró con los patrones conocidos, intentar con patrones específicos
-        if source == "YouPorn":
-            patterns = [
-                r'/watch/([0-9]+)/',
-                r'/embed/([0-9]+)/'
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    video_id = match.group(1)
-                    embed_url = f"https://www.youporn.com/embed/{video_id}/"
-                    
-                    # Añadir parámetros estándar
-                    params = {
-                        'autoplay': '0',
-                        'controls': '1',
-                        'mute': '0',
-                        'loop': '0',
-                        'show_title': '1',
-                        'show_byline': '1',
-                        'show_portrait': '0',
-                        'color': 'ffffff'
-                    }
-                    query_params = urlencode(params)
-                    embed_url += f'?{query_params}'
-                    
-                    return embed_url
-            logger.warning(f"No se pudo extraer el ID del video de la URL de YouPorn: {url}")
-            return url
 
-        elif source == "Pornhub":
-            patterns = [
-                r'viewkey=([a-zA-Z0-9]+)',
-                r'/embed/([a-zA-Z0-9]+)(?:/|$)'
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    video_id = match.group(1)
-                    embed_url = f"https://www.pornhub.com/embed/{video_id}"
-                    
-                    # Añadir parámetros estándar
-                    params = {
-                        'autoplay': '0',
-                        'controls': '1',
-                        'mute': '0',
-                        'loop': '0',
-                        'show_title': '1',
-                        'show_byline': '1',
-                        'show_portrait': '0',
-                        'color': 'ffffff'
-                    }
-                    query_params = urlencode(params)
-                    embed_url += f'?{query_params}'
-                    
-                    return embed_url
-            logger.warning(f"No se pudo extraer el ID del video de la URL de Pornhub: {url}")
-            return url
+        # Primero intentar con el patrón del host de la URL
+        host = (urlparse(url).hostname or '')
+        if host.startswith('www.'):
+            host = host[4:]
+        resolver = _EMBED_RESOLVERS_BY_HOST.get(host)
+        if resolver:
+            compiled_pattern, base = resolver
+            match = compiled_pattern.search(url)
+            if match:
+                return _with_embed_query(base.format(match.group(1)))
 
-        elif source == "Xvideos":
-            patterns = [
-                r'/video([0-9]+)/',
-                r'/embedframe/([0-9]+)/'
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, url)
+        # Si no se encontró con los patrones conocidos, intentar con patrones específicos de la fuente
+        fallback = _EMBED_FALLBACKS_BY_SOURCE.get(source)
+        if fallback:
+            compiled_patterns, base = fallback
+            for compiled_pattern in compiled_patterns:
+                match = compiled_pattern.search(url)
                 if match:
-                    video_id = match.group(1)
-                    embed_url = f"https://www.xvideos.com/embedframe/{video_id}"
-                    
-                    # Añadir parámetros estándar
-                    params = {
-                        'autoplay': '0',
-                        'controls': '1',
-                        'mute': '0',
-                        'loop': '0',
-                        'show_title': '1',
-                        'show_byline': '1',
-                        'show_portrait': '0',
-                        'color': 'ffffff'
-                    }
-                    query_params = urlencode(params)
-                    embed_url += f'?{query_params}'
-                    
-                    return embed_url
-            logger.warning(f"No se pudo extraer el ID del video de la URL de Xvideos: {url}")
+                    return _with_embed_query(base.format(match.group(1)))
+            logger.warning(f"No se pudo extraer el ID del video de la URL de {source}: {url}")
             return url
 
         logger.debug(f"Fuente '{source}' no tiene un patrón de URL de embed definido en get_embed_url.")
@@ -623,6 +718,20 @@ def get_embed_url(source, url):
         logger.error(f"Error convirtiendo URL de página a URL de embed para {source} ({url}): {e}")
         return None
 
+def get_embed_urls(source_url_pairs):
+    """Versión por lotes de get_embed_url: recibe pares (source, url) y devuelve las URLs de embed en el mismo orden.
+
+    Las URLs repetidas dentro del lote se resuelven una sola vez.
+    """
+    resolved = {}
+    results = []
+    for source, url in source_url_pairs:
+        key = (source, url)
+        if key not in resolved:
+            resolved[key] = get_embed_url(source, url)
+        results.append(resolved[key])
+    return results
+
 def normalize_embed_url(embed_url, source):
     if embed_url is None: return None
     if embed_url.startswith("//"): return "https:" + embed_url
@@ -672,19 +781,376 @@ def extract_category_from_iframe(driver, iframe_url):
             driver.switch_to.window(current_window)
         return "General"
 
-def scrape_site(driver, site_name, url_template, css_selector, link_selector, thumb_selector, title_selector, limit_per_site, max_pages=30, max_retries=3, age_verification_selectors=None, global_seen_video_page_urls=None):
+class ScrapeSession:
+    """Estado compartido de una sesión de scrape: deduplicación de URLs y presupuesto global.
+
+    Es seguro entre hilos, así que varios `scrape_site` concurrentes pueden compartir la misma instancia.
+    """
+
+    def __init__(self, max_videos=None, seen_urls=None, page_budget=PAGE_LATENCY_BUDGET, politeness_delay=POLITENESS_DELAY):
+        self.max_videos = max_videos
+        self.seen_urls = seen_urls if seen_urls is not None else set()
+        self.collected = 0
+        self.page_budget = page_budget
+        self.politeness_delay = politeness_delay
+        # Scrape incremental: marcas cargadas de ScrapeCheckpoint y lo observado en esta sesión, por sitio
+        self.checkpoint_marks = {}
+        self.listing_heads = {}
+        self.caught_up_sites = set()
+        self.collected_by_site = {}
+        self._mark_runs = {}
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Pide a todos los hilos de scrape que paren en el próximo punto de control."""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def is_seen(self, cleaned_url):
+        with self._lock:
+            return cleaned_url in self.seen_urls
+
+    def claim(self, cleaned_url, site_name=None):
+        """Reserva una URL limpia si no se ha visto y queda presupuesto. Devuelve True si se reservó."""
+        with self._lock:
+            if cleaned_url in self.seen_urls:
+                return False
+            if self.max_videos is not None and self.collected >= self.max_videos:
+                return False
+            self.seen_urls.add(cleaned_url)
+            self.collected += 1
+            if site_name:
+                self.collected_by_site.setdefault(site_name, []).append(cleaned_url)
+            return True
+
+    def record_listing_url(self, site_name, page, cleaned_url):
+        """Anota los primeros items de la primera página del listado: serán la nueva marca del sitio."""
+        if page != 1:
+            return
+        with self._lock:
+            head = self.listing_heads.setdefault(site_name, [])
+            if len(head) < CHECKPOINT_HEAD_SIZE and cleaned_url not in head:
+                head.append(cleaned_url)
+
+    def reached_checkpoint(self, site_name, cleaned_url):
+        """True si el listado llegó al contenido ya ingerido en el último scrape completo del sitio.
+
+        Hacen falta CHECKPOINT_MATCH_RUN marcas seguidas. Las marcas que reaparecen por encima de contenido
+        nuevo son items fijados (pinned/sticky) y se descartan para el resto de la sesión.
+        """
+        with self._lock:
+            marks = self.checkpoint_marks.get(site_name)
+            if not marks:
+                return False
+            run = self._mark_runs.setdefault(site_name, [])
+            if cleaned_url in marks:
+                if cleaned_url not in run:
+                    run.append(cleaned_url)
+                return len(run) >= min(CHECKPOINT_MATCH_RUN, len(marks))
+            if run:
+                logger.info(f"SCRAPE_SITE [{site_name}]: Ignorando marcas seguidas de contenido nuevo (items fijados): {run}")
+                marks.difference_update(run)
+                run.clear()
+            return False
+
+    def is_checkpoint_mark(self, site_name, cleaned_url):
+        with self._lock:
+            return cleaned_url in self.checkpoint_marks.get(site_name, ())
+
+    def mark_caught_up(self, site_name):
+        with self._lock:
+            self.caught_up_sites.add(site_name)
+
+    def exhausted(self):
+        if self._cancel_event.is_set():
+            return True
+        with self._lock:
+            return self.max_videos is not None and self.collected >= self.max_videos
+
+def listing_meta_selectors(site_name):
+    return LISTING_META_SELECTORS.get(site_name, DEFAULT_LISTING_META_SELECTORS)
+
+def _build_video_item(site_name, original_video_page_url, title, thumbnail_url, duration_text=None, quality_text=None):
+    """Construye el dict de video que espera save_videos_to_db a partir de los datos crudos de un item del listado."""
+    duration_seconds, video_height = extract_video_metadata(title, duration_text, quality_text)
+    real_embed_url_from_source = get_embed_url(site_name, original_video_page_url)
+    real_embed_url_normalized = normalize_embed_url(real_embed_url_from_source, site_name)
+    player_url_for_db = generate_video_player_url(real_embed_url_normalized if real_embed_url_normalized else original_video_page_url, site_name)
+    category = "General"
+
+    return {
+        'title': title[:250],
+        'embed_url_for_player': player_url_for_db,
+        'original_video_page_url': original_video_page_url,
+        'original_embed_url': real_embed_url_normalized,
+        'thumbnail': thumbnail_url,
+        'preview_url': None,
+        'source': site_name,
+        'category': category,
+        'duration_seconds': duration_seconds,
+        'video_height': video_height,
+    }
+
+def get_http_session():
+    """Sesión HTTP con pool de conexiones, una por hilo (requests.Session no es thread-safe)."""
+    http_session = getattr(_http_local, 'session', None)
+    if http_session is None:
+        http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=2)
+        http_session.mount('https://', adapter)
+        http_session.mount('http://', adapter)
+        http_session.headers.update(HTTP_LISTING_HEADERS)
+        _http_local.session = http_session
+    return http_session
+
+def fetch_listing_items_http(http_session, page_url, css_selector, link_selector, thumb_selector, title_selector, timeout=None, meta_selectors=None):
+    """Descarga un listado por HTTP y extrae los items con los mismos selectores CSS que usa Selenium.
+
+    Devuelve una lista de dicts con 'href', 'title', 'thumbnail', 'duration', 'quality' y 'error' (por item),
+    o None si la página no se pudo obtener y hay que recurrir al navegador.
+    """
+    duration_selector, quality_selector = meta_selectors or DEFAULT_LISTING_META_SELECTORS
+    try:
+        response = http_session.get(page_url, timeout=timeout or HTTP_LISTING_TIMEOUT)
+    except requests.RequestException as e:
+        logger.warning(f"HTTP_LISTING: Error descargando {page_url}: {e}")
+        return None
+    if response.status_code != 200:
+        logger.warning(f"HTTP_LISTING: Estado {response.status_code} para {page_url}")
+        return None
+
+    soup = BeautifulSoup(response.text, HTML_PARSER)
+    raw_items = []
+    for item_element in soup.select(css_selector):
+        link_el = item_element.select_one(link_selector)
+        title_el = item_element.select_one(title_selector)
+        thumb_el = item_element.select_one(thumb_selector)
+        href = link_el.get('href') if link_el else None
+        # En el HTML estático las miniaturas lazy aún no tienen 'src' real, así que se prefiere 'data-src'
+        thumbnail = None
+        if thumb_el:
+            thumbnail = thumb_el.get('data-src') or thumb_el.get('data-thumb') or thumb_el.get('src')
+        missing = [name for name, el in (('link', link_el), ('title', title_el), ('thumb', thumb_el)) if el is None]
+        duration_el = item_element.select_one(duration_selector) if duration_selector else None
+        quality_el = item_element.select_one(quality_selector) if quality_selector else None
+        raw_items.append({
+            'href': urljoin(response.url, href) if href else None,
+            'title': title_el.get_text(strip=True) if title_el else None,
+            'thumbnail': urljoin(response.url, thumbnail) if thumbnail else None,
+            'duration': duration_el.get_text(strip=True) if duration_el else None,
+            'quality': quality_el.get_text(strip=True) if quality_el else None,
+            'error': f"no encontrado: {', '.join(missing)}" if missing else None,
+        })
+    return raw_items
+
+def process_listing_items(raw_items, site_name, page, page_url, limit, scrape_session, log_prefix="SCRAPE_SITE"):
+    """Convierte los items crudos de un listado (dicts con 'href', 'title', 'thumbnail', 'error' y opcionalmente
+    'duration' y 'quality') en videos.
+
+    Aplica la deduplicación y el presupuesto de `scrape_session` y la marca del scrape incremental.
+    Devuelve (videos, reached_checkpoint).
+    """
+    videos = []
+    for raw_item in raw_items:
+        if len(videos) >= limit: break
+        if raw_item.get('error'):
+            logger.debug(f"{log_prefix} [{site_name}]: Elemento faltante en un item (link, title o thumb): {raw_item['error']}. Saltando item.")
+            continue
+
+        original_video_page_url = raw_item.get('href')
+        if not original_video_page_url or not original_video_page_url.startswith('http'):
+            logger.warning(f"{log_prefix} [{site_name}]: URL de página de video inválida o no encontrada. Saltando item.")
+            continue
+
+        cleaned_video_page_url_for_seen_check = clean_original_url(original_video_page_url)
+        if not cleaned_video_page_url_for_seen_check: continue
+
+        scrape_session.record_listing_url(site_name, page, cleaned_video_page_url_for_seen_check)
+        if scrape_session.reached_checkpoint(site_name, cleaned_video_page_url_for_seen_check):
+            logger.info(f"{log_prefix} [{site_name}]: Alcanzado contenido ya ingerido ({cleaned_video_page_url_for_seen_check}). Fin del scrape incremental.")
+            return videos, True
+
+        if scrape_session.is_seen(cleaned_video_page_url_for_seen_check) or scrape_session.is_checkpoint_mark(site_name, cleaned_video_page_url_for_seen_check):
+            logger.debug(f"{log_prefix} [{site_name}]: URL de página de video '{original_video_page_url}' (limpia: {cleaned_video_page_url_for_seen_check}) ya vista en esta sesión. Saltando.")
+            continue
+
+        title = (raw_item.get('title') or '').strip()
+        thumbnail_url = raw_item.get('thumbnail')
+        if not title or not thumbnail_url:
+            logger.warning(f"{log_prefix} [{site_name}]: Elemento sin título o miniatura en {page_url} para link {original_video_page_url}. Saltando.")
+            continue
+
+        try:
+            video_data_item = _build_video_item(site_name, original_video_page_url, title, thumbnail_url,
+                                                raw_item.get('duration'), raw_item.get('quality'))
+        except Exception as e_item:
+            logger.warning(f"{log_prefix} [{site_name}]: Error procesando un item en {page_url}: {e_item}", exc_info=False)
+            continue
+
+        # Otro hilo pudo reservar la misma URL (o agotar el presupuesto global) mientras extraíamos el item
+        if not scrape_session.claim(cleaned_video_page_url_for_seen_check, site_name):
+            if scrape_session.exhausted(): break
+            continue
+        videos.append(video_data_item)
+        logger.info(f"{log_prefix} [{site_name}]: Video recolectado ({len(videos)}/{limit}): '{title}'")
+    return videos, False
+
+# Extrae todos los items del listado en una sola ida y vuelta a Chrome. Los errores se devuelven por item.
+_EXTRACT_ITEMS_JS = """
+const [itemSelector, linkSelector, thumbSelector, titleSelector, durationSelector, qualitySelector] = arguments;
+const optionalText = (item, selector) => {
+    try {
+        const el = selector ? item.querySelector(selector) : null;
+        return el ? (el.innerText || el.textContent || '').trim() : null;
+    } catch (e) {
+        return null;
+    }
+};
+return Array.from(document.querySelectorAll(itemSelector)).map((item) => {
+    try {
+        const link = item.querySelector(linkSelector);
+        const titleEl = item.querySelector(titleSelector);
+        const thumbEl = item.querySelector(thumbSelector);
+        const missing = [!link && 'link', !titleEl && 'title', !thumbEl && 'thumb'].filter(Boolean);
+        if (missing.length) {
+            return {error: 'no encontrado: ' + missing.join(', '), href: link ? link.href : null};
+        }
+        return {
+            href: link.href || null,
+            title: (titleEl.innerText || titleEl.textContent || '').trim(),
+            thumbnail: thumbEl.getAttribute('src') ? thumbEl.src : null,
+            duration: optionalText(item, durationSelector),
+            quality: optionalText(item, qualitySelector),
+            error: null
+        };
+    } catch (e) {
+        return {error: String(e)};
+    }
+});
+"""
+
+def _extract_listing_items_script(driver, css_selector, link_selector, thumb_selector, title_selector, meta_selectors):
+    duration_selector, quality_selector = meta_selectors
+    return driver.execute_script(_EXTRACT_ITEMS_JS, css_selector, link_selector, thumb_selector, title_selector,
+                                 duration_selector, quality_selector) or []
+
+def _optional_element_text(item_element, selector):
+    if not selector:
+        return None
+    found = item_element.find_elements(By.CSS_SELECTOR, selector)
+    return found[0].text.strip() if found else None
+
+def _extract_listing_items_elements(driver, css_selector, link_selector, thumb_selector, title_selector, meta_selectors):
+    """Extracción elemento a elemento (varias idas y vueltas a Chrome por item)."""
+    duration_selector, quality_selector = meta_selectors
+    raw_items = []
+    for item_element in driver.find_elements(By.CSS_SELECTOR, css_selector):
+        try:
+            raw_items.append({
+                'href': item_element.find_element(By.CSS_SELECTOR, link_selector).get_attribute("href"),
+                'title': item_element.find_element(By.CSS_SELECTOR, title_selector).text.strip(),
+                'thumbnail': item_element.find_element(By.CSS_SELECTOR, thumb_selector).get_attribute("src"),
+                'duration': _optional_element_text(item_element, duration_selector),
+                'quality': _optional_element_text(item_element, quality_selector),
+                'error': None,
+            })
+        except NoSuchElementException as e_nse:
+            raw_items.append({'error': e_nse.msg})
+        except Exception as e_item:
+            raw_items.append({'error': str(e_item)})
+    return raw_items
+
+def extract_listing_items(driver, css_selector, link_selector, thumb_selector, title_selector, mode=None, meta_selectors=None):
+    """Extrae los items del listado cargado en `driver`. Con mode='script' (por defecto) usa un único script en la página."""
+    mode = mode or LISTING_EXTRACTION_MODE
+    meta_selectors = meta_selectors or DEFAULT_LISTING_META_SELECTORS
+    if mode == 'script':
+        try:
+            return _extract_listing_items_script(driver, css_selector, link_selector, thumb_selector, title_selector, meta_selectors)
+        except JavascriptException as e_js:
+            logger.warning(f"SCRAPE_SITE: Falló la extracción por script ({e_js.msg}). Usando extracción por elementos.")
+    return _extract_listing_items_elements(driver, css_selector, link_selector, thumb_selector, title_selector, meta_selectors)
+
+def scrape_site_http(site_name, url_template, css_selector, link_selector, thumb_selector, title_selector, limit_per_site, max_pages=30, scrape_session=None):
+    """Versión sin navegador de scrape_site para sitios cuyo listado viene completo en el HTML.
+
+    Devuelve (videos, next_page). next_page es None si terminó por sí mismo, o el número de página en
+    la que el HTML no trajo items (JS, verificación de edad...) y hay que seguir con Selenium.
+    """
     collected_this_site = 0
     videos_data_from_site = []
+    if scrape_session is None:
+        scrape_session = ScrapeSession()
+    http_session = get_http_session()
+
     page = 1
+    reached_checkpoint = False
+    while collected_this_site < limit_per_site and page <= max_pages and not scrape_session.exhausted() and not reached_checkpoint:
+        current_page_list_url = url_template.format(page=page) if "{page}" in url_template else url_template
+        logger.info(f"SCRAPE_HTTP [{site_name}]: Page {page}/{max_pages}: {current_page_list_url}")
+        raw_items = fetch_listing_items_http(http_session, current_page_list_url, css_selector, link_selector, thumb_selector, title_selector,
+                                             timeout=scrape_session.page_budget, meta_selectors=listing_meta_selectors(site_name))
+        if not raw_items:
+            logger.info(f"SCRAPE_HTTP [{site_name}]: Sin items en HTML estático para {current_page_list_url}. Se usará Selenium desde la página {page}.")
+            return videos_data_from_site, page
+
+        new_videos, reached_checkpoint = process_listing_items(raw_items, site_name, page, current_page_list_url,
+                                                               limit_per_site - collected_this_site, scrape_session, log_prefix="SCRAPE_HTTP")
+        videos_data_from_site.extend(new_videos)
+        collected_this_site += len(new_videos)
+
+        page += 1
+        if collected_this_site < limit_per_site and not reached_checkpoint:
+            polite_pause(scrape_session)
+
+    # Solo si llegó a la marca vieja el sitio quedó al día y su marca puede avanzar (parar por límite de
+    # páginas o por presupuesto deja un hueco entre la cabecera nueva y la marca vieja)
+    if reached_checkpoint:
+        scrape_session.mark_caught_up(site_name)
+    logger.info(f"SCRAPE_HTTP [{site_name}]: Total recolectado de '{site_name}': {collected_this_site} videos.")
+    return videos_data_from_site, None
+
+def scrape_site_auto(get_driver, site_name, url_template, css_selector, link_selector, thumb_selector, title_selector, limit_per_site, max_pages=30, age_verification_selectors=None, scrape_session=None):
+    """Scrapea un sitio por HTTP si su listado es estático y recurre a Selenium solo cuando hace falta.
+
+    `get_driver` es un callable que devuelve un WebDriver; solo se invoca si se necesita el navegador.
+    """
+    videos_data_from_site = []
+    first_page = 1
+    if site_name in STATIC_LISTING_SITES and requests is not None:
+        videos_data_from_site, first_page = scrape_site_http(site_name, url_template, css_selector, link_selector, thumb_selector, title_selector,
+                                                            limit_per_site, max_pages=max_pages, scrape_session=scrape_session)
+        if first_page is None:
+            return videos_data_from_site
+        limit_per_site -= len(videos_data_from_site)
+
+    driver = get_driver()
+    videos_data_from_site.extend(scrape_site(driver, site_name, url_template, css_selector, link_selector, thumb_selector, title_selector,
+                                             limit_per_site, max_pages=max_pages, first_page=first_page,
+                                             age_verification_selectors=age_verification_selectors,
+                                             scrape_session=scrape_session))
+    return videos_data_from_site
+
+def scrape_site(driver, site_name, url_template, css_selector, link_selector, thumb_selector, title_selector, limit_per_site, max_pages=30, max_retries=3, age_verification_selectors=None, global_seen_video_page_urls=None, scrape_session=None, first_page=1, extraction_mode=None):
+    collected_this_site = 0
+    videos_data_from_site = []
+    page = first_page
     consecutive_empty_pages = 0
     retry_delay = 5  # Tiempo base de espera entre reintentos
 
-    if global_seen_video_page_urls is None: global_seen_video_page_urls = set()
+    if scrape_session is None:
+        scrape_session = ScrapeSession(seen_urls=global_seen_video_page_urls)
     
-    # Configurar el tiempo de espera explícito para elementos
-    driver.implicitly_wait(10)
+    # Sin espera implícita: toda espera es explícita y está acotada por el presupuesto de latencia de la página
+    driver.implicitly_wait(0)
+    driver.set_page_load_timeout(max(scrape_session.page_budget, 5))
 
-    while collected_this_site < limit_per_site and page <= max_pages:
+    reached_checkpoint = False
+    listing_ended = False
+    while collected_this_site < limit_per_site and page <= max_pages and not scrape_session.exhausted() and not reached_checkpoint:
         current_page_list_url = url_template.format(page=page) if "{page}" in url_template else url_template
         logger.info(f"SCRAPE_SITE [{site_name}]: Page {page}/{max_pages}: {current_page_list_url}")
         retry_count = 0
@@ -701,8 +1167,9 @@ def scrape_site(driver, site_name, url_template, css_selector, link_selector, th
                 })
 
                 # Cargar la página con reintento progresivo
+                page_deadline = time.monotonic() + scrape_session.page_budget
                 driver.get(current_page_list_url)
-                time.sleep(random.uniform(2, 4))  # Aumentar tiempo de espera inicial
+                record_page_load(driver)
                 
                 # Manejar redirección y verificación de edad
                 final_page_url_after_load = handle_redirection(driver, current_page_list_url)
@@ -713,11 +1180,8 @@ def scrape_site(driver, site_name, url_template, css_selector, link_selector, th
                     retry_delay *= 1.5  # Incrementar el tiempo de espera para el próximo reintento
                     continue  # Reintentar en lugar de saltar la página 
                 
-                for _ in range(3):
-                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(random.uniform(2, 4))
-                
-                WebDriverWait(driver, 20).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, css_selector)))
+                if scroll_listing_until_stable(driver, css_selector, page_deadline) == 0:
+                    raise TimeoutException(f"Sin items '{css_selector}' dentro del presupuesto de {scrape_session.page_budget}s")
                 page_loaded_successfully = True
                 break
             except TimeoutException:
@@ -737,116 +1201,102 @@ def scrape_site(driver, site_name, url_template, css_selector, link_selector, th
             if consecutive_empty_pages >=2: break
             continue
 
-        items_on_page = driver.find_elements(By.CSS_SELECTOR, css_selector)
-        logger.info(f"SCRAPE_SITE [{site_name}]: Encontró {len(items_on_page)} elementos con selector '{css_selector}' en {driver.current_url}")
+        items_on_page = extract_listing_items(driver, css_selector, link_selector, thumb_selector, title_selector, mode=extraction_mode,
+                                              meta_selectors=listing_meta_selectors(site_name))
+        current_url = driver.current_url
+        logger.info(f"SCRAPE_SITE [{site_name}]: Encontró {len(items_on_page)} elementos con selector '{css_selector}' en {current_url}")
         
         if not items_on_page:
             consecutive_empty_pages += 1
             if consecutive_empty_pages >= 2:
                 logger.info(f"SCRAPE_SITE [{site_name}]: {consecutive_empty_pages} páginas vacías consecutivas. Parando scrape para este sitio.")
+                listing_ended = True
                 break
             page += 1
-            time.sleep(random.uniform(1, 2))
+            polite_pause(scrape_session)
             continue
         
         consecutive_empty_pages = 0
 
-        for item_element in items_on_page:
-            if collected_this_site >= limit_per_site: break
-            try:
-                video_page_link_element = item_element.find_element(By.CSS_SELECTOR, link_selector)
-                original_video_page_url = video_page_link_element.get_attribute("href")
+        new_videos, reached_checkpoint = process_listing_items(items_on_page, site_name, page, current_url,
+                                                               limit_per_site - collected_this_site, scrape_session)
+        videos_data_from_site.extend(new_videos)
+        collected_this_site += len(new_videos)
+        
+        page += 1
+        if collected_this_site < limit_per_site and not reached_checkpoint:
+            polite_pause(scrape_session)
 
-                if not original_video_page_url or not original_video_page_url.startswith('http'):
-                    logger.warning(f"SCRAPE_SITE [{site_name}]: URL de página de video inválida o no encontrada. Saltando item.")
-                    continue
+    # Al día solo si llegó a la marca vieja o el listado se acabó de verdad; parar por límite de páginas,
+    # por presupuesto o por páginas que no cargan deja un hueco entre la cabecera nueva y la marca vieja
+    if reached_checkpoint or listing_ended:
+        scrape_session.mark_caught_up(site_name)
+    logger.info(f"SCRAPE_SITE [{site_name}]: Total recolectado de '{site_name}': {collected_this_site} videos.")
+    return videos_data_from_site
 
-                cleaned_video_page_url_for_seen_check = clean_original_url(original_video_page_url)
-                if not cleaned_video_page_url_for_seen_check: continue
+SITE_CONFIGS = [
+    ("Xvideos", "https://www.xvideos.com/new/{page}", "div.thumb-block, div.mozaique, .video-item", "a[href*='/video']", "img[data-src], img[src]", "p.title, a.title", ["button.btn-primary.btn-confirm"]),
+    ("EPorner", "https://www.eporner.com/latest-updates/{page}/", "div.mb", "div.mbimg a", "div.mbimg a img", "p.mbtit a", []),
+    ("PornRabbit", "https://www.pornrabbit.com/videos?page={page}", "div.item", "a[href*='/videos/']", "a[href*='/videos/'] img.thumb", "a[href*='/videos/'] strong.title", ["button.age-verify-yes"]),
+    ("SpankBang", "https://spankbang.com/s/newest/{page}/", "div.video-item, .thumb", "a[href*='/video/']", "img[data-src], img[src]", ".n, .title", ["button.accept-age"]),
+    ("YouPorn", "https://www.youporn.com/?page={page}", "div.video-box, div.video-item, div.grid-item", "a[href*='/watch/']", "img[data-src], img[src]", "h3, span.title, a.title, div.title", ["button.enter-site", "button#age-gate-button"]),
+    ("Pornhub", "https://www.pornhub.com/video?page={page}", "li.pcVideoListItem, li.videoBox", "a[href*='/view_video']", "img[src], img[data-src]", "span.title, a.title", ["button#age-verification-ok", "button.agree-button"]),
+    ("RedTube", "https://www.redtube.com/?page={page}", "li.video_item, div.video_item", "a.video_link, a[href*='/video']", "img[data-src], img[src]", ".title, h3", ["button.accept-age"]),
+    ("Tube8", "https://www.tube8.com/latest/?page={page}", "div.video-box, .thumb, .video-item, div.thumbnail", "a[href*='/videos/']", "img[data-src], img[src], img[data-thumb]", ".title, .video-title, h3", ["button.confirm-btn"]),
+]
 
-                if cleaned_video_page_url_for_seen_check in global_seen_video_page_urls:
-                    logger.debug(f"SCRAPE_SITE [{site_name}]: URL de página de video '{original_video_page_url}' (limpia: {cleaned_video_page_url_for_seen_check}) ya vista en esta sesión. Saltando.")
-                    continue
-                
-                title = item_element.find_element(By.CSS_SELECTOR, title_selector).text.strip()
-                thumbnail_url = item_element.find_element(By.CSS_SELECTOR, thumb_selector).get_attribute("src")
+def scrape_videos_multisite(max_videos=50, concurrency=1, scrape_session=None, incremental=True):
+    """Recolecta hasta `max_videos` videos de todos los sitios configurados.
 
-                if not title or not thumbnail_url:
-                    logger.warning(f"SCRAPE_SITE [{site_name}]: Elemento sin título o miniatura en {driver.current_url} para link {original_video_page_url}. Saltando.")
-                    continue
+    Con `concurrency` > 1 los sitios se scrapean en paralelo, cada uno con su propio WebDriver
+    tomado del pool compartido (ver webdriver_init.get_driver_pool). Si se pasa `scrape_session`, el llamador
+    puede seguir el progreso (`collected`) y cancelar el scrape desde otro hilo.
 
-                real_embed_url_from_source = get_embed_url(site_name, original_video_page_url)
-                real_embed_url_normalized = normalize_embed_url(real_embed_url_from_source, site_name)
-                player_url_for_db = generate_video_player_url(real_embed_url_normalized if real_embed_url_normalized else original_video_page_url, site_name)
-                category = "General"
-
-                video_data_item = {
-                    'title': title[:250],
-                    'embed_url_for_player': player_url_for_db,
-                    'original_video_page_url': original_video_page_url,
-                    'original_embed_url': real_embed_url_normalized,
-                    'thumbnail': thumbnail_url,
-                    'preview_url': None,
-                    'source': site_name,
-                    'category': category
-                }
-                videos_data_from_site.append(video_data_item)
-                global_seen_video_page_urls.add(cleaned_video_page_url_for_seen_check)
-                collected_this_site += 1
-                logger.info(f"SCRAPE_SITE [{site_name}]: Video recolectado ({collected_this_site}/{limit_per_site}): '{title}'")
-
-            except NoSuchElementException as e_nse:
-                logger.debug(f"SCRAPE_SITE [{site_name}]: Elemento faltante en un item (link, title o thumb): {e_nse}. Saltando item.")
-            except Exception as e_item:
-                logger.warning(f"SCRAPE_SITE [{site_name}]: Error procesando un item en {driver.current_url}: {e_item}", exc_info=False)
-                continue
-        
-        page += 1
-        if collected_this_site < limit_per_site:
-            time.sleep(random.uniform(2, 4))
+    Con `incremental`, cada sitio deja de paginar al llegar a su marca de ScrapeCheckpoint (requiere
+    contexto de aplicación); las marcas nuevas se guardan al pasar la sesión a save_videos_to_db.
+    """
+    if scrape_session is None:
+        scrape_session = ScrapeSession(max_videos=max_videos)
+    if incremental:
+        load_scrape_checkpoints(scrape_session)
+    valid_configs = [cfg for cfg in SITE_CONFIGS if len(cfg) == 7]
+    num_valid_sites = len(valid_configs)
+    if num_valid_sites == 0:
+        logger.warning("MULTISITE: No hay configuraciones de sitios válidas. Terminando.")
+        return []
 
-    logger.info(f"SCRAPE_SITE [{site_name}]: Total recolectado de '{site_name}': {collected_this_site} videos.")
-    return videos_data_from_site
+    target_per_site = max(1, (max_videos + num_valid_sites -1) // num_valid_sites)
+    logger.info(f"MULTISITE: Objetivo global: {max_videos} videos. Intentando hasta {target_per_site} por sitio desde {num_valid_sites} sitios.")
+
+    random.shuffle(valid_configs)
+
+    if concurrency and concurrency > 1:
+        return _scrape_sites_parallel(valid_configs, max_videos, target_per_site, concurrency, scrape_session)
+    return _scrape_sites_sequential(valid_configs, max_videos, target_per_site, scrape_session)
 
-def scrape_videos_multisite(max_videos=50):
+def _scrape_sites_sequential(valid_configs, max_videos, target_per_site, scrape_session):
     driver = None
+    driver_pool = get_driver_pool()
     all_results_collected = []
-    global_seen_video_page_urls_this_session = set()
+    num_valid_sites = len(valid_configs)
+
+    def get_driver():
+        # El navegador solo se pide al pool cuando algún sitio lo necesita (los listados estáticos van por HTTP)
+        nonlocal driver
+        if driver is None:
+            driver = driver_pool.acquire()
+        return driver
     
     try:
-        driver = init_driver()
-        if not driver:
-            logger.error("MULTISITE: Falló inicialización de WebDriver. Abortando.")
-            return []
-
         total_videos_collected_in_session = 0
-        
-        configs = [
-            ("Xvideos", "https://www.xvideos.com/new/{page}", "div.thumb-block, div.mozaique, .video-item", "a[href*='/video']", "img[data-src], img[src]", "p.title, a.title", ["button.btn-primary.btn-confirm"]),
-            ("EPorner", "https://www.eporner.com/latest-updates/{page}/", "div.mb", "div.mbimg a", "div.mbimg a img", "p.mbtit a", []),
-            ("PornRabbit", "https://www.pornrabbit.com/videos?page={page}", "div.item", "a[href*='/videos/']", "a[href*='/videos/'] img.thumb", "a[href*='/videos/'] strong.title", ["button.age-verify-yes"]),
-            ("SpankBang", "https://spankbang.com/s/newest/{page}/", "div.video-item, .thumb", "a[href*='/video/']", "img[data-src], img[src]", ".n, .title", ["button.accept-age"]),
-            ("YouPorn", "https://www.youporn.com/?page={page}", "div.video-box, div.video-item, div.grid-item", "a[href*='/watch/']", "img[data-src], img[src]", "h3, span.title, a.title, div.title", ["button.enter-site", "button#age-gate-button"]),
-            ("Pornhub", "https://www.pornhub.com/video?page={page}", "li.pcVideoListItem, li.videoBox", "a[href*='/view_video']", "img[src], img[data-src]", "span.title, a.title", ["button#age-verification-ok", "button.agree-button"]),
-            ("RedTube", "https://www.redtube.com/?page={page}", "li.video_item, div.video_item", "a.video_link, a[href*='/video']", "img[data-src], img[src]", ".title, h3", ["button.accept-age"]),
-            ("Tube8", "https://www.tube8.com/latest/?page={page}", "div.video-box, .thumb, .video-item, div.thumbnail", "a[href*='/videos/']", "img[data-src], img[src], img[data-thumb]", ".title, .video-title, h3", ["button.confirm-btn"]),
-        ]
-
-        valid_configs = [cfg for cfg in configs if len(cfg) == 7]
-        num_valid_sites = len(valid_configs)
-        if num_valid_sites == 0:
-            logger.warning("MULTISITE: No hay configuraciones de sitios válidas. Terminando.")
-            return []
-
-        target_per_site = max(1, (max_videos + num_valid_sites -1) // num_valid_sites)
-        logger.info(f"MULTISITE: Objetivo global: {max_videos} videos. Intentando hasta {target_per_site} por sitio desde {num_valid_sites} sitios.")
-
-        random.shuffle(valid_configs)
 
         for site_idx, (name, url_tpl, css_s, link_s, thumb_s, title_s, age_s) in enumerate(valid_configs):
             if total_videos_collected_in_session >= max_videos:
                 logger.info(f"MULTISITE: Meta global de {max_videos} videos alcanzada. Deteniendo scrape.")
                 break
+            if scrape_session.is_cancelled():
+                logger.info("MULTISITE: Scrape cancelado. Deteniendo.")
+                break
             
             remaining_needed_globally = max_videos - total_videos_collected_in_session
             current_site_limit = min(target_per_site, remaining_needed_globally)
@@ -855,11 +1305,11 @@ def scrape_videos_multisite(max_videos=50):
             logger.info(f"MULTISITE: Procesando sitio {site_idx+1}/{num_valid_sites}: {name}. Intentando obtener hasta {current_site_limit} videos.")
             
             try:
-                videos_from_this_site = scrape_site(driver, name, url_tpl, css_s, link_s, thumb_s, title_s, 
-                                                    current_site_limit, 
-                                                    max_pages=3, 
-                                                    age_verification_selectors=age_s,
-                                                    global_seen_video_page_urls=global_seen_video_page_urls_this_session)
+                videos_from_this_site = scrape_site_auto(get_driver, name, url_tpl, css_s, link_s, thumb_s, title_s, 
+                                                         current_site_limit, 
+                                                         max_pages=3, 
+                                                         age_verification_selectors=age_s,
+                                                         scrape_session=scrape_session)
                 
                 if videos_from_this_site:
                     added_from_site = 0
@@ -877,15 +1327,10 @@ def scrape_videos_multisite(max_videos=50):
                 logger.error(f"MULTISITE: Error crítico al scrapear el sitio {name}: {e_site_scrape}", exc_info=True)
                 logger.info(f"MULTISITE: Intentando reiniciar WebDriver después de error en {name}.")
                 if driver:
-                    try:
-                        driver.quit()
-                    except Exception as e_quit_restart: # CORREGIDO AQUI
-                        logger.warning(f"Error al intentar quitar driver durante reinicio para {name}: {e_quit_restart}")
-                driver = init_driver()
-                if not driver: 
-                    logger.error("MULTISITE: Falló RE-inicialización de WebDriver. Abortando scrape general.")
-                    return all_results_collected[:max_videos] 
-                logger.info(f"MULTISITE: WebDriver reiniciado. Continuando con el siguiente sitio.")
+                    # El driver puede haber quedado en mal estado; se descarta y el pool dará otro al próximo sitio
+                    driver_pool.release(driver, discard=True)
+                driver = None
+                logger.info(f"MULTISITE: WebDriver descartado. Continuando con el siguiente sitio.")
                 continue 
 
         source_counts = Counter(video['source'] for video in all_results_collected)
@@ -899,23 +1344,133 @@ def scrape_videos_multisite(max_videos=50):
         return all_results_collected[:max_videos] 
     finally:
         if driver:
-            try:
-                driver.quit()
-                logger.info("MULTISITE: WebDriver cerrado al finalizar.")
-            except Exception as e_quit_final: # CORREGIDO AQUI (nombre de variable)
-                logger.warning(f"MULTISITE: Error final cerrando WebDriver: {e_quit_final}")
+            # Se devuelve al pool en caliente para el próximo scrape
+            driver_pool.release(driver)
+            logger.info("MULTISITE: WebDriver devuelto al pool al finalizar.")
+
+def _scrape_sites_parallel(valid_configs, max_videos, target_per_site, concurrency, scrape_session):
+    concurrency = min(concurrency, len(valid_configs))
+    driver_pool = get_driver_pool()
+    all_results_collected = []
+    logger.info(f"MULTISITE: Modo paralelo con {concurrency} WebDrivers.")
+
+    def scrape_one_site(site_config):
+        name, url_tpl, css_s, link_s, thumb_s, title_s, age_s = site_config
+        if scrape_session.exhausted():
+            return name, []
+        acquired_drivers = []
+        discard_driver = False
+
+        def get_driver():
+            if not acquired_drivers:
+                acquired_drivers.append(driver_pool.acquire())
+            return acquired_drivers[0]
+
+        try:
+            logger.info(f"MULTISITE: Procesando sitio {name} en paralelo. Intentando obtener hasta {target_per_site} videos.")
+            return name, scrape_site_auto(get_driver, name, url_tpl, css_s, link_s, thumb_s, title_s,
+                                          target_per_site,
+                                          max_pages=3,
+                                          age_verification_selectors=age_s,
+                                          scrape_session=scrape_session)
+        except Exception as e_site_scrape:
+            # El driver puede haber quedado en mal estado; se descarta en lugar de devolverlo al pool
+            discard_driver = True
+            logger.error(f"MULTISITE: Error crítico al scrapear el sitio {name}: {e_site_scrape}", exc_info=True)
+            return name, []
+        finally:
+            if acquired_drivers:
+                driver_pool.release(acquired_drivers[0], discard=discard_driver)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='scrape') as executor:
+            futures = [executor.submit(scrape_one_site, cfg) for cfg in valid_configs]
+            for future in as_completed(futures):
+                try:
+                    name, videos_from_this_site = future.result()
+                except Exception as e_future:
+                    logger.error(f"MULTISITE: Error inesperado en hilo de scrape: {e_future}", exc_info=True)
+                    continue
+                all_results_collected.extend(videos_from_this_site)
+                logger.info(f"MULTISITE: Añadidos {len(videos_from_this_site)} videos de {name}. Total actual: {len(all_results_collected)}/{max_videos}")
+    except Exception as e_global:
+        logger.critical(f"MULTISITE: Error crítico global en scrape paralelo: {e_global}", exc_info=True)
+
+    source_counts = Counter(video['source'] for video in all_results_collected)
+    logger.info(f"MULTISITE: Scrape paralelo finalizado. Total videos recolectados en sesión: {len(all_results_collected)}.")
+    logger.info(f"MULTISITE: Distribución por fuente: {dict(source_counts)}")
+    return all_results_collected[:max_videos]
+
+def _split_checkpoint_urls(text):
+    return [line for line in (text or '').split('\n') if line]
 
-def save_videos_to_db(videos_data_list):
+def load_scrape_checkpoints(scrape_session):
+    """Carga en la sesión las marcas de cada sitio y sus URLs recientes (que se saltan sin gastar presupuesto)."""
+    try:
+        checkpoints = ScrapeCheckpoint.query.all()
+    except Exception as e_load:
+        logger.warning(f"MULTISITE: No se pudieron cargar las marcas de scrape incremental: {e_load}. Se scrapeará desde el principio.")
+        db.session.rollback()
+        return
+    for checkpoint in checkpoints:
+        scrape_session.checkpoint_marks[checkpoint.site_name] = set(_split_checkpoint_urls(checkpoint.head_urls))
+        scrape_session.seen_urls.update(_split_checkpoint_urls(checkpoint.recent_urls))
+    logger.info(f"MULTISITE: Marcas de scrape incremental cargadas para {len(checkpoints)} sitios.")
+
+def _stage_scrape_checkpoints(scrape_session):
+    """Añade a la sesión de BD (sin commit) la actualización de ScrapeCheckpoint de cada sitio scrapeado."""
+    site_names = set(scrape_session.listing_heads) | set(scrape_session.collected_by_site)
+    if not site_names:
+        return
+    existing = {cp.site_name: cp for cp in ScrapeCheckpoint.query.filter(ScrapeCheckpoint.site_name.in_(site_names))}
+    for site_name in site_names:
+        checkpoint = existing.get(site_name)
+        if checkpoint is None:
+            checkpoint = ScrapeCheckpoint(site_name=site_name)
+            db.session.add(checkpoint)
+
+        recent = list(dict.fromkeys(scrape_session.collected_by_site.get(site_name, []) + _split_checkpoint_urls(checkpoint.recent_urls)))
+        checkpoint.recent_urls = '\n'.join(recent[:CHECKPOINT_RECENT_SIZE])
+
+        # La marca solo avanza si el sitio quedó al día; si paró por presupuesto, aún hay huecos entre la cabecera y la marca vieja
+        head = scrape_session.listing_heads.get(site_name)
+        if head and (site_name in scrape_session.caught_up_sites or not checkpoint.head_urls):
+            checkpoint.head_urls = '\n'.join(head)
+
+def _commit_scrape_checkpoints(scrape_session):
+    try:
+        _stage_scrape_checkpoints(scrape_session)
+        db.session.commit()
+    except Exception as e_checkpoint:
+        db.session.rollback()
+        logger.error(f"SAVE_DB: Error guardando marcas de scrape incremental: {e_checkpoint}", exc_info=True)
+
+def _find_existing_cleaned_urls(cleaned_urls):
+    """Devuelve el subconjunto de `cleaned_urls` que ya está en la BD, con una consulta IN por bloque."""
+    existing = set()
+    for start in range(0, len(cleaned_urls), SAVE_DB_CHUNK_SIZE):
+        chunk = cleaned_urls[start:start + SAVE_DB_CHUNK_SIZE]
+        existing.update(db.session.execute(
+            select(Video.original_cleaned_url).where(Video.original_cleaned_url.in_(chunk))
+        ).scalars())
+    return existing
+
+def save_videos_to_db(videos_data_list, scrape_session=None):
+    """Guarda en la BD los videos nuevos del lote y devuelve cuántos se insertaron.
+
+    Si se pasa la `scrape_session` del scrape, sus marcas de scrape incremental se guardan en la misma
+    transacción que los videos, de modo que una marca nunca avanza sin que su contenido quede guardado.
+    """
     if not videos_data_list:
         logger.info("SAVE_DB: No hay videos para guardar.")
+        if scrape_session is not None:
+            _commit_scrape_checkpoints(scrape_session)
         return 0
     
-    newly_saved_count = 0
-    try:
-        logger.info(f"SAVE_DB: Procesando {len(videos_data_list)} videos para guardar.")
-    except Exception as e_fetch: 
-        logger.error(f"SAVE_DB: Error inicial (ej. al intentar pre-cargar URLs de BD): {e_fetch}. ")
+    logger.info(f"SAVE_DB: Procesando {len(videos_data_list)} videos para guardar.")
 
+    # 1) Canonicalizar todo el lote y deduplicarlo en memoria (la primera aparición gana)
+    rows_by_cleaned_url = {}
     for video_data in videos_data_list:
         original_page_url = video_data.get('original_video_page_url')
         original_embed_url = video_data.get('original_embed_url')
@@ -945,45 +1500,64 @@ def save_videos_to_db(videos_data_list):
             logger.warning(f"SAVE_DB: Falló la limpieza de URL '{url_to_clean_for_db_check}' para video '{video_data.get('title')}'. Saltando.")
             continue
 
-        try:
-            existing_video = Video.query.filter_by(original_cleaned_url=cleaned_url_for_db).first()
-        except Exception as e_query_dupe:
-            logger.error(f"SAVE_DB: Error al consultar la BD por duplicados para URL '{cleaned_url_for_db}': {e_query_dupe}. "
-                         "Asegúrate que el campo 'original_cleaned_url' existe en el modelo 'Video'. Saltando este video.")
+        if cleaned_url_for_db in rows_by_cleaned_url:
+            logger.info(f"SAVE_DB: Video '{video_data.get('title')}' (URL limpia: {cleaned_url_for_db}) repetido dentro del lote. Saltando.")
             continue
 
-        if existing_video:
-            logger.info(f"SAVE_DB: Video '{video_data.get('title')}' (URL limpia: {cleaned_url_for_db}) ya existe en la BD con ID {existing_video.id}. Saltando.")
-            continue
-        
         try:
-            new_video = Video(
-                title=video_data['title'],
-                embed_url=video_data['embed_url_for_player'],
-                thumbnail=video_data['thumbnail'],
-                preview_url=video_data.get('preview_url'),
-                source=video_data['source'],
-                category=video_data['category'],
-                original_cleaned_url=cleaned_url_for_db,
-                original_page_url=original_page_url
-            )
-            db.session.add(new_video)
-            newly_saved_count += 1
-        except Exception as e_orm:
-            logger.error(f"SAVE_DB: Error creando objeto Video ORM para '{video_data.get('title')}': {e_orm}", exc_info=True)
-            
-    if newly_saved_count > 0:
-        try:
-            db.session.commit()
-            logger.info(f"SAVE_DB: Confirmados {newly_saved_count} nuevos videos en la BD.")
-        except Exception as e_commit:
-            db.session.rollback()
-            logger.error(f"SAVE_DB: Error al hacer commit a la BD: {e_commit}. Cambios revertidos.", exc_info=True)
-            return 0 
-    else:
+            rows_by_cleaned_url[cleaned_url_for_db] = {
+                'title': video_data['title'],
+                'embed_url': video_data['embed_url_for_player'],
+                'thumbnail': video_data['thumbnail'],
+                'preview_url': video_data.get('preview_url'),
+                'source': video_data['source'],
+                'category': video_data['category'],
+                'original_cleaned_url': cleaned_url_for_db,
+                'original_page_url': original_page_url,
+                'duration_seconds': video_data.get('duration_seconds'),
+                'video_height': video_data.get('video_height'),
+            }
+        except KeyError as e_key:
+            logger.error(f"SAVE_DB: Falta el campo {e_key} en el video '{video_data.get('title')}'. Saltando.")
+
+    if not rows_by_cleaned_url:
         logger.info("SAVE_DB: No hay videos nuevos o válidos para añadir a la BD en este lote.")
+        if scrape_session is not None:
+            _commit_scrape_checkpoints(scrape_session)
+        return 0
+
+    # 2) Un único IN (por bloques) contra el índice único de original_cleaned_url en lugar de una consulta por video
+    try:
+        existing_cleaned_urls = _find_existing_cleaned_urls(list(rows_by_cleaned_url))
+    except Exception as e_query_dupe:
+        logger.error(f"SAVE_DB: Error al consultar la BD por duplicados: {e_query_dupe}. "
+                     "Asegúrate que el campo 'original_cleaned_url' existe en el modelo 'Video'.", exc_info=True)
+        return 0
+    if existing_cleaned_urls:
+        logger.info(f"SAVE_DB: {len(existing_cleaned_urls)} videos del lote ya existen en la BD. Saltando.")
+
+    new_rows = [row for cleaned_url, row in rows_by_cleaned_url.items() if cleaned_url not in existing_cleaned_urls]
+    if not new_rows:
+        logger.info("SAVE_DB: No hay videos nuevos o válidos para añadir a la BD en este lote.")
+        if scrape_session is not None:
+            _commit_scrape_checkpoints(scrape_session)
+        return 0
+
+    # 3) Inserción masiva (executemany) y un solo commit
+    try:
+        db.session.execute(insert(Video), new_rows)
+        if scrape_session is not None:
+            _stage_scrape_checkpoints(scrape_session)
+        db.session.commit()
+        logger.info(f"SAVE_DB: Confirmados {len(new_rows)} nuevos videos en la BD.")
+        if new_rows:
+            invalidate_catalog()
+    except Exception as e_commit:
+        db.session.rollback()
+        logger.error(f"SAVE_DB: Error al hacer commit a la BD: {e_commit}. Cambios revertidos.", exc_info=True)
+        return 0
             
-    return newly_saved_count
+    return len(new_rows)
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s [%(name)s] %(message)s')
@@ -114,6 +114,95 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
+    // === SCROLL INFINITO ===
+    // La cuadrícula trae en data-next-url la página siguiente de /api/videos (solo datos de las tarjetas, con
+    // cursor); al acercarse al final se piden y se añaden sin recargar cabecera, barra lateral ni paginación.
+    // Sin JavaScript (o si la petición falla) sigue funcionando la paginación normal.
+    const videoGrid = document.querySelector('.video-grid[data-next-url]');
+    if (videoGrid && 'IntersectionObserver' in window && window.fetch) {
+        const paginationContainer = document.querySelector('.pagination-container');
+        const placeholder = videoGrid.dataset.placeholder;
+        let nextUrl = videoGrid.dataset.nextUrl;
+        let loading = false;
+
+        const truncateTitle = (title, length = 60) => title.length > length ? title.slice(0, length - 3).trimEnd() + '...' : title;
+
+        const buildCard = (video) => {
+            const article = document.createElement('article');
+            article.className = 'video-card group';
+            const link = document.createElement('a');
+            link.href = video.url;
+            link.className = 'block';
+
+            const thumbContainer = document.createElement('div');
+            thumbContainer.className = 'video-thumbnail-container';
+            const img = document.createElement('img');
+            img.src = video.thumbnail || placeholder;
+            img.alt = video.title;
+            img.loading = 'lazy';
+            img.addEventListener('error', () => { img.src = placeholder; }, { once: true });
+            thumbContainer.appendChild(img);
+
+            const info = document.createElement('div');
+            info.className = 'p-3 md:p-4';
+            const title = document.createElement('h3');
+            title.className = 'video-title text-sm font-semibold leading-tight h-10 overflow-hidden mb-1 group-hover:text-red-400 transition-colors';
+            title.textContent = truncateTitle(video.title || '');
+            const meta = document.createElement('p');
+            meta.className = 'video-meta text-xs';
+            const source = document.createElement('span');
+            source.className = 'font-medium';
+            source.textContent = video.source || '';
+            const category = document.createElement('span');
+            category.textContent = video.category || '';
+            meta.append(source, ' | ', category);
+            info.append(title, meta);
+
+            link.append(thumbContainer, info);
+            article.appendChild(link);
+            return article;
+        };
+
+        const sentinel = document.createElement('div');
+        sentinel.className = 'infinite-scroll-sentinel';
+        videoGrid.after(sentinel);
+
+        const loadNextPage = async () => {
+            if (loading || !nextUrl) return;
+            loading = true;
+            try {
+                // El navegador revalida con If-None-Match; si la página no cambió el servidor responde 304
+                const response = await fetch(nextUrl, { headers: { 'Accept': 'application/json' }, credentials: 'same-origin' });
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                const data = await response.json();
+                const fragment = document.createDocumentFragment();
+                data.videos.forEach(video => fragment.appendChild(buildCard(video)));
+                videoGrid.appendChild(fragment);
+                nextUrl = data.next_url;
+                if (!nextUrl) {
+                    observer.disconnect();
+                    sentinel.remove();
+                }
+            } catch (error) {
+                console.warn('Infinite scroll stopped, falling back to pagination:', error);
+                observer.disconnect();
+                nextUrl = null;
+                if (paginationContainer) paginationContainer.style.display = '';
+            } finally {
+                loading = false;
+            }
+            // Si las tarjetas nuevas no llenan la pantalla el centinela sigue visible y el observer no vuelve a avisar
+            if (nextUrl && sentinel.getBoundingClientRect().top < window.innerHeight + 600) loadNextPage();
+        };
+
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some(entry => entry.isIntersecting)) loadNextPage();
+        }, { rootMargin: '600px 0px' });
+
+        if (paginationContainer) paginationContainer.style.display = 'none';
+        observer.observe(sentinel);
+    }
+
     // === LAZY LOADING PARA IMÁGENES ===
     const lazyImages = document.querySelectorAll('img[data-src]');
     if (lazyImages.length > 0) {
@@ -0,0 +1,262 @@
+# app/tareas.py
+"""Trabajos en segundo plano del panel de administración (scrapes largos fuera del hilo de la petición)."""
+from collections import OrderedDict
+from datetime import datetime
+import logging
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Cuántos trabajos terminados se conservan en memoria para consultar su estado
+MAX_FINISHED_JOBS = 20
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_FINISHED = 'finished'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+
+class JobAlreadyRunning(Exception):
+    """Se intentó lanzar un trabajo mientras otro sigue en curso."""
+
+    def __init__(self, job):
+        super().__init__(f"Job {job.id} is still {job.status}")
+        self.job = job
+
+
+class BackgroundJob:
+    """Base de los trabajos del JobManager: estado, marcas de tiempo y cancelación cooperativa.
+
+    Cada subclase fija `kind`, implementa run() y añade sus propios campos en details().
+    """
+    kind = None
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = JOB_QUEUED
+        self.phase = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def is_active(self):
+        return self.status in (JOB_QUEUED, JOB_RUNNING)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        raise NotImplementedError
+
+    def details(self):
+        return {}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'phase': self.phase,
+            **self.details(),
+            'cancel_requested': self.is_cancelled(),
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ScrapeJob(BackgroundJob):
+    kind = 'scrape'
+
+    def __init__(self, max_videos, concurrency, page_budget=None, politeness_delay=None):
+        from app.scraper import ScrapeSession, PAGE_LATENCY_BUDGET, POLITENESS_DELAY
+        super().__init__()
+        self.max_videos = max_videos
+        self.concurrency = concurrency
+        self.scrape_session = ScrapeSession(
+            max_videos=max_videos,
+            page_budget=page_budget if page_budget is not None else PAGE_LATENCY_BUDGET,
+            politeness_delay=politeness_delay if politeness_delay is not None else POLITENESS_DELAY,
+        )
+        self.collected_count = 0
+        self.saved_count = None
+
+    def cancel(self):
+        # La sesión de scrape tiene su propio evento: lo consultan los hilos de cada sitio
+        self.scrape_session.cancel()
+
+    def is_cancelled(self):
+        return self.scrape_session.is_cancelled()
+
+    def run(self):
+        from sqlalchemy import func
+        from app import db
+        from app.modelos import Video
+        from app.scraper import scrape_videos_multisite, save_videos_to_db
+        from app.relacionados import refresh_related_videos, related_neighbour_ids, TokenFrequencies
+        from app.basedatos import run_write
+        from app.miniaturas import prefetch_thumbnails
+        self.phase = 'scraping'
+        videos_data = scrape_videos_multisite(max_videos=self.max_videos, concurrency=self.concurrency,
+                                              scrape_session=self.scrape_session)
+        self.collected_count = len(videos_data)
+        # Lo ya recolectado se guarda aunque el trabajo se haya cancelado a mitad del scrape
+        self.phase = 'saving'
+        last_id_before = db.session.query(func.max(Video.id)).scalar() or 0
+        # Por el hilo escritor: el insert masivo no compite con otras escrituras (borrados del admin, otros lotes)
+        self.saved_count = run_write(save_videos_to_db, videos_data, scrape_session=self.scrape_session)
+        if self.saved_count:
+            # Los videos nuevos salen ya con sus relacionados, y sus vecinos existentes los ganan como candidatos;
+            # el resto del catálogo lo actualiza RelatedRefreshJob
+            self.phase = 'related'
+            token_frequencies = TokenFrequencies()
+            refresh_related_videos(min_id=last_id_before, token_frequencies=token_frequencies)
+            self.phase = 'related_neighbours'
+            refresh_related_videos(video_ids=related_neighbour_ids(last_id_before, token_frequencies=token_frequencies),
+                                   should_stop=self.is_cancelled, token_frequencies=token_frequencies)
+            # Miniaturas de los videos nuevos ya reducidas y en caché antes de que alguien abra el listado
+            self.phase = 'thumbnails'
+            prefetch_thumbnails(min_id=last_id_before, should_stop=self.is_cancelled)
+
+    def details(self):
+        collected = self.collected_count if self.phase == 'saving' or not self.is_active else self.scrape_session.collected
+        return {
+            'max_videos': self.max_videos,
+            'concurrency': self.concurrency,
+            'collected': collected,
+            'saved': self.saved_count,
+            'progress': round(min(1.0, collected / self.max_videos), 3) if self.max_videos else None,
+        }
+
+
+class RelatedRefreshJob(BackgroundJob):
+    """Recalcula en segundo plano los relacionados precalculados de todo el catálogo."""
+    kind = 'related'
+
+    def __init__(self):
+        super().__init__()
+        self.processed_count = 0
+
+    def run(self):
+        from app.relacionados import refresh_related_videos
+        self.phase = 'refreshing'
+        refresh_related_videos(should_stop=self.is_cancelled, progress=self._set_progress)
+
+    def _set_progress(self, processed):
+        self.processed_count = processed
+
+    def details(self):
+        return {'processed': self.processed_count}
+
+
+class FixVideoUrlsJob(BackgroundJob):
+    """Regenera embed_url de todo el catálogo por bloques (scraper.repair_video_urls); si se corta, se reanuda."""
+    kind = 'fix_urls'
+
+    def __init__(self, restart=False):
+        super().__init__()
+        self.restart = restart
+        self.total_count = None
+        self.processed_count = 0
+        self.changed_count = 0
+        self.failed_count = 0
+        self.last_id = 0
+
+    def run(self):
+        from app.catalogo import counters_available, get_counter
+        from app.modelos import Video
+        from app.scraper import repair_video_urls
+        self.phase = 'repairing'
+        self.total_count = get_counter() if counters_available() else Video.query.count()
+        repair_video_urls(restart=self.restart, should_stop=self.is_cancelled, progress=self._set_progress)
+
+    def _set_progress(self, state):
+        self.processed_count = state['processed']
+        self.changed_count = state['changed']
+        self.failed_count = state['failed']
+        self.last_id = state['last_id']
+
+    def details(self):
+        return {
+            'processed': self.processed_count,
+            'changed': self.changed_count,
+            'failed': self.failed_count,
+            'last_id': self.last_id,
+            'progress': round(min(1.0, self.processed_count / self.total_count), 3) if self.total_count else None,
+        }
+
+
+class JobManager:
+    """Ejecuta un único trabajo a la vez en un hilo propio, con su contexto de aplicación.
+
+    La garantía de "un trabajo a la vez" es por proceso: con varios workers de servidor cada uno tiene su gestor.
+    """
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._current = None
+        self._lock = threading.Lock()
+
+    def submit(self, app, job):
+        with self._lock:
+            if self._current is not None and self._current.is_active:
+                raise JobAlreadyRunning(self._current)
+            self._current = job
+            self._jobs[job.id] = job
+            self._prune()
+        thread = threading.Thread(target=self._run, args=(app, job), name=f"job-{job.id}", daemon=True)
+        thread.start()
+        logger.info(f"JOBS: Trabajo {job.kind} {job.id} encolado.")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def current(self):
+        with self._lock:
+            return self._current
+
+    def recent(self):
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or not job.is_active:
+            return False
+        job.cancel()
+        logger.info(f"JOBS: Cancelación solicitada para el trabajo {job.id}.")
+        return True
+
+    def _run(self, app, job):
+        job.status = JOB_RUNNING
+        job.started_at = datetime.utcnow()
+        try:
+            with app.app_context():
+                job.run()
+            job.status = JOB_CANCELLED if job.is_cancelled() else JOB_FINISHED
+            logger.info(f"JOBS: Trabajo {job.id} terminado con estado '{job.status}'.")
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            logger.error(f"JOBS: Trabajo {job.id} falló: {e}", exc_info=True)
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager()
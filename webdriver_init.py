@@ -1,7 +1,14 @@
 # app/webdriver_init.py
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
+import atexit
 import logging
+import threading
+import time
+try:
+    import psutil
+except ImportError:  # Sin psutil no se recicla por memoria, solo por número de páginas
+    psutil = None
 
 def init_driver():
     options = Options()
@@ -20,3 +27,193 @@ def init_driver():
     except Exception as e:
         logging.error(f"Error iniciando WebDriver: {e}")
         raise
+
+
+# Margen tras la caducidad de un driver ocioso antes de que el temporizador lo cierre
+REAPER_MARGIN_SECONDS = 1.0
+
+
+class DriverPool:
+    """Pool de WebDrivers de larga vida: reutiliza sesiones de Chrome ya arrancadas entre scrapes.
+
+    Como mucho `max_size` navegadores en uso a la vez. Antes de reutilizar un driver se comprueba que
+    responde, y se recicla (quit + uno nuevo) tras `max_pages` cargas de página, si supera `max_memory_mb`
+    de RSS (requiere psutil) o si lleva más de `max_idle_seconds` sin usarse. Un temporizador cierra los
+    drivers ociosos cuando caducan, aunque no llegue otro scrape que los pida.
+    """
+
+    def __init__(self, max_size=2, max_pages=200, max_memory_mb=1500, max_idle_seconds=600):
+        self.max_size = max(1, int(max_size))
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.max_idle_seconds = max_idle_seconds
+        self._idle = []
+        self._created = 0
+        self._reaper = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    driver = self._idle.pop() if self._idle else None
+                if driver is None:
+                    break
+                if self._is_idle_expired(driver) or self._should_recycle(driver) or not _is_healthy(driver):
+                    logging.info("DriverPool: Reciclando WebDriver antes de reutilizarlo.")
+                    _quit_driver(driver)
+                    continue
+                _mark_used(driver)
+                return driver
+            driver = init_driver()
+            _register_driver(driver)
+            with self._lock:
+                self._created += 1
+            return driver
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver, discard=False):
+        try:
+            if driver is None:
+                return
+            if discard or self._should_recycle(driver):
+                _quit_driver(driver)
+                return
+            _mark_used(driver)
+            with self._lock:
+                self._idle.append(driver)
+            self._schedule_reaper()
+        finally:
+            self._slots.release()
+
+    def prune_idle(self):
+        """Cierra los drivers ociosos que llevan más de `max_idle_seconds` sin usarse."""
+        with self._lock:
+            expired = [d for d in self._idle if self._is_idle_expired(d)]
+            self._idle = [d for d in self._idle if d not in expired]
+        for driver in expired:
+            _quit_driver(driver)
+
+    def _schedule_reaper(self):
+        """Programa (si no hay uno pendiente) un Timer para cuando caduque el driver ocioso más antiguo."""
+        if not self.max_idle_seconds:
+            return
+        with self._lock:
+            if self._reaper is not None or not self._idle:
+                return
+            now = time.monotonic()
+            oldest = min(_driver_stats.get(id(d), {}).get('last_used', now) for d in self._idle)
+            delay = max(0.0, oldest + self.max_idle_seconds - now) + REAPER_MARGIN_SECONDS
+            self._reaper = threading.Timer(delay, self._reap)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    def _reap(self):
+        with self._lock:
+            self._reaper = None
+        self.prune_idle()
+        # Los que siguen ociosos se usaron después: el siguiente disparo es cuando caduque el más antiguo de ellos
+        self._schedule_reaper()
+
+    def close_all(self):
+        with self._lock:
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            _quit_driver(driver)
+        logging.info(f"DriverPool: cerrados todos los WebDrivers ({self._created} creados en total)")
+
+    def _is_idle_expired(self, driver):
+        if not self.max_idle_seconds:
+            return False
+        last_used = _driver_stats.get(id(driver), {}).get('last_used')
+        return last_used is not None and time.monotonic() - last_used > self.max_idle_seconds
+
+    def _should_recycle(self, driver):
+        stats = _driver_stats.get(id(driver), {})
+        if self.max_pages and stats.get('pages', 0) >= self.max_pages:
+            return True
+        if self.max_memory_mb:
+            memory_mb = driver_memory_mb(driver)
+            if memory_mb is not None and memory_mb >= self.max_memory_mb:
+                logging.info(f"DriverPool: WebDriver usa {memory_mb:.0f} MB (límite {self.max_memory_mb} MB).")
+                return True
+        return False
+
+
+# Estadísticas por driver (id -> páginas cargadas y último uso); scrape_site informa de cada carga de página
+_driver_stats = {}
+_stats_lock = threading.Lock()
+
+def _register_driver(driver):
+    with _stats_lock:
+        _driver_stats[id(driver)] = {'pages': 0, 'last_used': time.monotonic()}
+
+def _mark_used(driver):
+    with _stats_lock:
+        _driver_stats.setdefault(id(driver), {'pages': 0})['last_used'] = time.monotonic()
+
+def record_page_load(driver):
+    """Cuenta una carga de página para el reciclaje del pool (no hace nada con drivers fuera del pool)."""
+    with _stats_lock:
+        stats = _driver_stats.get(id(driver))
+        if stats is not None:
+            stats['pages'] += 1
+
+def driver_memory_mb(driver):
+    """RSS total (MB) de chromedriver y sus procesos Chrome hijos, o None si no se puede medir."""
+    if psutil is None:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+        return sum(proc.memory_info().rss for proc in processes) / (1024 * 1024)
+    except Exception:
+        return None
+
+def _is_healthy(driver):
+    try:
+        return driver.execute_script("return 1;") == 1
+    except Exception as e:
+        logging.warning(f"DriverPool: WebDriver no responde: {e}")
+        return False
+
+def _quit_driver(driver):
+    with _stats_lock:
+        _driver_stats.pop(id(driver), None)
+    try:
+        driver.quit()
+    except Exception as e:
+        logging.warning(f"Error cerrando WebDriver: {e}")
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def configure_driver_pool(**pool_options):
+    """Fija las opciones del pool compartido (se aplican al crearlo; llamar antes del primer scrape)."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.close_all()
+        _shared_pool = DriverPool(**pool_options)
+    return _shared_pool
+
+def get_driver_pool():
+    """Pool de WebDrivers compartido por todo el proceso, para que las sesiones sigan calientes entre scrapes."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = DriverPool()
+        return _shared_pool
+
+@atexit.register
+def _close_shared_pool():
+    if _shared_pool is not None:
+        _shared_pool.close_all()